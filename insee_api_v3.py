@@ -12,6 +12,7 @@ from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 import time
 import urllib.parse
+from src.tranches import describe_tranche
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -19,7 +20,11 @@ load_dotenv()
 class INSEEApiClient:
     """Client pour l'API INSEE Sirene V3"""
     
-    def __init__(self):
+    def __init__(self, budget=None):
+        # Budget d'exécution (src.budget.RunBudget) : chaque requête HTTP en est décomptée,
+        # BudgetExhausted est levée sans envoyer la requête une fois épuisé
+        self.budget = budget
+        
         # L'API INSEE Sirene utilise une clé API spécifique
         self.api_key = os.getenv('SIRENE_API_KEY')
         # URL de base correcte pour l'API Sirene 3.11
@@ -63,6 +68,8 @@ class INSEEApiClient:
             print(f"   URL: {url}")
             print(f"   Paramètres: {params}")
             
+            if self.budget is not None:
+                self.budget.charge()
             response = requests.get(url, headers=headers, params=params)
             
             print(f"📊 Code de réponse: {response.status_code}")
@@ -156,25 +163,8 @@ class INSEEApiClient:
         if not tranche_code:
             return 'Non renseigné'
             
-        tranches = {
-            'NN': 'Non renseigné',
-            '00': '0 salarié',
-            '01': '1 ou 2 salariés',
-            '02': '3 à 5 salariés',
-            '03': '6 à 9 salariés',
-            '11': '10 à 19 salariés',
-            '12': '20 à 49 salariés',
-            '21': '50 à 99 salariés',
-            '22': '100 à 199 salariés',
-            '31': '200 à 249 salariés',
-            '32': '250 à 499 salariés',
-            '41': '500 à 999 salariés',
-            '42': '1000 à 1999 salariés',
-            '51': '2000 à 4999 salariés',
-            '52': '5000 à 9999 salariés',
-            '53': '10000 salariés et plus'
-        }
-        return tranches.get(str(tranche_code), f'Code inconnu: {tranche_code}')
+        description = describe_tranche(tranche_code)['description']
+        return description or f'Code inconnu: {tranche_code}'
 
 # Test du module
 if __name__ == "__main__":
@@ -2,15 +2,24 @@
 """
 Processeur INSEE optimisé avec gestion des doublons
 Évite les requêtes inutiles en cachant les résultats pour les entreprises dupliquées
+
+Avec --max-duration SECONDES ou --max-api-calls N (ou --option=valeur), le traitement s'arrête
+proprement une fois le budget épuisé : les lignes non résolues sont marquées
+PENDING et les noms déjà résolus sont gardés dans un point de reprise, relu
+automatiquement à l'exécution suivante.
 """
 
 import os
+import json
 import time
 import pandas as pd
 from datetime import datetime
 from insee_api_v3 import INSEEApiClient
 from salesforce_processor import process_insee_result_for_salesforce
 from salesforce_processor import create_salesforce_ready_data
+from src.records import CompanyRecord
+from src.budget import PENDING_STATUS, BudgetExhausted, RunBudget
+from src.cache import decode_record, encode_record
 
 def get_default_effectifs_by_taille(taille: str) -> tuple:
     """
@@ -26,6 +35,16 @@ def get_default_effectifs_by_taille(taille: str) -> tuple:
     
     return mapping.get(taille, (None, 'Non spécifié', 'low'))
 
+def set_masked_values(df: pd.DataFrame, column: str, mask, values):
+    """
+    Affecte des valeurs aux lignes masquées, y compris sur une colonne catégorielle
+    (les DataFrames du pipeline en mémoire ne repassent pas par un CSV)
+    """
+    if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype):
+        new_categories = pd.Index(pd.unique(values)).dropna().difference(df[column].cat.categories)
+        df[column] = df[column].cat.add_categories(new_categories)
+    df.loc[mask, column] = values
+
 def fix_missing_effectifs_inline(df: pd.DataFrame) -> tuple:
     """
     Corrige les effectifs "Non spécifié" en utilisant la Taille_Original
@@ -49,22 +68,26 @@ def fix_missing_effectifs_inline(df: pd.DataFrame) -> tuple:
     for taille, count in missing_by_taille.items():
         print(f"   {taille}: {count} entreprises")
     
-    # Appliquer les corrections
-    corrections = 0
+    # Appliquer les corrections (une seule consultation du mapping par taille)
     df_copy = df.copy()
+    tailles = df_copy['Taille_Original']
+    defaults = {taille: get_default_effectifs_by_taille(taille) for taille in tailles[missing_mask].unique()}
+    
+    effectifs_num = tailles.map({taille: d[0] for taille, d in defaults.items()})
+    fix_mask = (missing_mask & effectifs_num.notna()).to_numpy()
+    
+    corrections_by_column = {
+        'Effectifs_Salesforce': effectifs_num,
+        'Effectifs_Description': tailles.map({taille: d[1] for taille, d in defaults.items()}),
+        'Confiance_Donnee': tailles.map({taille: d[2] for taille, d in defaults.items()}),
+        'Notes_Revision': tailles.map({
+            taille: f"📊 Effectifs estimés par script selon Taille_Original ({taille})" for taille in defaults
+        })
+    }
+    for column, values in corrections_by_column.items():
+        set_masked_values(df_copy, column, fix_mask, values.to_numpy()[fix_mask])
     
-    for idx, row in df_copy[missing_mask].iterrows():
-        taille = row['Taille_Original']
-        effectifs_num, effectifs_desc, confiance = get_default_effectifs_by_taille(taille)
-        
-        if effectifs_num is not None:
-            # Mettre à jour les colonnes
-            df_copy.at[idx, 'Effectifs_Salesforce'] = effectifs_num
-            df_copy.at[idx, 'Effectifs_Description'] = effectifs_desc
-            df_copy.at[idx, 'Confiance_Donnee'] = confiance
-            df_copy.at[idx, 'Notes_Revision'] = f"📊 Effectifs estimés par script selon Taille_Original ({taille})"
-            
-            corrections += 1
+    corrections = int(fix_mask.sum())
     
     print(f"✅ CORRECTIONS APPLIQUÉES: {corrections}")
     still_missing = (df_copy['Effectifs_Description'] == 'Non spécifié').sum()
@@ -106,8 +129,31 @@ def analyze_duplicates(df_companies):
         'top_doublons': list(duplicates.head(10).items())
     }
 
-def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
-    """Traiter les entreprises avec cache pour éviter les doublons"""
+def load_checkpoint(checkpoint_file) -> dict:
+    """Noms résolus par une exécution précédente interrompue (nom -> CompanyRecord ou None)"""
+    if not checkpoint_file or not os.path.exists(checkpoint_file):
+        return {}
+    with open(checkpoint_file, encoding='utf-8') as f:
+        return {name: decode_record(text) for name, text in json.load(f).items()}
+
+def save_checkpoint(checkpoint_file, cache: dict):
+    """Enregistre les noms résolus pour reprendre après un budget épuisé"""
+    with open(checkpoint_file, 'w', encoding='utf-8') as f:
+        json.dump({name: encode_record(record) for name, record in cache.items()}, f, ensure_ascii=False)
+
+def process_with_duplicate_cache(df_companies, output_file=None, demo_limit=None,
+                                 budget=None, checkpoint_file=None):
+    """
+    Traiter les entreprises avec cache pour éviter les doublons
+    
+    Une fois le budget épuisé (RunBudget), plus aucune recherche n'est lancée :
+    les noms absents du cache sont marqués PENDING et les noms résolus sont
+    écrits dans checkpoint_file, relu à l'exécution suivante.
+    
+    Returns:
+        (stats, DataFrame des résultats INSEE) ; le CSV intermédiaire n'est écrit
+        que si output_file est fourni
+    """
     
     # Analyser les doublons
     duplicates = analyze_duplicates(df_companies)
@@ -117,10 +163,14 @@ def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
         df_companies = df_companies.head(demo_limit)
         print(f"\n🧪 MODE DEMO: Traitement limité à {demo_limit} entreprises")
     
-    client = INSEEApiClient()
-    cache = {}  # Cache: nom_entreprise -> résultat_api
+    client = INSEEApiClient(budget=budget)  # Chaque requête HTTP (variation) est décomptée du budget
+    cache = load_checkpoint(checkpoint_file)  # Cache: nom_entreprise -> CompanyRecord compact (None = non trouvé)
+    errors = set()  # Noms en erreur : non repris du point de reprise
     all_results = []
     
+    if cache:
+        print(f"♻️  Reprise: {len(cache)} noms déjà résolus ({checkpoint_file})")
+    
     start_time = time.time()
     api_calls = 0
     cache_hits = 0
@@ -149,7 +199,7 @@ def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
             if cached_result:
                 # Traiter avec le processeur Salesforce pour obtenir le bon statut
                 salesforce_result = process_insee_result_for_salesforce(
-                    company_name, company_size, cached_result
+                    company_name, company_size, cached_result.to_legacy_dict()
                 )
                 result_data = salesforce_result
             else:
@@ -158,6 +208,13 @@ def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
                     'Taille_Original': company_size,
                     'Statut_Recherche': 'NOT_FOUND'
                 }
+        elif budget is not None and budget.reason is not None:
+            # Budget épuisé : pas de recherche, ligne à reprendre
+            result_data = {
+                'Organisation_Original': company_name,
+                'Taille_Original': company_size,
+                'Statut_Recherche': PENDING_STATUS
+            }
         else:
             # Nouvelle recherche API
             print(f"   🔍 Nouvelle recherche API...")
@@ -165,18 +222,16 @@ def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
                 result = client.search_alternative_names(company_name)
                 api_calls += 1
                 
-                if result:
+                record = CompanyRecord.from_search_result(result) if result else None
+                if record:
                     print(f"   ✅ Trouvé: {len(result.get('etablissements', []))} établissement(s)")
                     
-                    # Extraire les effectifs plus efficacement
-                    effectifs_info = extract_better_effectifs(result)
-                    
-                    result_enhanced = {**result, **effectifs_info}
-                    cache[company_name] = result_enhanced
+                    # Seuls les champs extraits sont cachés, pas la réponse brute
+                    cache[company_name] = record
                     
                     # Traiter avec le processeur Salesforce pour obtenir le bon statut
                     salesforce_result = process_insee_result_for_salesforce(
-                        company_name, company_size, result_enhanced
+                        company_name, company_size, record.to_legacy_dict()
                     )
                     result_data = salesforce_result
                     
@@ -193,9 +248,18 @@ def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
                         'Statut_Recherche': 'NOT_FOUND'
                     }
                     
+            except BudgetExhausted:
+                # Budget épuisé pendant les variations : rien n'est caché, ligne à reprendre
+                print(f"   ⏸️  Budget épuisé: {PENDING_STATUS}")
+                result_data = {
+                    'Organisation_Original': company_name,
+                    'Taille_Original': company_size,
+                    'Statut_Recherche': PENDING_STATUS
+                }
             except Exception as e:
                 print(f"   ❌ Erreur: {e}")
                 cache[company_name] = None
+                errors.add(company_name)
                 result_data = {
                     'Organisation_Original': company_name,
                     'Taille_Original': company_size,
@@ -204,13 +268,24 @@ def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
         
         all_results.append(result_data)
     
-    # Sauvegarder les résultats
+    # Sauvegarder les résultats (intermédiaire optionnel)
     temp_df = pd.DataFrame(all_results)
-    temp_df.to_csv(output_file, index=False, encoding='utf-8')
+    if output_file:
+        temp_df.to_csv(output_file, index=False, encoding='utf-8')
+    
+    # Point de reprise : gardé tant que des lignes restent PENDING
+    pending = sum(r.get('Statut_Recherche') == PENDING_STATUS for r in all_results)
+    if checkpoint_file and pending:
+        save_checkpoint(checkpoint_file, {name: record for name, record in cache.items() if name not in errors})
+        print(f"\n⏸️  Budget épuisé ({budget.reason}): {pending} lignes {PENDING_STATUS}")
+        print(f"💾 Point de reprise: {checkpoint_file} (relancer la même commande pour continuer)")
+    elif checkpoint_file and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
     
     elapsed_total = time.time() - start_time
     print(f"\n✅ Traitement terminé en {elapsed_total/60:.1f} minutes")
-    print(f"📄 Résultats: {output_file}")
+    if output_file:
+        print(f"📄 Résultats: {output_file}")
     
     # Statistiques d'optimisation
     found = len([r for r in all_results if 'Trouvé' in r.get('Statut_Recherche', '')])
@@ -218,6 +293,8 @@ def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
     print(f"   🏢 Entreprises traitées: {len(all_results)}")
     print(f"   ✅ Trouvées: {found} ({found/len(all_results)*100:.1f}%)")
     print(f"   🔗 Appels API: {api_calls}")
+    if pending:
+        print(f"   ⏸️  En attente (budget épuisé): {pending}")
     print(f"   💾 Cache hits: {cache_hits}")
     print(f"   ⚡ Économie: {cache_hits} requêtes évitées!")
     print(f"   🕰️  Temps gagné: ~{cache_hits * 3 / 60:.1f} minutes")
@@ -231,6 +308,7 @@ def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
             'taux_reussite': found/len(all_results)*100 if all_results else 0,
             'appels_api': api_calls,
             'cache_hits': cache_hits,
+            'lignes_pending': pending,
             'temps_execution': elapsed_total/60,
             'temps_economise': cache_hits * 3 / 60
         },
@@ -239,59 +317,104 @@ def process_with_duplicate_cache(df_companies, output_file, demo_limit=None):
         }
     }
     
-    return stats
+    return stats, temp_df
 
-def extract_better_effectifs(api_result):
-    """Extraction améliorée des effectifs depuis l'API INSEE"""
-    effectifs_data = {
-        'effectifs_etablissement': None,
-        'effectifs_unite_legale': None,
-        'tranche_effectifs_etablissement': None,
-        'tranche_effectifs_unite_legale': None,
-        'annee_effectifs': None
-    }
+def run_pipeline(df_companies, mode: str, demo_limit: int = None, in_memory: bool = False,
+                 budget: RunBudget = None) -> dict:
+    """
+    Enchaîne recherche INSEE, transformation Salesforce, correction et rapport
     
-    try:
-        etablissements = api_result.get('etablissements', [])
-        if not etablissements:
-            return effectifs_data
-        
-        # Prendre le siège social en priorité
-        siege = None
-        for etab in etablissements:
-            if etab.get('etablissementSiege'):
-                siege = etab
-                break
-        
-        # Sinon prendre le premier établissement
-        etab = siege or etablissements[0]
-        unite_legale = etab.get('uniteLegale', {})
-        
-        # Extraire les données d'effectifs
-        effectifs_data.update({
-            'tranche_effectifs_etablissement': etab.get('trancheEffectifsEtablissement'),
-            'annee_effectifs_etablissement': etab.get('anneeEffectifsEtablissement'),
-            'tranche_effectifs_unite_legale': unite_legale.get('trancheEffectifsUniteLegale'),
-            'annee_effectifs_unite_legale': unite_legale.get('anneeEffectifsUniteLegale'),
-            'denomination': unite_legale.get('denominationUniteLegale'),
-            'siren': etab.get('siren'),
-            'siret': etab.get('siret'),
-            'categorie_entreprise': unite_legale.get('categorieEntreprise'),
-            'activite_principale': unite_legale.get('activitePrincipaleUniteLegale')
-        })
-        
-    except Exception as e:
-        print(f"   ⚠️  Erreur extraction effectifs: {e}")
+    Les DataFrames passent d'une étape à l'autre en mémoire. Les fichiers
+    intermédiaires (résultats INSEE, salesforce_ready) restent écrits par défaut,
+    car relus par le pré-remplissage du cache (src/warm_start.py) ; avec
+    in_memory, seuls le fichier final corrigé (_refactor) et le rapport le sont.
+    """
+    prefix = f"demo_{demo_limit}" if mode == "demo" else "full"
+    results_file = None if in_memory else f"data/insee_optimized_{prefix}_results.csv"
+    salesforce_file = None if in_memory else f"data/{prefix}_optimized_salesforce_ready.csv"
+    corrected_file = f"data/{prefix}_optimized_salesforce_ready_refactor.csv"
+    checkpoint_file = f"data/insee_optimized_{prefix}_checkpoint.json"
+    
+    stats, df_results = process_with_duplicate_cache(df_companies, results_file, demo_limit,
+                                                     budget=budget, checkpoint_file=checkpoint_file)
+    
+    # Transformation Salesforce
+    print(f"\n🔄 Transformation Salesforce...")
+    df_salesforce = create_salesforce_ready_data(df_results, salesforce_file)
+    if df_salesforce is None:
+        raise RuntimeError("Échec de la transformation Salesforce")
+    
+    # Correction automatique des effectifs manquants
+    print(f"\n🔧 Correction automatique des effectifs manquants...")
+    df_corrected, corrections_count = fix_missing_effectifs_inline(df_salesforce)
+    
+    # Sauvegarder le fichier corrigé avec suffixe _refactor
+    df_corrected.to_csv(corrected_file, index=False, encoding='utf-8')
+    print(f"📄 Fichier corrigé sauvegardé: {corrected_file}")
+    
+    # Collecter les statistiques Salesforce sur le DataFrame corrigé
+    stats['salesforce'] = collect_salesforce_stats(df_corrected)
+    stats['fichiers']['donnees_salesforce'] = corrected_file
+    
+    # Générer le rapport markdown
+    print(f"\n📝 Génération du rapport...")
+    markdown_content, timestamp = generate_markdown_report(stats, mode, demo_limit)
+    report_path = save_markdown_report(markdown_content, timestamp, mode, demo_limit)
+    print(f"📄 Rapport généré: {report_path}")
     
-    return effectifs_data
+    return stats
+
+# Options reconnues : drapeaux et options à valeur (--nom=valeur ou --nom valeur)
+FLAGS = {'--in-memory'}
+VALUE_OPTIONS = {'--max-duration', '--max-api-calls'}
+
+def parse_command_line(argv: list) -> tuple:
+    """
+    Sépare arguments positionnels et options de la ligne de commande
+    
+    Returns:
+        (arguments positionnels, {option: valeur}, {drapeaux}) ; ValueError
+        pour une option inconnue ou sans valeur
+    """
+    args, options, flags = [], {}, set()
+    remaining = iter(argv)
+    for arg in remaining:
+        name, has_value, value = arg.partition('=')
+        if not arg.startswith('--'):
+            args.append(arg)
+        elif name in VALUE_OPTIONS:
+            value = value if has_value else next(remaining, None)
+            if value is None or value.startswith('--'):
+                raise ValueError(f"valeur manquante pour {name}")
+            options[name] = value
+        elif arg in FLAGS:
+            flags.add(arg)
+        else:
+            raise ValueError(f"option inconnue: {arg}")
+    return args, options, flags
 
 def main():
     """Fonction principale"""
-    if len(os.sys.argv) < 2:
-        print("Usage: python process_optimized_duplicates.py [demo|full] [limite_demo]")
+    usage = ("Usage: python process_optimized_duplicates.py [demo|full] [limite_demo] [--in-memory] "
+             "[--max-duration SECONDES] [--max-api-calls N]")
+    try:
+        args, options, flags = parse_command_line(os.sys.argv[1:])
+    except ValueError as e:
+        print(f"❌ {e}")
+        print(usage)
         return
+    in_memory = '--in-memory' in flags
+    max_duration = options.get('--max-duration')
+    max_api_calls = options.get('--max-api-calls')
     
-    mode = os.sys.argv[1]
+    if len(args) < 1:
+        print(usage)
+        return
+    
+    mode = args[0]
+    if mode not in ("demo", "full"):
+        print("❌ Mode invalide. Utilisez 'demo' ou 'full'")
+        return
     
     # Charger le dataset
     try:
@@ -301,82 +424,29 @@ def main():
         print("❌ Fichier data/companies_input.csv non trouvé")
         return
     
+    demo_limit = None
     if mode == "demo":
-        demo_limit = int(os.sys.argv[2]) if len(os.sys.argv) > 2 else 50
-        output_file = f"data/insee_optimized_demo_{demo_limit}_results.csv"
-        stats = process_with_duplicate_cache(df_companies, output_file, demo_limit)
-        
-        # Transformation Salesforce
-        print(f"\n🔄 Transformation Salesforce...")
-        salesforce_file = f"data/demo_{demo_limit}_optimized_salesforce_ready.csv"
-        create_salesforce_ready_data(output_file, salesforce_file)
-        
-        # Correction automatique des effectifs manquants
-        print(f"\n🔧 Correction automatique des effectifs manquants...")
-        df_salesforce = pd.read_csv(salesforce_file)
-        df_corrected, corrections_count = fix_missing_effectifs_inline(df_salesforce)
-        
-        # Sauvegarder le fichier corrigé avec suffixe _refactor
-        corrected_file = f"data/demo_{demo_limit}_optimized_salesforce_ready_refactor.csv"
-        df_corrected.to_csv(corrected_file, index=False, encoding='utf-8')
-        print(f"📄 Fichier corrigé sauvegardé: {corrected_file}")
-        
-        # Utiliser le fichier corrigé pour les statistiques
-        salesforce_file = corrected_file
-        
-        # Collecter les statistiques Salesforce
-        salesforce_stats = collect_salesforce_stats(salesforce_file)
-        stats['salesforce'] = salesforce_stats
-        stats['fichiers']['donnees_salesforce'] = salesforce_file
-        
-        # Générer le rapport markdown
-        print(f"\n📝 Génération du rapport...")
-        markdown_content, timestamp = generate_markdown_report(stats, mode, demo_limit)
-        report_path = save_markdown_report(markdown_content, timestamp, mode, demo_limit)
-        print(f"📄 Rapport généré: {report_path}")
-        
-    elif mode == "full":
-        output_file = "data/insee_optimized_full_results.csv"
-        stats = process_with_duplicate_cache(df_companies, output_file)
-        
-        # Transformation Salesforce
-        print(f"\n🔄 Transformation Salesforce...")
-        salesforce_file = "data/full_optimized_salesforce_ready.csv"
-        create_salesforce_ready_data(output_file, salesforce_file)
-        
-        # Correction automatique des effectifs manquants
-        print(f"\n🔧 Correction automatique des effectifs manquants...")
-        df_salesforce = pd.read_csv(salesforce_file)
-        df_corrected, corrections_count = fix_missing_effectifs_inline(df_salesforce)
-        
-        # Sauvegarder le fichier corrigé avec suffixe _refactor
-        corrected_file = "data/full_optimized_salesforce_ready_refactor.csv"
-        df_corrected.to_csv(corrected_file, index=False, encoding='utf-8')
-        print(f"📄 Fichier corrigé sauvegardé: {corrected_file}")
-        
-        # Utiliser le fichier corrigé pour les statistiques
-        salesforce_file = corrected_file
-        
-        # Collecter les statistiques Salesforce
-        salesforce_stats = collect_salesforce_stats(salesforce_file)
-        stats['salesforce'] = salesforce_stats
-        stats['fichiers']['donnees_salesforce'] = salesforce_file
-        
-        # Générer le rapport markdown
-        print(f"\n📝 Génération du rapport...")
-        markdown_content, timestamp = generate_markdown_report(stats, mode)
-        report_path = save_markdown_report(markdown_content, timestamp, mode)
-        print(f"📄 Rapport généré: {report_path}")
-        
-    else:
-        print("❌ Mode invalide. Utilisez 'demo' ou 'full'")
+        demo_limit = int(args[1]) if len(args) > 1 else 50
+    
+    budget = None
+    if max_duration is not None or max_api_calls is not None:
+        budget = RunBudget(float(max_duration) if max_duration is not None else None,
+                           int(max_api_calls) if max_api_calls is not None else None)
+    
+    run_pipeline(df_companies, mode, demo_limit, in_memory, budget=budget)
 
-def collect_salesforce_stats(salesforce_file: str) -> dict:
+def collect_salesforce_stats(salesforce_data) -> dict:
     """
     Collecte les statistiques du fichier Salesforce généré
+    
+    Args:
+        salesforce_data: DataFrame Salesforce en mémoire, ou chemin du CSV
     """
     try:
-        df = pd.read_csv(salesforce_file)
+        if isinstance(salesforce_data, pd.DataFrame):
+            df = salesforce_data
+        else:
+            df = pd.read_csv(salesforce_data)
         
         # Statistiques de base
         total_entreprises = len(df)
@@ -500,7 +570,7 @@ def generate_markdown_report(stats: dict, mode: str, limit: int = None) -> tuple
     markdown_content += f"""
 ## 📁 Fichiers Générés
 
-- **Résultats INSEE :** `{stats['fichiers']['resultats_insee']}`
+- **Résultats INSEE :** `{stats['fichiers']['resultats_insee'] or "non sauvegardés (pipeline en mémoire)"}`
 - **Données Salesforce :** `{stats['fichiers']['donnees_salesforce']}`
 
 ## ⚙️ Configuration Technique
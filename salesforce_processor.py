@@ -3,9 +3,15 @@ Module de traitement des effectifs pour Salesforce
 Conversion des tranches INSEE en valeurs numériques + aide à la révision
 """
 
+import json
 import pandas as pd
 import numpy as np
 from typing import Dict, Tuple, Optional
+from src.budget import PENDING_STATUS
+from src.tranches import (
+    code_from_description, describe_tranche, to_tranche, tranche_from_descriptions,
+    tranche_description, tranche_midpoint, tranche_confidence
+)
 
 def process_insee_result_for_salesforce(organisation_original: str, taille_original: str, insee_result: dict) -> dict:
     """
@@ -15,7 +21,7 @@ def process_insee_result_for_salesforce(organisation_original: str, taille_origi
     effectifs_desc = extract_effectifs_from_insee_data(insee_result)
     
     # Convertir en numérique
-    valeur_numerique, confiance, _ = convert_tranche_to_numeric(effectifs_desc)
+    valeur_numerique, confiance = convert_tranche_to_numeric(effectifs_desc)
     
     # Déterminer le statut final basé sur la confiance et la cohérence
     categorie_insee = insee_result.get('categorie_insee_description', '')
@@ -65,41 +71,22 @@ def determine_smart_status(taille_original: str, categorie_insee: str, effectifs
     # Cas par défaut
     return 'TO_REVIEW'
 
-def convert_tranche_to_numeric(tranche_description: str) -> Tuple[Optional[int], str, str]:
+def convert_tranche_to_numeric(tranche_description: str) -> Tuple[Optional[float], str]:
     """
     Convertit une tranche d'effectifs INSEE en valeur numérique pour Salesforce
     
+    Le statut de révision est déterminé par determine_smart_status selon la cohérence.
+    
     Returns:
-        (valeur_numerique, confiance, statut_revision)
+        (valeur_numerique, confiance)
     """
-    if not tranche_description or tranche_description == 'Non renseigné':
-        return None, 'low', 'TO_REVIEW'
-    
-    # Mapping des tranches vers valeurs numériques (moyenne de la tranche)
-    tranche_mapping = {
-        '0 salarié': (0, 'high'),
-        '1 ou 2 salariés': (1.5, 'high'),      # Moyenne entre 1 et 2
-        '3 à 5 salariés': (4, 'high'),         # Moyenne entre 3 et 5
-        '6 à 9 salariés': (7.5, 'high'),       # Moyenne entre 6 et 9
-        '10 à 19 salariés': (15, 'high'),      # Moyenne entre 10 et 19
-        '20 à 49 salariés': (35, 'high'),      # Moyenne entre 20 et 49
-        '50 à 99 salariés': (75, 'high'),      # Moyenne entre 50 et 99
-        '100 à 199 salariés': (150, 'high'),   # Moyenne entre 100 et 199
-        '200 à 249 salariés': (225, 'high'),   # Moyenne entre 200 et 249
-        '250 à 499 salariés': (375, 'medium'), # Large fourchette
-        '500 à 999 salariés': (750, 'medium'), # Large fourchette
-        '1000 à 1999 salariés': (1500, 'medium'), # Large fourchette mais ok
-        '2000 à 4999 salariés': (3500, 'medium'),    # Large mais gérable
-        '5000 à 9999 salariés': (7500, 'low'),    # Très large
-        '10000 salariés et plus': (15000, 'low')   # Estimation
-    }
+    code = code_from_description(tranche_description)
+    if code is None or code == 'NN':
+        return None, 'low'
     
-    if tranche_description in tranche_mapping:
-        effectif_num, confiance = tranche_mapping[tranche_description]
-        # Le statut sera déterminé par determine_smart_status selon la cohérence
-        return effectif_num, confiance, 'PENDING'
-    else:
-        return None, 'low', 'TO_REVIEW'
+    # Moyenne de la tranche et confiance selon sa largeur (src/tranches.py)
+    tranche = describe_tranche(code)
+    return tranche['midpoint'], tranche['confidence']
 
 def extract_effectifs_from_insee_data(row) -> str:
     """
@@ -121,7 +108,6 @@ def extract_effectifs_from_insee_data(row) -> str:
     
     # 2. Essayer d'extraire depuis les données JSON brutes
     try:
-        import json
         etablissements_str = row.get('etablissements', '')
         if etablissements_str and isinstance(etablissements_str, str):
             etablissements = json.loads(etablissements_str)
@@ -156,34 +142,99 @@ def extract_effectifs_from_insee_data(row) -> str:
     
     return 'Non spécifié'
 
+def extract_tranche_codes_from_etablissements(etablissements: pd.Series) -> pd.Series:
+    """
+    Extrait les codes tranche d'effectifs depuis la colonne JSON brute 'etablissements'
+    
+    Chaque chaîne JSON distincte n'est parsée qu'une fois, puis la liste des
+    établissements est aplatie avec pd.json_normalize. Même priorité que
+    extract_effectifs_from_insee_data : premier siège avec une tranche
+    (établissement puis unité légale), sinon premier établissement.
+    """
+    result = pd.Series(np.nan, index=etablissements.index, dtype=object)
+    is_text = etablissements.map(lambda value: isinstance(value, str) and value != '').astype(bool)
+    if not is_text.any():
+        return result
+    
+    source_codes, uniques = pd.factorize(etablissements[is_text])
+    
+    documents = []
+    for source, text in enumerate(uniques):
+        try:
+            etabs = json.loads(text)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if isinstance(etabs, list) and etabs:
+            documents.append({'_source': source, 'etablissements': etabs})
+    
+    if not documents:
+        return result
+    
+    flat = pd.json_normalize(documents, record_path='etablissements', meta=['_source'])
+    flat = flat.reindex(columns=[
+        '_source',
+        'etablissementSiege',
+        'trancheEffectifsEtablissement',
+        'uniteLegale.trancheEffectifsUniteLegale'
+    ])
+    
+    # Tranche établissement puis unité légale (chaînes vides ignorées)
+    tranche_etab = flat['trancheEffectifsEtablissement'].replace('', np.nan)
+    tranche_ul = flat['uniteLegale.trancheEffectifsUniteLegale'].replace('', np.nan)
+    flat['code'] = tranche_etab.combine_first(tranche_ul)
+    
+    siege = flat['etablissementSiege'].fillna(False).astype(bool)
+    first_etab = flat.groupby('_source').cumcount() == 0
+    
+    code_siege = flat[siege & flat['code'].notna()].groupby('_source')['code'].first()
+    code_first = flat[first_etab].set_index('_source')['code']
+    code_by_source = code_siege.combine_first(code_first).reindex(range(len(uniques)))
+    
+    result[is_text] = code_by_source.to_numpy()[source_codes]
+    return result
+
+def extract_tranches(df: pd.DataFrame) -> pd.Series:
+    """
+    Version vectorisée de extract_effectifs_from_insee_data : codes tranche
+    (catégorie ordonnée, NaN si non trouvé ou sans tranche) pour tout un DataFrame
+    """
+    statut = df['Statut_Recherche'] if 'Statut_Recherche' in df.columns else pd.Series('', index=df.index)
+    not_found = statut.fillna('').astype(str).str.contains('Non trouvé|Erreur')
+    
+    # Priorités : unité légale, établissement, puis JSON brut
+    codes = pd.Series(np.nan, index=df.index, dtype=object)
+    for col in ['tranche_effectifs_unite_legale', 'tranche_effectifs_etablissement']:
+        if col in df.columns:
+            codes = codes.combine_first(df[col].astype(object))
+    
+    if 'etablissements' in df.columns:
+        need_json = codes.isna() & ~not_found
+        if need_json.any():
+            codes[need_json] = extract_tranche_codes_from_etablissements(df.loc[need_json, 'etablissements'])
+    
+    codes[not_found] = np.nan
+    return to_tranche(codes)
+
+def describe_tranches(tranches: pd.Series) -> pd.Series:
+    """Descriptions des tranches pour l'export, 'Non spécifié' si absente"""
+    descriptions = tranche_description(tranches)
+    return descriptions.cat.add_categories(['Non spécifié']).fillna('Non spécifié')
+
+def extract_effectifs_descriptions(df: pd.DataFrame) -> pd.Series:
+    """
+    Version vectorisée de extract_effectifs_from_insee_data sur tout un DataFrame
+    """
+    return describe_tranches(extract_tranches(df))
+
 def convert_insee_code_to_description(code: str) -> str:
     """
     Convertit un code tranche INSEE en description lisible
     """
-    if not code or pd.isna(code):
+    if code is None or pd.isna(code) or code == '':
         return 'Non spécifié'
     
-    # Mapping des codes INSEE vers descriptions
-    code_mapping = {
-        'NN': 'Non renseigné',
-        '00': '0 salarié',
-        '01': '1 ou 2 salariés', 
-        '02': '3 à 5 salariés',
-        '03': '6 à 9 salariés',
-        '11': '10 à 19 salariés',
-        '12': '20 à 49 salariés',
-        '21': '50 à 99 salariés',
-        '22': '100 à 199 salariés',
-        '31': '200 à 249 salariés',
-        '32': '250 à 499 salariés',
-        '41': '500 à 999 salariés',
-        '42': '1000 à 1999 salariés',
-        '51': '2000 à 4999 salariés',
-        '52': '5000 à 9999 salariés',
-        '53': '10000 salariés et plus'
-    }
-    
-    return code_mapping.get(str(int(float(code))) if str(code).replace('.','').isdigit() else str(code), f'Code inconnu: {code}')
+    description = describe_tranche(code)['description']
+    return description if description else f'Code inconnu: {code}'
 
 def analyze_data_quality(row) -> str:
     """
@@ -194,6 +245,10 @@ def analyze_data_quality(row) -> str:
     categorie_insee = row.get('Categorie_Entreprise_INSEE', '')
     effectifs_desc = row.get('Effectifs_Description', '')
     
+    # Cas 0: Recherche non effectuée (budget d'exécution épuisé)
+    if statut == PENDING_STATUS:
+        return PENDING_STATUS
+    
     # Cas 1: Non trouvé dans INSEE
     if statut != 'Trouvé':
         return 'NOT_FOUND'
@@ -229,7 +284,7 @@ def check_size_coherence(taille_original: str, categorie_insee: str, effectifs_d
     }
     
     # Extraire la valeur numérique des effectifs
-    effectif_num, _, _ = convert_tranche_to_numeric(effectifs_desc)
+    effectif_num, _ = convert_tranche_to_numeric(effectifs_desc)
     
     if effectif_num is None:
         return 'incomplete'
@@ -245,40 +300,96 @@ def check_size_coherence(taille_original: str, categorie_insee: str, effectifs_d
     
     return 'unknown'
 
-def create_salesforce_ready_data(input_file: str, output_file: str):
+# Colonnes lues par les règles de statut, de score et de notes
+DERIVED_KEY_COLUMNS = [
+    'Statut_Recherche',
+    'Taille_Original',
+    'Categorie_Entreprise',
+    'Categorie_Entreprise_INSEE',
+    'Effectifs_Description',
+    'Effectifs_Salesforce',
+    'Confiance_Donnee',
+    'Annee_Effectifs'
+]
+
+def build_derived_lookup(df: pd.DataFrame, key_columns: list, rules: list) -> pd.DataFrame:
+    """
+    Calcule des colonnes dérivées une seule fois par combinaison de colonnes clés
+    
+    Les règles (nom_colonne, fonction_ligne) sont appliquées dans l'ordre sur la petite
+    table des combinaisons uniques, chaque règle voyant les colonnes déjà calculées.
+    Seules les colonnes clés présentes dans df sont utilisées.
+    
+    Returns:
+        DataFrame aligné sur df avec une colonne par règle
+    """
+    present_keys = [col for col in key_columns if col in df.columns]
+    keys = df[present_keys]
+    codes = keys.groupby(present_keys, dropna=False, sort=False, observed=True).ngroup().to_numpy()
+    
+    # Première occurrence de chaque combinaison, rangée selon son code
+    first_rows = ~pd.Series(codes).duplicated().to_numpy()
+    table = keys[first_rows].copy()
+    table.index = codes[first_rows]
+    table = table.sort_index()
+    
+    for col, rule in rules:
+        table[col] = table.apply(rule, axis=1)
+    
+    rule_columns = [col for col, _ in rules]
+    return pd.DataFrame(
+        {col: table[col].to_numpy()[codes] for col in rule_columns},
+        index=df.index
+    )
+
+def create_salesforce_ready_data(input_data, output_file: Optional[str] = None):
     """
     Traite les données INSEE et crée un fichier prêt pour Salesforce
+    
+    Args:
+        input_data: Chemin du CSV de résultats INSEE, ou DataFrame déjà en mémoire
+        output_file: Fichier de sortie (optionnel, aucune écriture si None)
+    
+    Returns:
+        DataFrame prêt pour Salesforce, ou None en cas d'erreur
     """
     print("📊 Traitement des données pour Salesforce...")
     
     try:
-        # Charger les données
-        df = pd.read_csv(input_file)
-        print(f"📄 Fichier chargé: {len(df)} entreprises")
+        # Charger les données (sauf si elles sont déjà en mémoire)
+        if isinstance(input_data, pd.DataFrame):
+            df = input_data.copy()
+            print(f"📄 Données en mémoire: {len(df)} entreprises")
+        else:
+            df = pd.read_csv(input_data)
+            print(f"📄 Fichier chargé: {len(df)} entreprises")
         
         # Ajouter les nouvelles colonnes
         print("🔄 Conversion des tranches d'effectifs...")
         
         # Créer la colonne Effectifs_Description pour le traitement
         # Essayer d'extraire les effectifs depuis les données INSEE brutes
+        # La tranche circule sous forme de code catégoriel ; les descriptions
+        # ne sont produites que pour l'export
         if 'Effectifs_Description' not in df.columns:
             print("🔍 Extraction des effectifs depuis les données INSEE...")
-            df['Effectifs_Description'] = df.apply(lambda row: extract_effectifs_from_insee_data(row), axis=1)
+            tranches = extract_tranches(df)
+            df['Effectifs_Description'] = describe_tranches(tranches)
             
             # Compter les effectifs trouvés
-            found_effectifs = df[df['Effectifs_Description'] != 'Non spécifié'].shape[0]
+            found_effectifs = int(tranches.notna().sum())
             print(f"✅ Effectifs extraits pour {found_effectifs}/{len(df)} entreprises ({found_effectifs/len(df)*100:.1f}%)")
+        else:
+            tranches = tranche_from_descriptions(df['Effectifs_Description'])
         
         # Convertir les tranches en valeurs numériques
         if 'Effectifs_Numerique' not in df.columns:
             print("🔧 Conversion standard des tranches d'effectifs")
-            df[['Effectifs_Salesforce', 'Confiance_Donnee', 'temp_status']] = df['Effectifs_Description'].apply(
-                lambda x: pd.Series(convert_tranche_to_numeric(x))
-            )
+            df['Effectifs_Salesforce'] = tranche_midpoint(tranches)
+            df['Confiance_Donnee'] = tranche_confidence(tranches)
         else:
             print("🔧 Utilisation des effectifs pré-calculés")
             # Les effectifs ont déjà été calculés par le processeur optimisé
-            df['temp_status'] = 'processed'
         
         # Analyser la qualité des données
         print("🔍 Analyse de la qualité des données...")
@@ -291,23 +402,28 @@ def create_salesforce_ready_data(input_file: str, output_file: str):
             df['Confiance_Donnee'] = df['Confiance_Effectifs']
             # Appliquer la logique intelligente de statut même sur les données pré-traitées
             print("🎯 Application de la logique intelligente de statuts...")
-            df['Statut_Revision'] = df.apply(lambda row: determine_smart_status(
+            # Lignes PENDING (budget épuisé) : statut conservé, à reprendre
+            status_rule = lambda row: PENDING_STATUS if row.get('Statut_Recherche') == PENDING_STATUS else determine_smart_status(
                 row.get('Taille_Original', ''),
                 row.get('Categorie_Entreprise', ''),
                 row.get('Effectifs_Description', ''),
                 row.get('Confiance_Donnee', 'low')
-            ), axis=1)
+            )
         else:
             print("🔧 Traitement standard des données brutes")
             # Traitement standard pour données brutes
-            df['Statut_Revision'] = df.apply(analyze_data_quality, axis=1)
-        
-        # Supprimer la colonne temporaire
-        df = df.drop('temp_status', axis=1)
+            status_rule = analyze_data_quality
         
-        # Ajouter des colonnes d'aide
-        df['Match_Score'] = df.apply(calculate_match_score, axis=1)
-        df['Notes_Revision'] = df.apply(generate_revision_notes, axis=1)
+        # Statut, score et notes ne dépendent que de quelques colonnes à faible
+        # cardinalité : calcul une fois par combinaison puis jointure sur les lignes
+        derived = build_derived_lookup(df, DERIVED_KEY_COLUMNS, [
+            ('Statut_Revision', status_rule),
+            ('Match_Score', calculate_match_score),
+            ('Notes_Revision', generate_revision_notes)
+        ])
+        df['Statut_Revision'] = derived['Statut_Revision']
+        df['Match_Score'] = derived['Match_Score']
+        df['Notes_Revision'] = derived['Notes_Revision'].astype('category')
         
         # Réorganiser les colonnes pour Salesforce
         columns_order = [
@@ -336,8 +452,9 @@ def create_salesforce_ready_data(input_file: str, output_file: str):
         existing_columns = [col for col in columns_order if col in df.columns]
         df_final = df[existing_columns]
         
-        # Sauvegarder
-        df_final.to_csv(output_file, index=False, encoding='utf-8')
+        # Sauvegarder (optionnel en mode pipeline en mémoire)
+        if output_file:
+            df_final.to_csv(output_file, index=False, encoding='utf-8')
         
         # Statistiques
         print(f"\n📈 STATISTIQUES POUR SALESFORCE:")
@@ -365,7 +482,8 @@ def create_salesforce_ready_data(input_file: str, output_file: str):
         for conf, count in confiance_counts.items():
             print(f"   {conf}: {count} ({count/len(df_final)*100:.1f}%)")
         
-        print(f"\n✅ Fichier Salesforce créé: {output_file}")
+        if output_file:
+            print(f"\n✅ Fichier Salesforce créé: {output_file}")
         
         return df_final
         
@@ -409,6 +527,8 @@ def generate_revision_notes(row) -> str:
     
     if statut == 'NOT_FOUND':
         notes.append("❌ Entreprise non trouvée dans INSEE - vérifier nom/orthographe")
+    elif statut == PENDING_STATUS:
+        notes.append("⏸️ Recherche non effectuée (budget épuisé) - à reprendre")
     elif statut == 'MISSING_EFFECTIFS':
         notes.append("⚠️ Trouvée mais effectifs non renseignés - recherche manuelle nécessaire")
     elif statut == 'CONFLICT_TO_REVIEW':
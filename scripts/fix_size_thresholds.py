@@ -23,6 +23,11 @@ import sys
 import logging
 from pathlib import Path
 
+# Ajouter le répertoire src au path pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from src.tranches import code_from_description, describe_tranche
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -40,27 +45,9 @@ def parse_effectifs_from_description(effectifs_description):
     if pd.isna(effectifs_description) or effectifs_description == '':
         return None
     
-    # Mapping des tranches INSEE vers valeurs numériques
-    tranche_mapping = {
-        '0 à 2 salariés': 1,
-        '3 à 5 salariés': 4,
-        '6 à 9 salariés': 7.5,
-        '10 à 19 salariés': 15,
-        '20 à 49 salariés': 35,
-        '50 à 99 salariés': 75,
-        '100 à 199 salariés': 150,
-        '200 à 249 salariés': 225,
-        '250 à 499 salariés': 375,
-        '500 à 999 salariés': 750,
-        '1000 à 1999 salariés': 1500,
-        '2000 à 4999 salariés': 3500,
-        '5000 à 9999 salariés': 7500,
-        '10000 salariés et plus': 15000,
-        'Non renseigné': None
-    }
-    
-    effectifs_clean = str(effectifs_description).strip()
-    return tranche_mapping.get(effectifs_clean, None)
+    # Table de référence partagée des tranches INSEE (src/tranches.py)
+    code = code_from_description(effectifs_description)
+    return describe_tranche(code)['midpoint'] if code else None
 
 def fix_size_classification(effectifs_description, original_size, old_effectifs_salesforce=None):
     """
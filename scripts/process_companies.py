@@ -17,15 +17,26 @@ import argparse
 import logging
 import sys
 import os
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, Optional
 
 # Ajouter le répertoire src au path pour les imports
 sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
-from src.insee_client import INSEEClient
+from src.insee_client import NEGATIVE_TTL_HOURS, INSEEClient
+from src.budget import PENDING_STATUS, RunBudget
 from src.data_processor import DataProcessor
 from src.salesforce_export import SalesforceExporter
+from src.refresh import EntityRefresher
+from src.manifest import load_previous, match_previous, merge_results, row_fingerprints, save_manifest
+from src.normalize import normalize_company_names
+from src.work_queue import WorkQueue
+from src.pipeline import PipelinedRunner
+from src.planner import RunPlanner, combine_forecasts, log_forecast
+from src.sharding import HashRing, SHARD_ROW_COLUMN, merge_shard_outputs, shard_output_path, shard_path
 
 def setup_logging(verbose: bool = False):
     """Configure le logging"""
@@ -38,6 +49,21 @@ def setup_logging(verbose: bool = False):
         ]
     )
 
+def parse_negative_ttl(text: str) -> Dict[str, float]:
+    """Validité des négatifs par cause, ex. 'not_found=720,http_error=12' (heures)"""
+    ttl_hours = {}
+    for item in text.split(','):
+        reason, _, hours = item.partition('=')
+        reason = reason.strip()
+        if reason not in NEGATIVE_TTL_HOURS:
+            raise argparse.ArgumentTypeError(
+                f"cause inconnue '{reason}' (attendu: {', '.join(NEGATIVE_TTL_HOURS)})")
+        try:
+            ttl_hours[reason] = float(hours)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"durée invalide pour {reason}: '{hours}'")
+    return ttl_hours
+
 def validate_input_file(file_path: str, company_col: str, size_col: str = None) -> tuple:
     """Valide et charge le fichier d'entrée"""
     if not os.path.exists(file_path):
@@ -69,18 +95,74 @@ def validate_input_file(file_path: str, company_col: str, size_col: str = None)
     
     return df, size_col  # Retourner aussi size_col modifié
 
+def lookup_priority(df: pd.DataFrame, prioritize: bool = False, priority_col: str = None):
+    """
+    Poids des lignes pour l'ordre des recherches (None = ordre du fichier)
+    
+    Par défaut chaque ligne compte pour 1 : les noms couvrant le plus de lignes
+    passent en premier. Avec une colonne de priorité, ses valeurs numériques
+    servent de poids (valeurs manquantes ou non numériques = 0).
+    """
+    if priority_col:
+        if priority_col not in df.columns:
+            raise ValueError(f"Colonne de priorité '{priority_col}' non trouvée. Colonnes disponibles: {list(df.columns)}")
+        return pd.to_numeric(df[priority_col], errors='coerce').fillna(0.0)
+    if prioritize:
+        return pd.Series(1.0, index=df.index)
+    return None
+
+def default_output_file(input_file: str, demo_limit: int = None) -> str:
+    """Fichier de sortie par défaut: output/[input]_enriched.csv"""
+    input_path = Path(input_file)
+    if demo_limit:
+        return f"output/demo_{demo_limit}_{input_path.stem}_enriched.csv"
+    return f"output/{input_path.stem}_enriched.csv"
+
 def process_companies_pipeline(input_file: str, 
                              company_col: str, 
                              size_col: str = None,
                              output_file: str = None,
                              delay: float = 4.0,
-                             demo_limit: int = None) -> str:
+                             demo_limit: int = None,
+                             cache_db: str = None,
+                             dedup_entities: bool = False,
+                             negative_retry_budget: int = 100,
+                             negative_ttl_hours: Dict[str, float] = None,
+                             refresh_budget: int = 0,
+                             incremental: bool = False,
+                             archive_db: str = None,
+                             reextract: bool = False,
+                             rate_limit_db: str = None,
+                             shards: int = 1,
+                             shard_index: int = None,
+                             queue_db: str = None,
+                             workers: int = 1,
+                             pipelined: bool = False,
+                             batch_size: int = 200,
+                             prioritize: bool = False,
+                             priority_col: str = None,
+                             max_duration: float = None,
+                             max_api_calls: int = None,
+                             plan: bool = False) -> Optional[str]:
     """
     Pipeline complet de traitement des entreprises
     
+    Avec shard_index, seules les lignes dont le nom appartient au shard sont
+    traitées (cache et archive partitionnés), vers une sortie partielle.
+    Avec prioritize ou priority_col, les noms couvrant le plus de lignes (ou
+    de priorité cumulée) sont recherchés en premier.
+    
+    Avec max_duration ou max_api_calls, plus aucune requête ne part une fois
+    le budget épuisé : les lignes non résolues sont écrites en PENDING et le
+    manifeste sert de point de reprise (relance avec incremental).
+    
+    Avec plan, seule la prévision (appels API, durée) est affichée : les
+    caches sont consultés, aucun appel réseau n'est fait ni fichier écrit.
+    
     Returns:
-        Chemin du fichier de sortie généré
+        Chemin du fichier de sortie généré (None avec plan)
     """
+    budget = RunBudget(max_duration, max_api_calls) if max_duration is not None or max_api_calls is not None else None
     
     # 1. Validation et chargement
     logging.info("🔍 Validation du fichier d'entrée...")
@@ -91,46 +173,228 @@ def process_companies_pipeline(input_file: str,
         df = df.head(demo_limit)
         logging.info(f"🧪 Mode démo: limité à {demo_limit} entreprises")
     
+    # Nom du fichier de sortie (nécessaire pour retrouver le résultat précédent)
+    if not output_file:
+        output_file = default_output_file(input_file, demo_limit)
+    
+    # Mode shard : noms attribués par hachage cohérent, partitions propres au shard
+    source_rows = None
+    if shard_index is not None:
+        keys = normalize_company_names(df[company_col].map(str).str.strip())
+        in_shard = HashRing(shards).assign(keys) == shard_index
+        source_rows = np.flatnonzero(in_shard)
+        df = df[in_shard]
+        output_file = shard_output_path(output_file, shard_index, shards)
+        cache_db = shard_path(cache_db, shard_index) if cache_db else None
+        archive_db = shard_path(archive_db, shard_index) if archive_db else None
+        logging.info(f"🧩 Shard {shard_index + 1}/{shards}: {len(df)} lignes ({keys[in_shard].nunique()} noms)")
+    
+    # Empreintes des lignes d'entrée sur les colonnes utilisées
+    used_cols = [company_col] + ([size_col] if size_col else [])
+    fingerprints = row_fingerprints(df, used_cols)
+    
+    # Mode incrémental : seules les lignes nouvelles ou modifiées sont traitées
+    positions = None
+    if incremental:
+        if dedup_entities:
+            logging.warning("⚠️ --incremental ignoré avec --dedup-entities (lignes non alignées sur l'entrée)")
+        else:
+            previous = load_previous(output_file, used_cols)
+            if previous:
+                previous_fingerprints, df_previous = previous
+                # Lignes PENDING d'une exécution interrompue par son budget : à reprendre
+                redo = None
+                if 'Statut_Recherche' in df_previous.columns:
+                    redo = (df_previous['Statut_Recherche'] == PENDING_STATUS).to_numpy()
+                positions = match_previous(fingerprints, previous_fingerprints, redo=redo)
+                todo = positions < 0
+                logging.info(f"♻️ Mode incrémental: {int(todo.sum())} lignes nouvelles ou modifiées sur {len(df)}")
+                df = df[todo]
+    
+    priority = lookup_priority(df, prioritize, priority_col)
+    if priority is not None:
+        logging.info(f"🎯 Ordre des recherches: {f'priorité cumulée ({priority_col})' if priority_col else 'lignes couvertes'}")
+    
+    if plan:
+        log_forecast(plan_pipeline(df, company_col, priority, cache_db=cache_db, archive_db=archive_db,
+                                   delay=delay, negative_retry_budget=negative_retry_budget,
+                                   negative_ttl_hours=negative_ttl_hours,
+                                   reextract=reextract, workers=workers, shards=shards,
+                                   shard_index=shard_index, max_duration=max_duration,
+                                   max_api_calls=max_api_calls))
+        return None
+    
     # 2. Initialisation des composants
     logging.info("⚙️ Initialisation des composants...")
-    insee_client = INSEEClient(delay_between_requests=delay)
+    insee_client = INSEEClient(delay_between_requests=delay, cache_path=cache_db,
+                               negative_ttl_hours=negative_ttl_hours,
+                               negative_retry_budget=negative_retry_budget,
+                               archive_path=archive_db, offline=reextract,
+                               rate_limit_path=rate_limit_db, budget=budget)
+    
     processor = DataProcessor(insee_client)
     exporter = SalesforceExporter()
+    queue = WorkQueue(queue_db) if queue_db else None
     
-    # 3. Traitement INSEE
-    logging.info("🚀 Début du traitement INSEE...")
-    df_enriched = processor.process_companies(df, company_col, size_col)
-    
-    # 4. Transformation Salesforce
-    logging.info("🔄 Transformation pour Salesforce...")
-    df_salesforce = exporter.transform_for_salesforce(df_enriched)
+    # Rafraîchissement au fil de l'eau des entités en cache les plus anciennes
+    if cache_db and refresh_budget and not reextract:
+        logging.info(f"♻️ Rafraîchissement du cache (budget: {refresh_budget} requêtes)...")
+        EntityRefresher(insee_client).run(max_calls=refresh_budget)
     
-    # 5. Génération du nom de fichier de sortie
-    if not output_file:
-        input_path = Path(input_file)
-        if demo_limit:
-            output_file = f"output/demo_{demo_limit}_{input_path.stem}_enriched.csv"
+    if pipelined:
+        # 3-6. Recherche, transformation et écriture en parallèle, lot par lot
+        logging.info(f"🚀 Traitement en pipeline (lots de {batch_size} lignes)...")
+        PipelinedRunner(processor, exporter, batch_size=batch_size, workers=workers).run(
+            df, company_col, size_col, output_file
+        )
+        logging.info(f"✅ Fichier enrichi sauvegardé: {output_file}")
+        save_manifest(output_file, fingerprints, used_cols)
+    else:
+        if len(df):
+            # 3. Traitement INSEE
+            logging.info("🚀 Début du traitement INSEE...")
+            df_enriched = processor.process_companies(df, company_col, size_col, queue=queue,
+                                                      workers=workers, priority=priority)
+            
+            # 4. Transformation Salesforce
+            logging.info("🔄 Transformation pour Salesforce...")
+            df_salesforce = exporter.transform_for_salesforce(df_enriched)
+            if dedup_entities:
+                df_salesforce = exporter.deduplicate_by_entity(df_salesforce)
         else:
-            output_file = f"output/{input_path.stem}_enriched.csv"
-    
-    # Créer le répertoire de sortie
-    output_path = Path(output_file)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+            logging.info("✅ Aucune ligne à traiter (nouvelle ou modifiée)")
+            df_salesforce = pd.DataFrame()
+        
+        # 5. Fusion avec le résultat précédent (mode incrémental)
+        if positions is not None:
+            df_salesforce = merge_results(positions, df_previous, df_salesforce)
+        
+        # Sortie partielle : position de chaque ligne dans l'entrée, pour la fusion
+        if source_rows is not None:
+            df_salesforce.insert(0, SHARD_ROW_COLUMN, source_rows)
+        
+        # Créer le répertoire de sortie
+        output_path = Path(output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # 6. Sauvegarde
+        df_salesforce.to_csv(output_file, index=False, encoding='utf-8')
+        logging.info(f"✅ Fichier enrichi sauvegardé: {output_file}")
+        if not dedup_entities and source_rows is None:
+            save_manifest(output_file, fingerprints, used_cols)
     
-    # 6. Sauvegarde
-    df_salesforce.to_csv(output_file, index=False, encoding='utf-8')
-    logging.info(f"✅ Fichier enrichi sauvegardé: {output_file}")
     
     # 7. Statistiques finales
     stats = insee_client.get_stats()
     logging.info(f"\n📊 STATISTIQUES FINALES:")
     logging.info(f"   🔗 Appels API: {stats['api_calls']}")
-    logging.info(f"   💾 Cache hits: {stats['cache_hits']}")
+    if reextract:
+        logging.info(f"   📦 Requêtes absentes de l'archive: {stats['archive_misses']}")
+    logging.info(f"   💾 Cache hits: {stats['cache_hits']} (mémoire: {stats['cache_l1_hits']}, persistant: {stats['cache_l2_hits']})")
+    logging.info(f"   🔁 Requêtes déjà envoyées (cache requêtes): {stats['query_cache_hits']}")
     logging.info(f"   ✅ Taux de réussite: {stats['success_rate_percent']}%")
     logging.info(f"   ⚡ Efficacité cache: {stats['cache_rate_percent']}%")
+    logging.info(f"   🚫 Négatifs en cache: {stats['negative_hits']} | re-tentés: {stats['negative_retries']}")
+    if cache_db:
+        logging.info(f"   🌸 Introuvables connus (filtre de Bloom): {stats['bloom_hits']}")
+    if workers > 1:
+        logging.info(f"   🔀 Recherches concurrentes regroupées: {stats['coalesced']}")
+    if len(stats['api_keys']) > 1:
+        for key, key_stats in stats['api_keys'].items():
+            logging.info(f"   🔑 Clé {key}: {key_stats['requests']} requêtes, {key_stats['throttled']} limitées (429)")
+    if budget is not None:
+        logging.info(f"   ⏱️  Budget: {budget.calls} appels en {budget.elapsed() / 60:.1f} min")
+        if budget.reason:
+            logging.info(f"   ⏸️  Budget épuisé ({budget.reason}): lignes non résolues marquées {PENDING_STATUS}, "
+                         f"relancer avec --incremental (même --output) pour les reprendre")
+    
+    insee_client.close()
+    if queue is not None:
+        queue.close()
     
     return output_file
 
+def plan_pipeline(df: pd.DataFrame, company_col: str, priority: Optional[pd.Series], cache_db: str = None,
+                  archive_db: str = None, delay: float = 4.0, negative_retry_budget: int = 100,
+                  negative_ttl_hours: Dict[str, float] = None, reextract: bool = False, workers: int = 1, shards: int = 1, shard_index: int = None,
+                  max_duration: float = None, max_api_calls: int = None) -> dict:
+    """
+    Prévision d'exécution, caches ouverts en lecture seule (ni clé API ni fichier écrit)
+    
+    Sans shard_index, des shards sont lancés par run_local_shards : chaque
+    partition de cache est prévue avec ses lignes et sa part du budget d'appels,
+    puis les prévisions sont cumulées.
+    """
+    partitions = [(df, cache_db, archive_db, max_api_calls)]
+    if shards > 1 and shard_index is None:
+        assigned = HashRing(shards).assign(normalize_company_names(df[company_col].map(str).str.strip()))
+        share = -(-max_api_calls // shards) if max_api_calls is not None else None
+        partitions = [
+            (df[assigned == index],
+             shard_path(cache_db, index) if cache_db else None,
+             shard_path(archive_db, index) if archive_db else None,
+             share)
+            for index in range(shards)
+        ]
+    
+    forecasts = []
+    for part, part_cache, part_archive, part_calls in partitions:
+        client = INSEEClient(delay_between_requests=delay, cache_path=part_cache,
+                             negative_ttl_hours=negative_ttl_hours,
+                             negative_retry_budget=negative_retry_budget,
+                             archive_path=part_archive, offline=reextract, read_only=True)
+        planner = RunPlanner(client, workers=workers, shards=shards)
+        forecasts.append(planner.plan(part[company_col],
+                                      priority=priority.loc[part.index] if priority is not None else None,
+                                      max_api_calls=part_calls, max_duration=max_duration))
+        client.close()
+    return combine_forecasts(forecasts)
+
+def merge_shards(input_file: str, company_col: str, size_col: str = None, output_file: str = None,
+                 demo_limit: int = None, shards: int = 1) -> str:
+    """
+    Fusionne les sorties partielles des shards dans l'ordre du fichier d'entrée
+    
+    Returns:
+        Chemin du fichier de sortie fusionné
+    """
+    df, size_col = validate_input_file(input_file, company_col, size_col)
+    if demo_limit:
+        df = df.head(demo_limit)
+    output_file = output_file or default_output_file(input_file, demo_limit)
+    
+    merged = merge_shard_outputs(output_file, shards)
+    if len(merged) != len(df):
+        raise ValueError(f"Sorties partielles incomplètes: {len(merged)} lignes pour {len(df)} en entrée")
+    
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    merged.to_csv(output_file, index=False, encoding='utf-8')
+    used_cols = [company_col] + ([size_col] if size_col else [])
+    save_manifest(output_file, row_fingerprints(df, used_cols), used_cols)
+    logging.info(f"✅ Fichier fusionné sauvegardé: {output_file}")
+    return output_file
+
+def run_local_shards(shards: int, **pipeline_args) -> str:
+    """
+    Lance un processus par shard sur cette machine puis fusionne les sorties
+    
+    Les workers partagent le budget de requêtes (par clé API) via le seau SQLite ;
+    le budget d'appels API de l'exécution est réparti entre les shards.
+    """
+    if pipeline_args.get('max_api_calls') is not None:
+        pipeline_args = {**pipeline_args, 'max_api_calls': -(-pipeline_args['max_api_calls'] // shards)}
+    with ProcessPoolExecutor(max_workers=shards) as executor:
+        futures = [
+            executor.submit(process_companies_pipeline, **pipeline_args, shards=shards, shard_index=index)
+            for index in range(shards)
+        ]
+        for future in futures:
+            future.result()
+    
+    return merge_shards(pipeline_args['input_file'], pipeline_args['company_col'],
+                        size_col=pipeline_args['size_col'], output_file=pipeline_args['output_file'],
+                        demo_limit=pipeline_args['demo_limit'], shards=shards)
+
 def main():
     """Point d'entrée principal"""
     parser = argparse.ArgumentParser(
@@ -154,9 +418,44 @@ Exemples d'utilisation:
 5. Délai personnalisé (plus rapide, plus risqué):
    python scripts/process_companies.py data/companies.csv --company-col "Company Name" --delay 2.0
 
+6. Cache persistant entre exécutions:
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --cache-db cache/insee.sqlite
+
+7. Archive des réponses brutes, puis ré-extraction hors ligne (aucun appel API):
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --archive-db cache/responses.sqlite
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --archive-db cache/responses.sqlite --reextract
+
+8. Relance incrémentale (seules les lignes modifiées sont enrichies):
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --incremental
+
+9. Traitement réparti en 4 shards (processus locaux, cache partitionné), puis fusion:
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --cache-db cache/insee.sqlite --shards 4
+
+10. Shards sur plusieurs machines (système de fichiers partagé): un shard par machine, puis fusion:
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --shards 4 --shard-index 0
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --shards 4 --merge-shards
+
+11. File de travail partagée (reprise après arrêt, workers supplémentaires avec scripts/queue_worker.py):
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --queue-db queue/companies.sqlite
+
+12. Pipeline par lots (sortie écrite au fil de l'eau):
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --pipelined --batch-size 200
+
+13. Noms les plus fréquents (ou les plus prioritaires) recherchés en premier:
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --prioritize
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --priority-col "Pipeline Value"
+
+14. Exécution limitée à 1h et 500 appels API, puis reprise des lignes PENDING:
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --max-duration 3600 --max-api-calls 500
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --incremental --max-duration 3600
+
+15. Prévision avant un gros traitement (appels API et durée estimés, aucun appel réseau):
+   python scripts/process_companies.py data/companies.csv --company-col "Company Name" --cache-db cache/insee.sqlite --plan
+
 Configuration requise:
 - Fichier .env avec SIRENE_API_KEY=votre_clé_api
 - Ou variable d'environnement SIRENE_API_KEY
+- Plusieurs clés (débit cumulé): SIRENE_API_KEYS=clé1,clé2
         """
     )
     
@@ -176,6 +475,71 @@ Configuration requise:
                        type=float, 
                        default=4.0,
                        help='Délai entre requêtes API en secondes (défaut: 4.0)')
+    parser.add_argument('--rate-limit-db',
+                       help='Fichier SQLite du budget de requêtes partagé entre exécutions simultanées (défaut: répertoire temporaire)')
+    parser.add_argument('--cache-db',
+                       help='Fichier SQLite du cache persistant (défaut: cache mémoire uniquement)')
+    parser.add_argument('--negative-retry-budget',
+                       type=int,
+                       default=100,
+                       help='Nombre max de noms introuvables expirés re-tentés par exécution (défaut: 100)')
+    parser.add_argument('--negative-ttl-hours',
+                       type=parse_negative_ttl,
+                       help='Validité des résultats négatifs par cause, en heures '
+                            f"(ex. not_found=720,http_error=12 ; défaut: "
+                            f"{','.join(f'{reason}={hours}' for reason, hours in NEGATIVE_TTL_HOURS.items())})")
+    parser.add_argument('--refresh-budget',
+                       type=int,
+                       default=0,
+                       help='Avec --cache-db: requêtes consacrées au rafraîchissement des entités en cache (défaut: 0)')
+    parser.add_argument('--incremental',
+                       action='store_true',
+                       help='Ne traiter que les lignes nouvelles ou modifiées depuis le dernier résultat (même --output)')
+    parser.add_argument('--archive-db',
+                       help='Fichier SQLite où archiver les réponses Sirene brutes (compressées)')
+    parser.add_argument('--reextract',
+                       action='store_true',
+                       help='Reconstruire la sortie depuis --archive-db, sans aucun appel API')
+    parser.add_argument('--shards',
+                       type=int,
+                       default=1,
+                       help='Répartir les noms entre N shards (hachage cohérent), un processus par shard (défaut: 1)')
+    parser.add_argument('--shard-index',
+                       type=int,
+                       help='Avec --shards: ne traiter que ce shard (0 à N-1), vers une sortie partielle')
+    parser.add_argument('--merge-shards',
+                       action='store_true',
+                       help='Avec --shards: fusionner les sorties partielles existantes, sans traitement')
+    parser.add_argument('--workers',
+                       type=int,
+                       default=1,
+                       help='Threads de recherche en parallèle, sous le budget de requêtes partagé (défaut: 1)')
+    parser.add_argument('--pipelined',
+                       action='store_true',
+                       help='Recherche, transformation et écriture en parallèle par lots (résultats visibles au fil de l\'eau)')
+    parser.add_argument('--batch-size',
+                       type=int,
+                       default=200,
+                       help='Avec --pipelined: nombre de lignes par lot (défaut: 200)')
+    parser.add_argument('--prioritize',
+                       action='store_true',
+                       help='Rechercher d\'abord les noms couvrant le plus de lignes')
+    parser.add_argument('--priority-col',
+                       help='Rechercher d\'abord les noms de plus forte priorité cumulée (colonne numérique)')
+    parser.add_argument('--max-duration',
+                       type=float,
+                       help='Durée maximale en secondes : au-delà, plus aucune requête et lignes restantes en PENDING')
+    parser.add_argument('--max-api-calls',
+                       type=int,
+                       help='Nombre maximal d\'appels API (réparti entre --shards) ; lignes restantes en PENDING')
+    parser.add_argument('--plan',
+                       action='store_true',
+                       help='Prévoir appels API et durée depuis les caches, sans appel réseau ni traitement')
+    parser.add_argument('--queue-db',
+                       help='Fichier SQLite de file de travail durable (reprise, workers supplémentaires)')
+    parser.add_argument('--dedup-entities',
+                       action='store_true',
+                       help='Une seule ligne par entreprise (SIREN) dans l\'export')
     parser.add_argument('--demo', 
                        type=int,
                        help='Mode démo: limiter le traitement à N entreprises')
@@ -189,8 +553,31 @@ Configuration requise:
     setup_logging(args.verbose)
     
     try:
-        # Vérification de la clé API
-        if not os.getenv('SIRENE_API_KEY'):
+        if args.reextract and not args.archive_db:
+            logging.error("❌ --reextract nécessite --archive-db")
+            sys.exit(1)
+        
+        if args.shards > 1 and (args.incremental or args.dedup_entities):
+            logging.error("❌ --shards incompatible avec --incremental et --dedup-entities")
+            sys.exit(1)
+        if args.pipelined and (args.incremental or args.dedup_entities or args.queue_db or args.shards > 1):
+            logging.error("❌ --pipelined incompatible avec --incremental, --dedup-entities, --queue-db et --shards")
+            sys.exit(1)
+        if args.pipelined and (args.prioritize or args.priority_col):
+            logging.error("❌ --pipelined incompatible avec --prioritize et --priority-col (lots dans l'ordre du fichier)")
+            sys.exit(1)
+        if args.shard_index is not None and not 0 <= args.shard_index < args.shards:
+            logging.error(f"❌ --shard-index doit être compris entre 0 et {args.shards - 1}")
+            sys.exit(1)
+        
+        if args.merge_shards:
+            output_file = merge_shards(args.input_file, args.company_col, size_col=args.size_col,
+                                       output_file=args.output, demo_limit=args.demo, shards=args.shards)
+            logging.info(f"📄 Résultat: {output_file}")
+            return
+        
+        # Vérification de la clé API (inutile en ré-extraction hors ligne et en prévision)
+        if not args.reextract and not args.plan and not (os.getenv('SIRENE_API_KEY') or os.getenv('SIRENE_API_KEYS')):
             logging.error("❌ Variable SIRENE_API_KEY non définie")
             logging.error("   Créez un fichier .env avec: SIRENE_API_KEY=votre_clé")
             logging.error("   Ou définissez la variable d'environnement")
@@ -205,18 +592,48 @@ Configuration requise:
         if args.demo:
             logging.info(f"🧪 Mode démo: {args.demo} entreprises")
         
-        output_file = process_companies_pipeline(
+        pipeline_args = dict(
             input_file=args.input_file,
             company_col=args.company_col,
             size_col=args.size_col,
             output_file=args.output,
             delay=args.delay,
-            demo_limit=args.demo
+            demo_limit=args.demo,
+            cache_db=args.cache_db,
+            dedup_entities=args.dedup_entities,
+            negative_retry_budget=args.negative_retry_budget,
+            negative_ttl_hours=args.negative_ttl_hours,
+            refresh_budget=args.refresh_budget,
+            incremental=args.incremental,
+            archive_db=args.archive_db,
+            reextract=args.reextract,
+            rate_limit_db=args.rate_limit_db,
+            queue_db=args.queue_db,
+            workers=args.workers,
+            pipelined=args.pipelined,
+            batch_size=args.batch_size,
+            prioritize=args.prioritize,
+            priority_col=args.priority_col,
+            max_duration=args.max_duration,
+            max_api_calls=args.max_api_calls
         )
         
+        # Prévision seule (toutes les partitions de shards, sauf --shard-index), sans effet de bord
+        if args.plan:
+            process_companies_pipeline(**pipeline_args, shards=args.shards,
+                                       shard_index=args.shard_index, plan=True)
+            return
+        
+        if args.shards > 1 and args.shard_index is None:
+            logging.info(f"🧩 Traitement réparti: {args.shards} processus locaux")
+            output_file = run_local_shards(args.shards, **pipeline_args)
+        else:
+            output_file = process_companies_pipeline(**pipeline_args, shards=args.shards,
+                                                     shard_index=args.shard_index)
+        
         logging.info(f"\n🎉 Traitement terminé avec succès!")
         logging.info(f"📄 Résultat: {output_file}")
-        
+    
     except Exception as e:
         logging.error(f"❌ Erreur: {e}")
         if args.verbose:
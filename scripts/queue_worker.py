@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Worker de la file de travail d'enrichissement INSEE
+
+Réserve les noms déposés par scripts/process_companies.py --queue-db, les
+enrichit et écrit les résultats dans la file. Plusieurs workers (sur cette
+machine ou d'autres partageant le fichier) peuvent tourner en parallèle ; le
+budget de requêtes de chaque clé API reste partagé sur une même machine.
+
+Usage:
+    python scripts/queue_worker.py --queue-db queue/companies.sqlite [--cache-db cache/insee.sqlite]
+"""
+
+import argparse
+import logging
+import sys
+import os
+from pathlib import Path
+
+# Ajouter le répertoire src au path pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from src.insee_client import INSEEClient
+from src.data_processor import DataProcessor
+from src.work_queue import DEFAULT_LEASE_SECONDS, WorkQueue
+
+def main():
+    """Point d'entrée principal"""
+    parser = argparse.ArgumentParser(
+        description="Worker de la file de travail d'enrichissement INSEE"
+    )
+    parser.add_argument('--queue-db',
+                       required=True,
+                       help='Fichier SQLite de la file de travail')
+    parser.add_argument('--cache-db',
+                       help='Fichier SQLite du cache persistant (défaut: cache mémoire uniquement)')
+    parser.add_argument('--delay',
+                       type=float,
+                       default=4.0,
+                       help='Délai entre requêtes API en secondes (défaut: 4.0)')
+    parser.add_argument('--batch-size',
+                       type=int,
+                       default=10,
+                       help='Nombre de noms réservés par bail (défaut: 10)')
+    parser.add_argument('--lease-seconds',
+                       type=float,
+                       default=DEFAULT_LEASE_SECONDS,
+                       help=f'Durée d\'un bail avant reprise par un autre worker (défaut: {DEFAULT_LEASE_SECONDS:.0f})')
+    parser.add_argument('--rate-limit-db',
+                       help='Fichier SQLite du budget de requêtes partagé (défaut: répertoire temporaire)')
+    parser.add_argument('--verbose',
+                       action='store_true',
+                       help='Activer les logs détaillés')
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    
+    if not os.path.exists(args.queue_db):
+        logging.error(f"❌ File non trouvée: {args.queue_db}")
+        sys.exit(1)
+    
+    client = INSEEClient(delay_between_requests=args.delay, cache_path=args.cache_db,
+                         rate_limit_path=args.rate_limit_db)
+    queue = WorkQueue(args.queue_db, lease_seconds=args.lease_seconds)
+    
+    try:
+        processed = DataProcessor(client).consume_queue(queue, batch_size=args.batch_size)
+        counts = queue.counts()
+    finally:
+        queue.close()
+        client.close()
+    
+    logging.info(f"\n📊 WORKER:")
+    logging.info(f"   📬 Noms traités: {processed}")
+    logging.info(f"   🔗 Requêtes API: {client.stats['api_calls']}")
+    logging.info(f"   📋 File: {counts['done']} terminés, {counts['pending']} en attente, "
+                 f"{counts['leased']} réservés, {counts['failed']} abandonnés")
+
+if __name__ == "__main__":
+    main()
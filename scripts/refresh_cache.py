@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Rafraîchissement incrémental du cache persistant INSEE
+
+Interroge Sirene par lots de SIRET et ne met à jour que les entités modifiées
+depuis leur mise en cache (dates de dernier traitement), au lieu de relancer
+un enrichissement complet.
+
+Usage:
+    python scripts/refresh_cache.py --cache-db cache/insee.sqlite [--max-calls 100] [--older-than-days 7]
+"""
+
+import argparse
+import logging
+import sys
+import os
+from pathlib import Path
+
+# Ajouter le répertoire src au path pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from src.insee_client import INSEEClient
+from src.refresh import EntityRefresher
+
+def main():
+    """Point d'entrée principal"""
+    parser = argparse.ArgumentParser(
+        description="Rafraîchissement incrémental des entités du cache INSEE"
+    )
+    parser.add_argument('--cache-db',
+                       required=True,
+                       help='Fichier SQLite du cache persistant')
+    parser.add_argument('--max-calls',
+                       type=int,
+                       help='Budget de requêtes API (défaut: toutes les entités éligibles)')
+    parser.add_argument('--older-than-days',
+                       type=float,
+                       default=7,
+                       help='Ne vérifier que les entités vérifiées il y a plus de N jours (défaut: 7)')
+    parser.add_argument('--batch-size',
+                       type=int,
+                       default=50,
+                       help='Nombre de SIRET par requête (défaut: 50)')
+    parser.add_argument('--delay',
+                       type=float,
+                       default=4.0,
+                       help='Délai entre requêtes API en secondes (défaut: 4.0)')
+    parser.add_argument('--rate-limit-db',
+                       help='Fichier SQLite du budget de requêtes partagé (défaut: répertoire temporaire)')
+    parser.add_argument('--verbose',
+                       action='store_true',
+                       help='Activer les logs détaillés')
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    
+    if not os.path.exists(args.cache_db):
+        logging.error(f"❌ Cache non trouvé: {args.cache_db}")
+        sys.exit(1)
+    
+    client = INSEEClient(delay_between_requests=args.delay, cache_path=args.cache_db,
+                         rate_limit_path=args.rate_limit_db)
+    refresher = EntityRefresher(client, batch_size=args.batch_size, older_than_days=args.older_than_days)
+    
+    try:
+        stats = refresher.run(max_calls=args.max_calls)
+    finally:
+        client.close()
+    
+    logging.info(f"\n📊 RAFRAÎCHISSEMENT:")
+    logging.info(f"   🔗 Requêtes API: {stats['api_calls']}")
+    logging.info(f"   🔍 Entités vérifiées: {stats['checked']}")
+    logging.info(f"   🔄 Entités mises à jour: {stats['updated']}")
+
+if __name__ == "__main__":
+    main()
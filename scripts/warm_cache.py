@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Pré-remplissage du cache persistant INSEE à partir des résultats existants
+
+Importe les fichiers *_enriched.csv (pipeline src/) et *salesforce_ready*.csv
+(pipeline historique) pour que les prochains traitements démarrent avec un
+cache chaud, sans nouvel appel API pour les entreprises déjà connues.
+
+Usage:
+    python scripts/warm_cache.py --cache-db cache/insee.sqlite [data output fichier.csv ...]
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire src au path pour les imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from src.warm_start import warm_cache
+
+def main():
+    """Point d'entrée principal"""
+    parser = argparse.ArgumentParser(
+        description="Pré-remplissage du cache INSEE depuis des résultats d'enrichissement existants"
+    )
+    parser.add_argument('paths',
+                       nargs='*',
+                       default=['data', 'output'],
+                       help='Fichiers ou répertoires de résultats (défaut: data output)')
+    parser.add_argument('--cache-db',
+                       required=True,
+                       help='Fichier SQLite du cache persistant (créé si absent)')
+    parser.add_argument('--verbose',
+                       action='store_true',
+                       help='Activer les logs détaillés')
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    
+    stats = warm_cache(args.paths, args.cache_db)
+    
+    logging.info(f"\n📊 IMPORT:")
+    logging.info(f"   📄 Fichiers importés: {stats['files']} (ignorés: {stats['skipped_files']})")
+    logging.info(f"   📏 Lignes lues: {stats['rows']}")
+    logging.info(f"   🏢 Entités: {stats['entities']}")
+    logging.info(f"   🔗 Noms résolus: {stats['aliases']}")
+    logging.info(f"   ❌ Noms introuvables: {stats['not_found']}")
+
+if __name__ == "__main__":
+    main()
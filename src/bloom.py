@@ -0,0 +1,133 @@
+"""
+Filtre de Bloom sérialisable pour les noms connus comme introuvables
+
+Quelques octets par nom au lieu du cache complet : un nom présent dans le
+filtre est « très probablement » non trouvé lors d'une exécution précédente.
+Le filtre entier expire après sa durée de validité (TTL) et repart à vide.
+"""
+
+import os
+import math
+import struct
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# magic, nombre de bits, nombre de hachages, éléments ajoutés, date de création
+_HEADER = struct.Struct('<4sQIQd')
+_MAGIC = b'BLM1'
+
+class BloomFilter:
+    """Filtre de Bloom (double hachage blake2b) avec date de création et TTL global"""
+    
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001,
+                 ttl_days: Optional[float] = 30):
+        """
+        Initialise un filtre vide
+        
+        Args:
+            capacity: Nombre de noms prévu (au-delà, le taux de faux positifs augmente)
+            error_rate: Taux de faux positifs visé à pleine capacité
+            ttl_days: Durée de validité du filtre (None = sans expiration)
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ttl_days = ttl_days
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self.created_at = time.time()
+    
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+    
+    def add(self, key: str):
+        """Ajoute un nom au filtre"""
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+        if self.count == self.capacity + 1:
+            logger.warning(f"⚠️ Filtre de Bloom au-delà de sa capacité ({self.capacity}): faux positifs en hausse")
+    
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    @property
+    def expired(self) -> bool:
+        """Vrai si le filtre a dépassé sa durée de validité"""
+        if self.ttl_days is None:
+            return False
+        return time.time() - self.created_at > self.ttl_days * 86400
+    
+    def save(self, path: str):
+        """
+        Écrit le filtre sur disque (en-tête binaire + tableau de bits)
+        
+        Écriture dans un fichier temporaire puis remplacement atomique : un arrêt
+        en cours d'écriture laisse l'ancien filtre intact.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, self.num_bits, self.num_hashes, self.count, self.created_at))
+                f.write(self.bits)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+    
+    @classmethod
+    def load(cls, path: str, capacity: int = 1_000_000, error_rate: float = 0.001,
+             ttl_days: Optional[float] = 30) -> 'BloomFilter':
+        """
+        Charge un filtre depuis le disque
+        
+        Un fichier absent, illisible ou expiré donne un filtre vide aux
+        paramètres demandés.
+        """
+        bloom = cls(capacity=capacity, error_rate=error_rate, ttl_days=ttl_days)
+        if not Path(path).exists():
+            return bloom
+        
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            bits = f.read()
+        
+        if len(header) < _HEADER.size or header[:4] != _MAGIC:
+            logger.warning(f"⚠️ Filtre de Bloom illisible, ignoré: {path}")
+            return bloom
+        
+        _, num_bits, num_hashes, count, created_at = _HEADER.unpack(header)
+        if len(bits) != (num_bits + 7) // 8:
+            logger.warning(f"⚠️ Filtre de Bloom tronqué, ignoré: {path}")
+            return bloom
+        
+        loaded = cls.__new__(cls)
+        loaded.capacity = capacity
+        loaded.error_rate = error_rate
+        loaded.ttl_days = ttl_days
+        loaded.num_bits = num_bits
+        loaded.num_hashes = num_hashes
+        loaded.bits = bytearray(bits)
+        loaded.count = count
+        loaded.created_at = created_at
+        
+        if loaded.expired:
+            logger.info(f"♻️ Filtre de Bloom expiré ({ttl_days} jours), repart à vide")
+            return bloom
+        
+        logger.info(f"🌸 Filtre de Bloom chargé: {count} noms introuvables ({len(bits) // 1024} Ko)")
+        return loaded
@@ -0,0 +1,80 @@
+"""
+Budget d'exécution : durée maximale et nombre maximal d'appels API
+
+Les fenêtres d'enrichissement sont fixées par l'ordonnanceur et le quota
+journalier : une fois le budget épuisé, plus aucune requête ne part, les noms
+déjà résolus (ou servis par le cache) sont écrits et les autres marqués
+PENDING, à reprendre lors d'une prochaine exécution.
+"""
+
+import time
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Statut de recherche des lignes non traitées faute de budget
+PENDING_STATUS = 'PENDING'
+
+# Résultat d'une recherche non effectuée faute de budget
+PENDING = object()
+
+class BudgetExhausted(Exception):
+    """Budget d'exécution épuisé : la requête n'a pas été envoyée"""
+
+class RunBudget:
+    """Budget partagé par les threads d'une exécution (durée et appels API)"""
+    
+    def __init__(self, max_duration: Optional[float] = None, max_api_calls: Optional[int] = None):
+        """
+        Démarre le budget
+        
+        Args:
+            max_duration: Durée maximale en secondes depuis la création (None = illimitée)
+            max_api_calls: Nombre maximal d'appels API (None = illimité)
+        """
+        self.max_duration = max_duration
+        self.max_api_calls = max_api_calls
+        self.started = time.monotonic()
+        self.calls = 0
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    def check(self):
+        """
+        Vérifie le budget sans réserver d'appel (avant une attente de débit)
+        
+        Raises:
+            BudgetExhausted: si la durée ou le nombre d'appels est atteint
+        """
+        with self._lock:
+            self._check()
+    
+    def charge(self):
+        """
+        Réserve un appel API, juste avant l'envoi de la requête
+        
+        Raises:
+            BudgetExhausted: si la durée ou le nombre d'appels est atteint
+        """
+        with self._lock:
+            self._check()
+            self.calls += 1
+    
+    def _check(self):
+        if self.reason is None:
+            if self.max_api_calls is not None and self.calls >= self.max_api_calls:
+                self._exhaust(f"{self.max_api_calls} appels API")
+            elif self.max_duration is not None and self.elapsed() >= self.max_duration:
+                self._exhaust(f"{self.max_duration:.0f}s")
+        if self.reason is not None:
+            raise BudgetExhausted(self.reason)
+    
+    def elapsed(self) -> float:
+        """Secondes écoulées depuis le début de l'exécution"""
+        return time.monotonic() - self.started
+    
+    def _exhaust(self, reason: str):
+        self.reason = reason
+        logger.warning(f"⏹️  Budget d'exécution épuisé ({reason}): les noms restants sont marqués {PENDING_STATUS}")
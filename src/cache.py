@@ -0,0 +1,309 @@
+"""
+Cache à deux niveaux pour les résultats INSEE
+
+- L1 : LRU en mémoire (taille bornée)
+- L2 : stockage persistant SQLite (optionnel), partagé entre les exécutions
+
+Une seule instance sert à la fois le client et le processeur, avec des
+statistiques de hits par niveau. Les accès sont protégés par un verrou : une
+instance peut être partagée entre threads.
+"""
+
+import json
+import zlib
+import sqlite3
+import time
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .records import CompanyRecord
+
+logger = logging.getLogger(__name__)
+
+# Sentinelle distincte de None (None = entreprise non trouvée, valeur cachée valide)
+MISSING = object()
+
+def encode_record(record: Optional[CompanyRecord]) -> str:
+    """Sérialise un enregistrement (ou None) pour le stockage L2"""
+    if record is None:
+        return 'null'
+    return json.dumps([getattr(record, name) for name in CompanyRecord.__slots__])
+
+def decode_record(text: str) -> Optional[CompanyRecord]:
+    """Reconstruit un enregistrement depuis le stockage L2"""
+    values = json.loads(text)
+    if values is None:
+        return None
+    return CompanyRecord(**dict(zip(CompanyRecord.__slots__, values)))
+
+def encode_response(data: Optional[Dict[str, Any]]) -> bytes:
+    """Compresse une réponse Sirene brute (None = 404) pour l'archive"""
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+def decode_response(blob: bytes) -> Optional[Dict[str, Any]]:
+    """Décompresse une réponse Sirene archivée"""
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+def open_response_archive(path: str, read_only: bool = False) -> 'TieredCache':
+    """
+    Archive des réponses Sirene brutes (zlib), clé = requête exacte
+    
+    Pas de niveau mémoire : l'archive est écrite à chaque requête et relue
+    seulement lors d'une ré-extraction hors ligne.
+    """
+    return TieredCache(path=path, namespace='responses', max_size=0,
+                       encode=encode_response, decode=decode_response, read_only=read_only)
+
+def open_company_caches(path: Optional[str] = None, max_size: int = 10000,
+                        read_only: bool = False) -> Dict[str, 'TieredCache']:
+    """
+    Caches du client INSEE, partageant le même fichier SQLite
+    
+    - aliases : nom normalisé -> [SIREN, champs de l'établissement retenu], ou
+      résultat négatif {'reason', 'at'}
+    - entities : SIREN -> champs de l'unité légale, stockés une seule fois pour tous ses alias
+    - queries : requête Sirene exacte -> [SIREN, établissement] (ou négatif)
+    - history : essais et succès par position de variation (prévision des coûts)
+    
+    Avec read_only, le fichier est consulté sans être créé ni modifié (prévision).
+    """
+    return {
+        'aliases': TieredCache(path=path, namespace='aliases', max_size=max_size,
+                               encode=json.dumps, decode=json.loads, read_only=read_only),
+        'entities': TieredCache(path=path, namespace='entities', max_size=max_size,
+                                read_only=read_only),
+        'queries': TieredCache(path=path, namespace='queries', max_size=max_size,
+                               encode=json.dumps, decode=json.loads, read_only=read_only),
+        'history': TieredCache(path=path, namespace='history', max_size=100,
+                               encode=json.dumps, decode=json.loads, read_only=read_only)
+    }
+
+def negative_filter_path(cache_path: str) -> str:
+    """Fichier du filtre de Bloom des noms introuvables, à côté du cache persistant"""
+    return str(Path(cache_path).with_suffix('.bloom'))
+
+class TieredCache:
+    """Cache L1 LRU en mémoire au-dessus d'un L2 SQLite persistant"""
+    
+    def __init__(self, path: Optional[str] = None,
+                 namespace: str = 'companies',
+                 max_size: int = 10000,
+                 encode: Callable[[Any], Any] = encode_record,
+                 decode: Callable[[Any], Any] = decode_record,
+                 read_only: bool = False):
+        """
+        Initialise le cache
+        
+        Args:
+            path: Fichier SQLite du niveau L2 (None = cache en mémoire uniquement)
+            namespace: Nom de la table L2 (plusieurs caches peuvent partager un fichier)
+            max_size: Nombre maximal d'entrées en L1
+            encode: Sérialisation d'une valeur vers le L2 (texte ou octets)
+            decode: Désérialisation d'une valeur depuis le L2
+            read_only: L2 ouvert en lecture seule, ni créé ni modifié (une écriture
+                L2 échoue) ; fichier ou table absents = cache vide
+        """
+        self.path = path
+        self.namespace = namespace
+        self.max_size = max_size
+        self.encode = encode
+        self.decode = decode
+        
+        self._l1 = OrderedDict()
+        self._db = None
+        self._lock = threading.RLock()
+        self.stats = {
+            'l1_hits': 0,
+            'l2_hits': 0,
+            'misses': 0,
+            'writes': 0
+        }
+        
+        if path and read_only:
+            if Path(path).exists():
+                self._db = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True,
+                                           check_same_thread=False)
+                if self._db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                    (self._table,)).fetchone() is None:
+                    self._db.close()
+                    self._db = None
+        elif path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self._table}" '
+                '(key TEXT PRIMARY KEY, value TEXT, stored_at REAL)'
+            )
+            self._db.commit()
+            logger.info(f"💾 Cache persistant: {path} ({self.namespace}, {len(self)} entrées)")
+    
+    @property
+    def _table(self) -> str:
+        return f"cache_{self.namespace}"
+    
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        """Retourne la valeur cachée (L1 puis L2), ou default si absente"""
+        with self._lock:
+            if key in self._l1:
+                self._l1.move_to_end(key)
+                self.stats['l1_hits'] += 1
+                return self._l1[key]
+            
+            if self._db is not None:
+                row = self._db.execute(
+                    f'SELECT value FROM "{self._table}" WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    value = self.decode(row[0])
+                    self._remember(key, value)
+                    self.stats['l2_hits'] += 1
+                    return value
+            
+            self.stats['misses'] += 1
+            return default
+    
+    def set(self, key: str, value: Any):
+        """Enregistre la valeur dans les deux niveaux"""
+        with self._lock:
+            self._remember(key, value)
+            self.stats['writes'] += 1
+            
+            if self._db is not None:
+                self._db.execute(
+                    f'INSERT OR REPLACE INTO "{self._table}" (key, value, stored_at) VALUES (?, ?, ?)',
+                    (key, self.encode(value), time.time())
+                )
+                self._db.commit()
+    
+    def set_many(self, items: Iterable[Tuple[str, Any]], stored_at: Optional[float] = None):
+        """
+        Enregistre un lot de valeurs en une seule transaction L2
+        
+        Args:
+            items: Couples (clé, valeur)
+            stored_at: Date d'enregistrement (défaut: maintenant), ex. date du fichier importé
+        """
+        with self._lock:
+            stored_at = stored_at or time.time()
+            rows = []
+            for key, value in items:
+                self._remember(key, value)
+                rows.append((key, self.encode(value), stored_at))
+            self.stats['writes'] += len(rows)
+            
+            if self._db is not None:
+                self._db.executemany(
+                    f'INSERT OR REPLACE INTO "{self._table}" (key, value, stored_at) VALUES (?, ?, ?)',
+                    rows
+                )
+                self._db.commit()
+    
+    def increment(self, deltas: Dict[str, List[int]]):
+        """
+        Ajoute des compteurs (listes d'entiers) aux valeurs stockées, en une transaction
+        
+        Lecture et écriture se font sous le verrou d'écriture SQLite : les
+        incréments de processus concurrents s'additionnent au lieu de s'écraser.
+        """
+        with self._lock:
+            if self._db is None:
+                for key, delta in deltas.items():
+                    current = self._l1.get(key, [0] * len(delta))
+                    self._remember(key, [a + b for a, b in zip(current, delta)])
+                return
+            
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = []
+                for key, delta in deltas.items():
+                    row = self._db.execute(
+                        f'SELECT value FROM "{self._table}" WHERE key = ?', (key,)
+                    ).fetchone()
+                    current = self.decode(row[0]) if row is not None else [0] * len(delta)
+                    value = [a + b for a, b in zip(current, delta)]
+                    self._remember(key, value)
+                    rows.append((key, self.encode(value), time.time()))
+                self._db.executemany(
+                    f'INSERT OR REPLACE INTO "{self._table}" (key, value, stored_at) VALUES (?, ?, ?)',
+                    rows
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+            self.stats['writes'] += len(rows)
+    
+    def _remember(self, key: str, value: Any):
+        """Ajoute en L1 en évinçant l'entrée la moins récemment utilisée"""
+        self._l1[key] = value
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.max_size:
+            self._l1.popitem(last=False)
+    
+    def stored_before(self, timestamp: float) -> List[Tuple[str, float]]:
+        """Clés du L2 enregistrées avant la date donnée, les plus anciennes d'abord"""
+        with self._lock:
+            if self._db is None:
+                return []
+            return self._db.execute(
+                f'SELECT key, stored_at FROM "{self._table}" WHERE stored_at < ? ORDER BY stored_at',
+                (timestamp,)
+            ).fetchall()
+    
+    def items(self) -> List[Tuple[str, Any]]:
+        """Toutes les entrées (L2, ou L1 sans stockage persistant), décodées"""
+        with self._lock:
+            if self._db is None:
+                return list(self._l1.items())
+            rows = self._db.execute(f'SELECT key, value FROM "{self._table}"').fetchall()
+        return [(key, self.decode(value)) for key, value in rows]
+    
+    def touch(self, keys: Iterable[str]):
+        """Marque des entrées du L2 comme vérifiées maintenant (valeur inchangée)"""
+        with self._lock:
+            if self._db is None:
+                return
+            now = time.time()
+            self._db.executemany(
+                f'UPDATE "{self._table}" SET stored_at = ? WHERE key = ?',
+                [(now, key) for key in keys]
+            )
+            self._db.commit()
+    
+    def __contains__(self, key: str) -> bool:
+        """Test de présence sans impact sur les statistiques"""
+        with self._lock:
+            if key in self._l1:
+                return True
+            if self._db is None:
+                return False
+            return self._db.execute(
+                f'SELECT 1 FROM "{self._table}" WHERE key = ?', (key,)
+            ).fetchone() is not None
+    
+    def __len__(self) -> int:
+        with self._lock:
+            if self._db is None:
+                return len(self._l1)
+            return self._db.execute(f'SELECT COUNT(*) FROM "{self._table}"').fetchone()[0]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques par niveau"""
+        with self._lock:
+            lookups = self.stats['l1_hits'] + self.stats['l2_hits'] + self.stats['misses']
+            hits = self.stats['l1_hits'] + self.stats['l2_hits']
+            return {
+                **self.stats,
+                'hits': hits,
+                'l1_size': len(self._l1),
+                'hit_rate_percent': round(hits / max(1, lookups) * 100, 1)
+            }
+    
+    def close(self):
+        """Ferme le stockage persistant"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
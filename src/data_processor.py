@@ -2,10 +2,19 @@
 Processeur principal pour l'enrichissement des données d'entreprises
 """
 
+import time
+import numpy as np
 import pandas as pd
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
+from .budget import PENDING, PENDING_STATUS, BudgetExhausted
+from .cache import decode_record, encode_record
 from .insee_client import INSEEClient
+from .normalize import normalize_company_names
+from .records import CompanyRecord, records_to_frame
+from .tranches import to_tranche, tranche_description, tranche_midpoint
+from .work_queue import LEASED, WorkQueue, default_worker_id
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +29,14 @@ class DataProcessor:
             insee_client: Instance du client INSEE configuré
         """
         self.client = insee_client
-        self.duplicate_cache = {}
-        
+    
     def process_companies(self, df: pd.DataFrame, 
                          company_col: str, 
                          size_col: str = None,
-                         batch_size: int = 100) -> pd.DataFrame:
+                         batch_size: int = 100,
+                         queue: WorkQueue = None,
+                         workers: int = 1,
+                         priority: pd.Series = None) -> pd.DataFrame:
         """
         Traite un DataFrame d'entreprises pour enrichissement INSEE
         
@@ -34,95 +45,338 @@ class DataProcessor:
             company_col: Nom de la colonne contenant les noms d'entreprises
             size_col: Nom de la colonne contenant la taille d'entreprise (optionnel)
             batch_size: Taille des lots pour sauvegarde intermédiaire
-            
+            queue: File de travail partagée (None = recherche directe dans ce processus)
+            workers: Nombre de threads de recherche (le budget de requêtes reste partagé)
+            priority: Poids de chaque ligne ; les noms uniques sont recherchés par poids
+                total décroissant (None = ordre du fichier)
+        
         Returns:
             DataFrame enrichi avec données INSEE
         """
         logger.info(f"Traitement de {len(df)} entreprises avec optimisation des doublons")
         
+        # Normalisation des noms en une passe : clés de cache et de dédoublonnage
+        company_names = df[company_col].map(str).str.strip()
+        keys = normalize_company_names(company_names)
+        
         # Analyse des doublons
-        duplicates_analysis = self._analyze_duplicates(df, company_col)
+        duplicates_analysis = self._analyze_duplicates(df, company_col, keys)
         logger.info(f"Doublons détectés: {duplicates_analysis['total_duplicates']} lignes dupliquées")
         
-        results = []
-        cache_hits = 0
-        api_calls = 0
+        start_stats = self.client.get_stats()
+        results = self.enrich_batch(df, company_col, size_col, queue=queue, workers=workers,
+                                    company_names=company_names, keys=keys, priority=priority)
         
-        for idx, row in df.iterrows():
-            company_name = str(row[company_col]).strip()
-            size_original = str(row[size_col]).strip() if size_col and pd.notna(row[size_col]) else 'Non spécifié'
-            
-            # Vérification cache doublons
-            if company_name in self.duplicate_cache:
-                logger.debug(f"[{idx+1}/{len(df)}] {company_name} - 💾 CACHE HIT")
-                result_data = self.duplicate_cache[company_name].copy()
-                cache_hits += 1
-            else:
-                # Nouvelle recherche
-                logger.info(f"[{idx+1}/{len(df)}] {company_name} - 🔍 Nouvelle recherche API...")
-                insee_data = self.client.search_company(company_name)
-                api_calls += 1
+        # Statistiques finales (compteurs du client sur ce traitement)
+        end_stats = self.client.get_stats()
+        api_calls = end_stats['api_calls'] - start_stats['api_calls']
+        l1_hits = end_stats['cache_l1_hits'] - start_stats['cache_l1_hits']
+        l2_hits = end_stats['cache_l2_hits'] - start_stats['cache_l2_hits']
+        
+        found = int((results['Statut_Recherche'] == 'Trouvé').sum())
+        pending = int((results['Statut_Recherche'] == PENDING_STATUS).sum())
+        logger.info(f"\n📊 STATISTIQUES:")
+        logger.info(f"   🏢 Entreprises traitées: {len(results)}")
+        logger.info(f"   ✅ Trouvées: {found} ({found/len(results)*100:.1f}%)")
+        if pending:
+            logger.info(f"   ⏸️  En attente (budget épuisé): {pending}")
+        logger.info(f"   🔗 Appels API: {api_calls}")
+        logger.info(f"   💾 Cache hits: {l1_hits + l2_hits} (mémoire: {l1_hits}, persistant: {l2_hits})")
+        logger.info(f"   ⚡ Économie: {l1_hits + l2_hits} recherches évitées!")
+        
+        return results
+    
+    def enrich_batch(self, df: pd.DataFrame, company_col: str, size_col: str = None,
+                     queue: WorkQueue = None, workers: int = 1,
+                     company_names: pd.Series = None, keys: pd.Series = None,
+                     priority: pd.Series = None) -> pd.DataFrame:
+        """
+        Enrichit un lot de lignes, sans analyse ni statistiques globales
+        
+        Utilisé par process_companies et par le pipeline par lots ; les doublons
+        d'un lot à l'autre sont servis par le cache du client.
+        
+        Args:
+            company_names, keys: Noms nettoyés et clés normalisées, si déjà calculés
+            priority: Poids de chaque ligne pour l'ordre des recherches (None = ordre du fichier)
+        
+        Returns:
+            DataFrame enrichi, une ligne par ligne d'entrée
+        """
+        if company_names is None:
+            company_names = df[company_col].map(str).str.strip()
+        if keys is None:
+            keys = normalize_company_names(company_names)
+        
+        names = []
+        sizes = []
+        records = []
+        
+        # File partagée : noms uniques déposés puis traités par ce worker et les autres
+        if queue is not None:
+            records = self._lookup_via_queue(company_names, keys, queue, priority=priority)
+            names = company_names.tolist()
+            sizes = self._original_sizes(df, size_col)
+        elif workers > 1:
+            records = self._lookup_threaded(company_names, keys, workers, priority=priority)
+            names = company_names.tolist()
+            sizes = self._original_sizes(df, size_col)
+        elif priority is not None:
+            records = self._lookup_scheduled(company_names, keys, priority)
+            names = company_names.tolist()
+            sizes = self._original_sizes(df, size_col)
+        else:
+            for position, (idx, row) in enumerate(df.iterrows()):
+                company_name = company_names.iat[position]
+                size_original = str(row[size_col]).strip() if size_col and pd.notna(row[size_col]) else 'Non spécifié'
+                
+                # Le cache du client (L1/L2) sert aussi de cache doublons : un seul stockage
+                known = self.client.stats['cache_hits'] + self.client.stats['bloom_hits']
+                record = self._lookup_or_pending(company_name, keys.iat[position])
                 
-                if insee_data:
-                    result_data = {
-                        'Organisation_Original': company_name,
-                        'Taille_Original': size_original,
-                        'Statut_Recherche': 'Trouvé',
-                        **insee_data
-                    }
-                    logger.info(f"   ✅ Trouvé: {insee_data.get('Denomination_INSEE', 'N/A')}")
+                if record is PENDING:
+                    logger.debug(f"[{idx+1}/{len(df)}] {company_name} - ⏸️  {PENDING_STATUS}")
+                elif self.client.stats['cache_hits'] + self.client.stats['bloom_hits'] > known:
+                    logger.debug(f"[{idx+1}/{len(df)}] {company_name} - 💾 CACHE HIT")
                 else:
-                    # Créer une structure complète pour les non trouvés
-                    result_data = {
-                        'Organisation_Original': company_name,
-                        'Taille_Original': size_original,
-                        'Statut_Recherche': 'Non trouvé',
-                        'SIREN': None,
-                        'SIRET': None,
-                        'Denomination_INSEE': None,
-                        'Categorie_Entreprise_INSEE': None,
-                        'Date_Creation': None,
-                        'Activite_Principale': None,
-                        'Etat_Administratif': None,
-                        'Etablissement_Siege': None,
-                        'Nombre_Etablissements': None,
-                        'tranche_effectifs_unite_legale': None,
-                        'Effectifs_Description': None,  # Pas d'invention ! Seulement tranches officielles INSEE
-                        'Effectifs_Numeric': None
-                    }
-                    logger.warning(f"   ❌ Non trouvé")
+                    logger.info(f"[{idx+1}/{len(df)}] {company_name} - 🔍 Nouvelle recherche API")
+                    if record:
+                        logger.info(f"   ✅ Trouvé: {record.denomination or 'N/A'}")
+                    else:
+                        logger.warning(f"   ❌ Non trouvé")
                 
-                # Mise en cache
-                self.duplicate_cache[company_name] = result_data.copy()
+                names.append(company_name)
+                sizes.append(size_original)
+                records.append(record)
                 
-                # Pause entre requêtes déjà gérée dans le client
+                # Progress info
+                if (position + 1) % 10 == 0:
+                    progress = (position + 1) / len(df) * 100
+                    eta_minutes = (len(df) - position - 1) * 4 / 60  # Estimation basée sur 4s par requête
+                    logger.info(f"   ⏱️  Progression: {progress:.1f}% | ETA: {eta_minutes:.0f}min")
+        
+        return self._assemble_results(names, sizes, records)
+    
+    def _lookup_or_pending(self, company_name: str, key: str = None):
+        """
+        Recherche d'un nom, ou PENDING si le budget d'exécution du client est
+        épuisé ou si, hors ligne, la réponse manque à l'archive
+        """
+        try:
+            record, reason = self.client.lookup_with_reason(company_name, key=key)
+        except BudgetExhausted:
+            return PENDING
+        return PENDING if reason == 'unknown' else record
+    
+    def _budget_exhausted(self) -> bool:
+        """Budget d'exécution du client épuisé"""
+        return self.client.budget is not None and self.client.budget.reason is not None
+    
+    @staticmethod
+    def _original_sizes(df: pd.DataFrame, size_col: Optional[str]) -> List[str]:
+        """Tailles déclarées telles que saisies ('Non spécifié' si absentes)"""
+        if not size_col:
+            return ['Non spécifié'] * len(df)
+        return [str(size).strip() if pd.notna(size) else 'Non spécifié' for size in df[size_col]]
+    
+    @staticmethod
+    def _schedule(keys: pd.Series, priority: Optional[pd.Series] = None) -> np.ndarray:
+        """
+        Positions de la première ligne de chaque nom unique, dans l'ordre de recherche
+        
+        Avec `priority`, les noms passent par poids total décroissant (somme des
+        poids de leurs lignes ; à poids égaux, ordre du fichier) : après N appels
+        API, la plus grande part possible des lignes est enrichie.
+        """
+        first = np.flatnonzero(~keys.duplicated().to_numpy())
+        if priority is None:
+            return first
+        
+        scores = DataProcessor._key_weights(keys, priority).reindex(keys.iloc[first].to_numpy()).to_numpy()
+        return first[np.argsort(-scores, kind='stable')]
+    
+    @staticmethod
+    def _key_weights(keys: pd.Series, priority: pd.Series) -> pd.Series:
+        """Poids total de chaque nom normalisé (somme des poids de ses lignes)"""
+        return pd.Series(priority.to_numpy(), index=keys.to_numpy()).groupby(level=0, sort=False).sum()
+    
+    def _lookup_scheduled(self, company_names: pd.Series, keys: pd.Series,
+                          priority: pd.Series) -> List[Optional[CompanyRecord]]:
+        """Recherche les noms uniques par priorité décroissante, en suivant la part de lignes couvertes"""
+        order = self._schedule(keys, priority)
+        weights = self._key_weights(keys, priority)
+        total = weights.sum()
+        logger.info(f"🎯 {len(order)} noms uniques recherchés par priorité décroissante")
+        
+        found = {}
+        covered = 0.0
+        for done, position in enumerate(order, start=1):
+            key = keys.iat[position]
+            found[key] = self._lookup_or_pending(company_names.iat[position], key)
+            if found[key] is not PENDING:
+                covered += weights[key]
+            if done % 10 == 0 or done == len(order):
+                share = covered / total * 100 if total else 100.0
+                logger.info(f"   📈 {done}/{len(order)} noms recherchés | {share:.1f}% des lignes couvertes (pondérées)")
+        return [found[key] for key in keys]
+    
+    def _lookup_threaded(self, company_names: pd.Series, keys: pd.Series,
+                         workers: int, priority: pd.Series = None) -> List[Optional[CompanyRecord]]:
+        """
+        Recherche les noms uniques dans un pool de threads
+        
+        Les latences réseau se recouvrent ; le débit reste borné par le budget
+        de requêtes partagé du client. Les noms sont soumis dans l'ordre de priorité.
+        """
+        order = self._schedule(keys, priority)
+        unique_names, unique_keys = company_names.iloc[order].tolist(), keys.iloc[order].tolist()
+        logger.info(f"🧵 {len(unique_keys)} noms uniques répartis sur {workers} threads")
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            found = dict(zip(unique_keys, executor.map(self._lookup_or_pending, unique_names, unique_keys)))
+        return [found[key] for key in keys]
+    
+    def consume_queue(self, queue: WorkQueue, worker: str = None, batch_size: int = 10) -> int:
+        """
+        Worker : traite les noms de la file jusqu'à ce qu'il n'y en ait plus à réserver
+        
+        Les résultats d'un lot (enregistrement ou None) sont écrits en une
+        transaction ; un lot dont le bail a expiré entre-temps est ignoré.
+        Un nom en échec temporaire (rate limit, erreur HTTP) n'a pas de
+        résultat : il est rendu à la file jusqu'à l'expiration de son négatif.
+        Si le budget d'exécution s'épuise, les noms non traités du lot sont
+        rendus à la file et le worker s'arrête.
+        
+        Returns:
+            Nombre de noms traités par ce worker
+        """
+        worker = worker or default_worker_id()
+        processed = 0
+        while True:
+            jobs = queue.claim(worker, limit=batch_size)
+            if not jobs:
+                return processed
             
-            results.append(result_data)
+            results = []
+            retries = {}
+            done = 0
+            for key, name in jobs:
+                try:
+                    record, reason = self.client.lookup_with_reason(name, key)
+                except BudgetExhausted:
+                    break
+                done += 1
+                if reason in (None, 'not_found'):
+                    results.append((key, encode_record(record)))
+                else:
+                    retries.setdefault(reason, []).append(key)
             
-            # Progress info
-            if (idx + 1) % 10 == 0:
-                progress = (idx + 1) / len(df) * 100
-                eta_minutes = (len(df) - idx - 1) * 4 / 60  # Estimation basée sur 4s par requête
-                logger.info(f"   ⏱️  Progression: {progress:.1f}% | ETA: {eta_minutes:.0f}min")
-        
-        # Statistiques finales
-        found = len([r for r in results if r.get('Statut_Recherche') == 'Trouvé'])
-        logger.info(f"\n📊 STATISTIQUES:")
-        logger.info(f"   🏢 Entreprises traitées: {len(results)}")
-        logger.info(f"   ✅ Trouvées: {found} ({found/len(results)*100:.1f}%)")
-        logger.info(f"   🔗 Appels API: {api_calls}")
-        logger.info(f"   💾 Cache hits: {cache_hits}")
-        logger.info(f"   ⚡ Économie: {cache_hits} requêtes évitées!")
+            accepted = queue.complete(worker, results)
+            if accepted < len(results):
+                logger.warning(f"⚠️ {len(results) - accepted} résultats ignorés (bail expiré, repris par un autre worker)")
+            processed += accepted
+            
+            for reason, keys in retries.items():
+                retry_at = time.time() + self.client.negative_ttl_hours.get(reason, 0) * 3600
+                released = queue.release(worker, keys, retry_at=retry_at)
+                logger.info(f"   🔁 {released} noms rendus à la file ({reason}), nouvel essai après "
+                            f"{time.strftime('%H:%M', time.localtime(retry_at))}")
+            logger.info(f"   📬 {processed} noms traités par {worker} | file: {queue.counts()}")
+            
+            if done < len(jobs):
+                released = queue.release(worker, [key for key, _ in jobs[done:]])
+                logger.info(f"   ⏸️  {released} noms rendus à la file (budget épuisé)")
+                return processed
+    
+    def _lookup_via_queue(self, company_names: pd.Series, keys: pd.Series, queue: WorkQueue,
+                          poll_seconds: float = 5.0, priority: pd.Series = None) -> List[Optional[CompanyRecord]]:
+        """
+        Enrichit via la file : dépôt des noms uniques (dans l'ordre de priorité),
+        consommation, puis attente des noms encore réservés par d'autres workers
+        (sauf budget épuisé : les noms sans résultat restent PENDING, comme les
+        noms en échec temporaire qui attendent leur date de nouvel essai)
+        """
+        order = self._schedule(keys, priority)
+        unique_keys = keys.iloc[order].tolist()
+        added = queue.enqueue(zip(unique_keys, company_names.iloc[order]))
+        logger.info(f"📬 File {queue.path}: {added} noms ajoutés sur {len(unique_keys)} uniques")
+        
+        while True:
+            self.consume_queue(queue)
+            results = queue.results(unique_keys)
+            if (len(results) == len(unique_keys) or self._budget_exhausted() or
+                    not queue.counts()[LEASED]):
+                break
+            logger.info(f"⏳ {len(unique_keys) - len(results)} noms en cours chez d'autres workers...")
+            time.sleep(poll_seconds)
+        
+        decoded = {key: decode_record(result) if result is not None else None
+                   for key, result in results.items()}
+        return [decoded.get(key, PENDING) for key in keys]
+    
+    def _assemble_results(self, names: List[str], sizes: List[str], 
+                          records: List[Optional[CompanyRecord]]) -> pd.DataFrame:
+        """
+        Construit le DataFrame de résultats à partir des enregistrements compacts
+        
+        Les colonnes INSEE et dérivées sont calculées une fois par enregistrement
+        distinct (SIREN et établissement retenu pour le nom : deux noms d'une même
+        unité légale peuvent désigner deux établissements) puis jointes sur chaque
+        ligne ; les lignes non trouvées (None) reçoivent la
+        structure complète avec des valeurs vides, comme les lignes PENDING
+        (recherche non effectuée faute de budget).
+        """
+        df = pd.DataFrame({
+            'Organisation_Original': names,
+            'Taille_Original': sizes,
+            'Statut_Recherche': [PENDING_STATUS if r is PENDING else 'Trouvé' if r is not None else 'Non trouvé'
+                                 for r in records]
+        })
+        distinct = {}
+        codes = [distinct.setdefault(tuple(r.reference()), len(distinct))
+                 if r is not None and r is not PENDING else -1 for r in records]
+        unique = {code: r for r, code in zip(records, codes) if code >= 0}
+        entities = self._build_entity_frame(list(unique.values()))
+        joined = entities.reindex(codes).reset_index(drop=True)
+        return pd.concat([df, joined], axis=1)
+    
+    def _build_entity_frame(self, records: List[CompanyRecord]) -> pd.DataFrame:
+        """Table des enregistrements distincts, indexée par position (code de jointure)"""
+        entities = self._encode_tranches(records_to_frame(records))
+        # Type stable quel que soit le lot (une valeur manquante passerait la colonne en float)
+        entities['Nombre_Etablissements'] = entities['Nombre_Etablissements'].astype(float)
+        return entities
+    
+    def _encode_tranches(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Porte la tranche d'effectifs sous forme de code catégoriel (int8)
         
-        return pd.DataFrame(results)
+        Description et valeur numérique sont dérivées du code plutôt que
+        transportées comme chaînes sur chaque ligne.
+        """
+        tranches = to_tranche(df['tranche_effectifs_unite_legale'])
+        df['tranche_effectifs_unite_legale'] = tranches
+        df['Effectifs_Description'] = tranche_description(tranches)
+        df['Effectifs_Numeric'] = tranche_midpoint(tranches)
+        return df
     
-    def _analyze_duplicates(self, df: pd.DataFrame, company_col: str) -> Dict[str, Any]:
-        """Analyse les doublons dans le dataset"""
+    def _analyze_duplicates(self, df: pd.DataFrame, company_col: str,
+                            keys: pd.Series = None) -> Dict[str, Any]:
+        """
+        Analyse les doublons dans le dataset
+        
+        Les doublons sont comptés sur les noms normalisés : les variantes
+        d'écriture ("Air France" / "AIR FRANCE SA") comptent comme une seule entreprise.
+        """
         logger.info("🔍 Analyse des doublons...")
         
-        # Compter les occurrences de chaque entreprise
-        counts = df[company_col].value_counts()
+        if keys is None:
+            keys = normalize_company_names(df[company_col].map(str))
+        
+        # Compter les occurrences de chaque entreprise (clé normalisée)
+        counts = keys.value_counts()
         duplicates = counts[counts > 1]
+        spelling_variants = df[company_col].nunique() - len(counts)
         
         total_companies = len(df)
         unique_companies = len(counts)
@@ -133,6 +387,7 @@ class DataProcessor:
         logger.info(f"   📄 Total lignes: {total_companies}")
         logger.info(f"   🏢 Entreprises uniques: {unique_companies}")
         logger.info(f"   🔄 Entreprises dupliquées: {duplicate_companies}")
+        logger.info(f"   🔤 Variantes d'écriture regroupées: {spelling_variants}")
         logger.info(f"   ⚠️  Lignes dupliquées: {total_duplicates}")
         logger.info(f"   💡 Économie possible: {total_duplicates} requêtes évitées!")
         
@@ -146,5 +401,6 @@ class DataProcessor:
             'unique_companies': unique_companies,
             'duplicate_companies': duplicate_companies,
             'total_duplicates': total_duplicates,
+            'spelling_variants': spelling_variants,
             'most_duplicated': list(duplicates.head(10).items())
         }
\ No newline at end of file
@@ -1,107 +1,436 @@
 """
 Client API INSEE Sirene optimisé avec gestion du rate limiting et cache intelligent
+
+Le client peut être partagé entre threads : compteurs et caches sont protégés
+par des verrous. Les recherches concurrentes d'un même nom, ou d'une même
+requête Sirene, sont regroupées : un seul appel, un résultat partagé.
 """
 
 import requests
 import time
 import os
-from typing import Dict, List, Optional, Any
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import logging
 from dotenv import load_dotenv
+from .records import CompanyRecord
+from .bloom import BloomFilter
+from .budget import RunBudget
+from .cache import (MISSING, TieredCache, negative_filter_path, open_company_caches,
+                    open_response_archive)
+from .normalize import normalize_company_name
+from .rate_limit import KeyPool
 
 # Charger les variables d'environnement
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Durée de validité (heures) des résultats négatifs selon leur cause
+NEGATIVE_TTL_HOURS = {
+    'not_found': 30 * 24,   # Vraiment absent de Sirene : peut être créé depuis
+    'http_error': 24,       # Erreur serveur/requête : à retenter le lendemain
+    'throttled': 1,         # Rate limit : à retenter dès que possible
+    'unknown': 24           # Importé d'un résultat « Non trouvé » sans cause connue (pré-remplissage)
+}
+
+def api_keys_from_env() -> List[str]:
+    """Clés API configurées : SIRENE_API_KEYS (séparées par des virgules) ou SIRENE_API_KEY"""
+    keys = os.getenv('SIRENE_API_KEYS') or os.getenv('SIRENE_API_KEY') or ''
+    return [key.strip() for key in keys.split(',') if key.strip()]
+
 class INSEEClient:
     """Client pour l'API INSEE Sirene avec gestion optimisée des requêtes"""
     
-    def __init__(self, api_key: str = None, delay_between_requests: float = 4.0):
+    def __init__(self, api_key: str = None, delay_between_requests: float = 4.0,
+                 cache_path: str = None, cache_size: int = 10000,
+                 negative_ttl_hours: Dict[str, float] = None,
+                 negative_retry_budget: Optional[int] = 100,
+                 archive_path: str = None, offline: bool = False,
+                 rate_limit_path: str = None, api_keys: List[str] = None,
+                 budget: RunBudget = None, read_only: bool = False):
         """
         Initialise le client INSEE
         
         Args:
             api_key: Clé API INSEE (ou lecture depuis .env)
-            delay_between_requests: Délai entre requêtes (défaut: 4s pour respecter 30req/min)
+            delay_between_requests: Délai entre requêtes par clé (défaut: 4s pour respecter 30req/min),
+                partagé par tous les processus utilisant la même clé sur la machine
+            cache_path: Fichier SQLite du cache persistant (None = cache mémoire uniquement)
+            cache_size: Nombre maximal d'entreprises gardées en mémoire (LRU)
+            negative_ttl_hours: Validité des résultats négatifs par cause (défaut: NEGATIVE_TTL_HOURS)
+            negative_retry_budget: Nombre max de négatifs expirés re-tentés par exécution (None = illimité)
+            archive_path: Fichier SQLite de l'archive des réponses brutes (None = pas d'archive)
+            offline: Ré-extraction hors ligne : réponses lues dans l'archive, aucun appel API
+            rate_limit_path: Fichier SQLite du budget de requêtes partagé (défaut: répertoire temporaire)
+            api_keys: Pool de clés API aux quotas distincts (défaut: api_key ou .env)
+            budget: Budget d'exécution (durée, appels API) ; une fois épuisé, send()
+                lève BudgetExhausted sans envoyer de requête
+            read_only: Consultation des caches seule (prévision) : fichiers ouverts en
+                lecture seule et jamais écrits, ni clé API ni pool de clés
         """
-        self.api_key = api_key or os.getenv('SIRENE_API_KEY')
-        if not self.api_key:
-            raise ValueError("Clé API INSEE requise (SIRENE_API_KEY dans .env ou paramètre)")
-            
+        self.offline = offline
+        self.read_only = read_only
+        self.budget = budget
+        self.api_keys = api_keys or ([api_key] if api_key else api_keys_from_env())
+        self.api_key = self.api_keys[0] if self.api_keys else None
+        if not self.api_key and not offline and not read_only:
+            raise ValueError("Clé API INSEE requise (SIRENE_API_KEY ou SIRENE_API_KEYS dans .env, ou paramètre)")
+        
+        if offline and not archive_path:
+            raise ValueError("Archive des réponses requise pour la ré-extraction hors ligne")
+        
+        # Hors ligne, les enregistrements sont ré-extraits : pas de cache persistant
+        if offline:
+            cache_path = None
+        
         self.base_url = "https://api.insee.fr/api-sirene/3.11"
         self.delay = delay_between_requests
         self.session = requests.Session()
         self.session.headers.update({
-            'X-INSEE-Api-Key-Integration': self.api_key,
             'Accept': 'application/json',
             'User-Agent': 'Data-INSEE-Analysis/1.0'
         })
         
-        # Cache pour éviter requêtes dupliquées
-        self.cache = {}
+        # Pool de clés : un budget par clé, commun à tous les processus de la machine ;
+        # la clé est choisie à chaque requête (celle qui a le plus de budget)
+        self.key_pool = None
+        if not offline and not read_only:
+            self.key_pool = KeyPool(
+                self.api_keys,
+                requests_per_minute=60 / self.delay if self.delay > 0 else None,
+                path=rate_limit_path
+            )
+        
+        # Cache à deux niveaux (L1 mémoire + L2 SQLite) : alias -> SIREN -> entité,
+        # plus les requêtes exactes (une variation partagée n'est envoyée qu'une fois)
+        caches = open_company_caches(cache_path, max_size=cache_size, read_only=read_only)
+        self.cache = caches['aliases']
+        self.entities = caches['entities']
+        self.query_cache = caches['queries']
+        self.history = caches['history']
+        
+        # Archive des réponses brutes : ré-extraction possible sans nouvel appel API
+        self.archive = open_response_archive(archive_path, read_only=read_only) if archive_path else None
+        
+        # Politique des résultats négatifs : durée de validité par cause, budget de re-tentatives
+        self.negative_ttl_hours = {**NEGATIVE_TTL_HOURS, **(negative_ttl_hours or {})}
+        self.negative_retry_budget = negative_retry_budget
+        
+        # Filtre de Bloom des noms introuvables, à côté du cache persistant : un nom
+        # présent n'est rendu introuvable qu'après confirmation par le cache d'alias
+        self.negative_filter_path = negative_filter_path(cache_path) if cache_path else None
+        self.negative_filter = BloomFilter.load(
+            self.negative_filter_path,
+            ttl_days=self.negative_ttl_hours['not_found'] / 24
+        ) if cache_path else None
+        
+        # Verrou des compteurs et du filtre ; recherches en cours par nom et par requête
+        self._lock = threading.RLock()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_queries: Dict[str, Future] = {}
+        
+        # Historique des variations de cette exécution, ajouté au cache persistant à la fermeture
+        self._variation_counts: Dict[str, List[int]] = {}
+        
         self.stats = {
             'api_calls': 0,
             'cache_hits': 0,
+            'query_cache_hits': 0,
+            'bloom_hits': 0,
+            'archive_misses': 0,
+            'negative_hits': 0,
+            'negative_retries': 0,
+            'coalesced': 0,
             'found': 0,
-            'not_found': 0
+            'not_found': 0,
+            'http_error': 0,
+            'throttled': 0
         }
         
         logger.info(f"✅ Client INSEE initialisé")
-        logger.info(f"   API Key: {self.api_key[:10]}...")
+        if offline:
+            logger.info(f"   Mode hors ligne: ré-extraction depuis {archive_path}")
+        elif read_only:
+            logger.info(f"   Lecture seule: caches consultés, aucun appel API")
+        else:
+            logger.info(f"   API Key: {self.api_key[:10]}...")
+            if len(self.key_pool.keys) > 1:
+                logger.info(f"   🔑 Pool de {len(self.key_pool.keys)} clés API")
         logger.info(f"   Base URL: {self.base_url}")
-        
+    
     def search_company(self, company_name: str) -> Optional[Dict[str, Any]]:
         """
         Recherche une entreprise avec gestion du cache et variations de noms
         
         Args:
             company_name: Nom de l'entreprise à rechercher
-            
+        
         Returns:
             Dictionnaire avec les données INSEE ou None si non trouvé
         """
-        # Vérification cache
-        if company_name in self.cache:
-            self.stats['cache_hits'] += 1
-            logger.debug(f"💾 Cache hit pour {company_name}")
-            return self.cache[company_name]
+        record = self.lookup(company_name)
+        return record.to_dict() if record else None
+    
+    def lookup(self, company_name: str, key: str = None) -> Optional[CompanyRecord]:
+        """
+        Recherche une entreprise et retourne l'enregistrement compact mis en cache
+        
+        Args:
+            company_name: Nom de l'entreprise à rechercher
+            key: Clé de cache déjà normalisée (calculée si absente)
+        
+        Returns:
+            CompanyRecord ou None si non trouvé
+        """
+        return self.lookup_with_reason(company_name, key)[0]
+    
+    def lookup_with_reason(self, company_name: str, key: str = None) -> Tuple[Optional[CompanyRecord], Optional[str]]:
+        """
+        Recherche une entreprise, avec la cause de l'échec éventuel
+        
+        Returns:
+            (CompanyRecord ou None, cause : 'not_found', 'http_error', 'throttled',
+            'unknown' (hors ligne, réponse absente de l'archive, rien n'est mis en
+            cache) ou None si trouvé) ; seul 'not_found' est un résultat définitif
+        """
+        # Les variantes d'écriture d'un même nom partagent la même clé
+        key = key or normalize_company_name(company_name)
+        
+        # Un doublon recherché en même temps par un autre thread attend son résultat
+        return self._single_flight(self._inflight, key, lambda: self._lookup(company_name, key))
+    
+    def _single_flight(self, flights: Dict[str, Future], key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Regroupe les appels concurrents sur une même clé
+        
+        Le premier appelant exécute `compute` ; les suivants attendent le même
+        Future et reçoivent son résultat (ou son exception) sans nouvel appel.
+        """
+        with self._lock:
+            future = flights.get(key)
+            leader = future is None
+            if leader:
+                future = flights[key] = Future()
+        
+        if not leader:
+            self._count('coalesced')
+            return future.result()
+        
+        try:
+            result = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del flights[key]
+    
+    def _lookup(self, company_name: str, key: str) -> Tuple[Optional[CompanyRecord], Optional[str]]:
+        """Recherche (cache puis API) d'une clé, sans autre recherche concurrente de la même clé"""
+        # Vérification cache (résultat négatif encore valide = non trouvé sans nouvel appel).
+        # Le filtre de Bloom n'est qu'un indice : un faux positif, un négatif expiré ou un nom
+        # résolu depuis (pré-remplissage, rafraîchissement) suit le chemin normal du cache
+        cached = self.cache.get(key)
+        if self._is_negative(cached):
+            if not self._is_expired(cached) or not self._take_retry():
+                if cached['reason'] == 'not_found' and self._in_negative_filter(key):
+                    self._count('bloom_hits')
+                    logger.debug(f"🌸 {company_name} connu comme introuvable")
+                else:
+                    self._count('cache_hits')
+                    logger.debug(f"💾 Cache hit (négatif: {cached['reason']}) pour {company_name}")
+                self._count('negative_hits')
+                return None, cached['reason']
+            logger.info(f"♻️ Nouvel essai pour {company_name} (négatif expiré: {cached['reason']})")
+        elif cached is not MISSING:
+            record = self._join_entity(cached)
+            if record is not MISSING:
+                self._count('cache_hits')
+                logger.debug(f"💾 Cache hit pour {company_name}")
+                return record, None
         
         # Tentative de recherche avec variations
         variations = self._generate_name_variations(company_name)
+        reason = 'not_found'
         
-        for i, variation in enumerate(variations):
+        # Pas de pause fixe entre variations : chaque requête puise dans le budget partagé
+        attempts = []
+        for position, variation in enumerate(variations):
             try:
                 if variation != company_name:
                     logger.info(f"🔄 Essai avec variation: {variation}")
-                    
-                result = self._api_search(variation)
-                if result:
-                    # Mise en cache et statistiques
-                    self.cache[company_name] = result
-                    self.stats['found'] += 1
+                
+                record = self._api_search(variation)
+                if record is MISSING:
+                    # Hors ligne, requête absente de l'archive : résultat inconnu
+                    reason = 'unknown'
+                    continue
+                attempts.append((position, record is not None))
+                if record:
+                    # Mise en cache (alias -> SIREN et établissement) et statistiques
+                    self.cache.set(key, record.reference())
+                    self._count('found')
+                    self._record_variations(attempts)
                     logger.info(f"✅ {company_name} trouvé avec variation '{variation}'")
-                    return result
-                    
-                # Pause entre variations pour éviter rate limit
-                if i < len(variations) - 1:
-                    logger.info(f"   ⏸️  Pause 2s entre variations...")
-                    time.sleep(2)
-                    
+                    return record, None
+            
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 429:
-                    logger.warning(f"Rate limit atteint, pause de 10s...")
-                    time.sleep(10)
+                    # La clé limitée est mise en pause ; les autres prennent le relais
+                    logger.warning(f"Rate limit atteint avec cette clé")
+                    reason = 'throttled'
                     continue
                 else:
                     logger.error(f"Erreur HTTP {e.response.status_code}: {e}")
+                    if reason == 'not_found':
+                        reason = 'http_error'
                     continue
         
-        # Aucune variation trouvée
-        self.cache[company_name] = None
-        self.stats['not_found'] += 1
-        logger.warning(f"❌ {company_name} non trouvé après {len(variations)} variations")
-        return None
+        # Aucune variation trouvée : négatif mis en cache avec sa cause
+        self._record_variations(attempts)
+        if reason == 'unknown':
+            logger.warning(f"📦 {company_name}: réponse absente de l'archive, résultat inconnu")
+            return None, reason
+        self.cache.set(key, self._negative(reason))
+        if reason == 'not_found' and self.negative_filter is not None:
+            with self._lock:
+                self.negative_filter.add(key)
+        self._count(reason)
+        logger.warning(f"❌ {company_name} non trouvé après {len(variations)} variations ({reason})")
+        return None, reason
+    
+    def _in_negative_filter(self, key: str) -> bool:
+        """Vrai si le filtre de Bloom connaît le nom comme introuvable (indice, jamais décisif seul)"""
+        return self.negative_filter is not None and key in self.negative_filter
+    
+    @staticmethod
+    def _negative(reason: str) -> Dict[str, Any]:
+        """Résultat négatif à mettre en cache : cause et date"""
+        return {'reason': reason, 'at': time.time()}
+    
+    @staticmethod
+    def _is_negative(cached: Any) -> bool:
+        return isinstance(cached, dict)
+    
+    def _is_expired(self, negative: Dict[str, Any]) -> bool:
+        """Vrai si le résultat négatif a dépassé la durée de validité de sa cause"""
+        ttl_hours = self.negative_ttl_hours.get(negative['reason'], 0)
+        return time.time() - negative['at'] > ttl_hours * 3600
+    
+    def _take_retry(self) -> bool:
+        """Consomme une re-tentative du budget des négatifs expirés pour cette exécution"""
+        with self._lock:
+            if (self.negative_retry_budget is not None and
+                    self.stats['negative_retries'] >= self.negative_retry_budget):
+                return False
+            self.stats['negative_retries'] += 1
+            return True
+    
+    def _count(self, name: str):
+        """Incrémente un compteur (appelable depuis plusieurs threads)"""
+        with self._lock:
+            self.stats[name] += 1
+    
+    def _resolve(self, aliases: TieredCache, key: str) -> Any:
+        """
+        Résout une clé via la table d'alias puis le stockage des entités
+        
+        Returns:
+            CompanyRecord, None (négatif encore valide) ou MISSING si la clé,
+            l'entité ou un négatif expiré doit être recherché à nouveau
+        """
+        reference = aliases.get(key)
+        if self._is_negative(reference):
+            return MISSING if self._is_expired(reference) else None
+        if reference is MISSING:
+            return reference
+        return self._join_entity(reference)
+    
+    def _join_entity(self, reference: Any) -> Any:
+        """
+        Enregistrement d'un alias : entité de son SIREN et établissement propre à l'alias
+        
+        Returns:
+            CompanyRecord, ou MISSING si l'entité n'est pas en cache
+        """
+        # Alias antérieur à la séparation entité / établissement : SIREN seul
+        if isinstance(reference, str):
+            return self.entities.get(reference)
+        entity = self.entities.get(reference[0])
+        if entity is MISSING:
+            return entity
+        return entity.with_establishment(reference[1:])
+    
+    def _record_variations(self, attempts: List[Tuple[int, bool]]):
+        """Historique des variations : essais et succès par position (prévision des coûts), en mémoire"""
+        with self._lock:
+            for position, found in attempts:
+                counts = self._variation_counts.setdefault(f"variation:{position}", [0, 0])
+                counts[0] += 1
+                counts[1] += found
+    
+    def flush_history(self):
+        """Ajoute l'historique des variations de l'exécution au cache persistant (incrément atomique)"""
+        with self._lock:
+            counts, self._variation_counts = self._variation_counts, {}
+        if counts:
+            self.history.increment(counts)
+    
+    def variation_hit_rates(self, count: int) -> Tuple[List[float], int]:
+        """
+        Taux de succès historique de chaque position de variation
+        
+        Lissage de Laplace : 50% sans historique, puis la fréquence observée.
+        
+        Returns:
+            (taux par position, nombre de recherches historiques)
+        """
+        counts = []
+        for position in range(count):
+            stored = self.history.get(f"variation:{position}", [0, 0])
+            with self._lock:
+                pending = self._variation_counts.get(f"variation:{position}", [0, 0])
+            counts.append([stored[0] + pending[0], stored[1] + pending[1]])
+        rates = [(hits + 1) / (tries + 2) for tries, hits in counts]
+        return rates, counts[0][0] if counts else 0
+    
+    def cached_state(self, key: str) -> str:
+        """
+        État en cache d'un nom normalisé, sans appel API ni re-tentative consommée
+        
+        Returns:
+            'bloom', 'found', 'negative', 'expired' (négatif à re-tenter) ou 'missing'
+        """
+        cached = self.cache.get(key)
+        if self._is_negative(cached):
+            if self._is_expired(cached):
+                return 'expired'
+            return 'bloom' if cached['reason'] == 'not_found' and self._in_negative_filter(key) else 'negative'
+        if cached is not MISSING and self._join_entity(cached) is not MISSING:
+            return 'found'
+        return 'missing'
+    
+    def query_states(self, company_name: str) -> List[Tuple[str, Any]]:
+        """Requêtes Sirene d'un nom (variations) et leur résultat en cache (MISSING = à envoyer)"""
+        states = []
+        for variation in self._generate_name_variations(company_name):
+            _, query_key = self._search_params(variation)
+            states.append((query_key, self._resolve(self.query_cache, query_key)))
+        return states
+    
+    def update_entity(self, record: CompanyRecord):
+        """
+        Enregistre (ou rafraîchit) une entité : tous ses alias en bénéficient
+        
+        Seuls les champs de l'unité légale sont stockés ; l'établissement de
+        chaque alias reste dans sa propre entrée et n'est pas écrasé.
+        """
+        self.entities.set(record.siren, record.entity())
     
     def _generate_name_variations(self, name: str) -> List[str]:
         """Génère des variations intelligentes du nom d'entreprise"""
@@ -120,20 +449,96 @@ class INSEEClient:
         
         return variations
     
-    def _api_search(self, company_name: str) -> Optional[Dict[str, Any]]:
-        """Effectue la requête API pour un nom d'entreprise"""
+    def _api_search(self, company_name: str) -> Any:
+        """
+        Effectue la requête API pour un nom d'entreprise
+        
+        Le résultat (y compris l'absence de résultat) est mis en cache par
+        requête exacte ; les erreurs HTTP et le rate limit ne le sont pas.
+        La réponse brute est archivée si une archive est configurée ; hors
+        ligne, elle est relue depuis l'archive (MISSING si absente).
+        """
         url = f"{self.base_url}/siret"
+        params, query_key = self._search_params(company_name)
+        
+        # Deux noms différents peuvent partager une variation (ex. premier mot)
+        return self._single_flight(self._inflight_queries, query_key,
+                                   lambda: self._search_query(url, params, query_key))
+    
+    @staticmethod
+    def _search_params(company_name: str) -> Tuple[Dict[str, Any], str]:
+        """Paramètres de la requête Sirene d'un nom et clé du cache des requêtes"""
         params = {
             'q': f'denominationUniteLegale:"{company_name.strip()}"',
             'nombre': 5
         }
+        return params, f"{params['q']}|nombre={params['nombre']}"
+    
+    def _search_query(self, url: str, params: Dict[str, Any], query_key: str) -> Any:
+        """Requête Sirene exacte : cache des requêtes, archive hors ligne ou appel API"""
+        cached = self._resolve(self.query_cache, query_key)
+        if cached is not MISSING:
+            self._count('query_cache_hits')
+            logger.debug(f"💾 Requête déjà envoyée: {params['q']}")
+            return cached
+        
+        if self.offline:
+            data = self.archive.get(query_key)
+            if data is MISSING:
+                # Jamais envoyée : ni 404 ni résultat, rien n'est mis en cache
+                self._count('archive_misses')
+                logger.debug(f"📦 Requête absente de l'archive: {params['q']}")
+                return MISSING
+        else:
+            data = self._fetch(url, params)
+            if self.archive is not None:
+                self.archive.set(query_key, data)
         
-        self.stats['api_calls'] += 1
-        logger.debug(f"🔍 Recherche de: {company_name}")
+        # Vérification si résultats trouvés (None = 404)
+        if (data and data.get('header', {}).get('total', 0) > 0 and 
+            data.get('etablissements')):
+            
+            nb_etablissements = len(data['etablissements'])
+            logger.debug(f"✅ {nb_etablissements} établissement(s) trouvé(s)")
+            record = self._extract_company_data(data['etablissements'][0])
+            self.update_entity(record)
+            self.query_cache.set(query_key, record.reference())
+            return record
+        
+        self.query_cache.set(query_key, self._negative('not_found'))
+        return None
+    
+    def send(self, url: str, params: Dict[str, Any]) -> requests.Response:
+        """
+        Envoie une requête Sirene avec la clé du pool ayant le plus de budget
+        
+        Attend si aucune clé n'a de budget ; une clé recevant un 429 est mise
+        à l'écart temporairement. Le budget d'exécution est décompté après
+        l'attente, juste avant l'envoi : aucune requête ne part au-delà de la
+        durée maximale.
+        
+        Raises:
+            BudgetExhausted: si le budget d'exécution est épuisé, y compris
+                pendant l'attente (rien n'est envoyé)
+        """
+        if self.budget is not None:
+            self.budget.check()
+        key = self.key_pool.acquire()
+        if self.budget is not None:
+            self.budget.charge()
+        self._count('api_calls')
+        response = self.session.get(url, params=params, headers={'X-INSEE-Api-Key-Integration': key})
+        if response.status_code == 429:
+            self.key_pool.throttled(key)
+        return response
+    
+    def _fetch(self, url: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Envoie la requête Sirene et retourne la réponse JSON brute (None si 404)"""
+        logger.debug(f"🔍 Recherche de: {params['q']}")
         logger.debug(f"   URL: {url}")
         logger.debug(f"   Paramètres: {params}")
         
-        response = self.session.get(url, params=params)
+        response = self.send(url, params)
         logger.debug(f"📊 Code de réponse: {response.status_code}")
         
         if response.status_code == 404:
@@ -145,90 +550,44 @@ class INSEEClient:
         
         response.raise_for_status()
         
-        # Pause après requête pour respecter rate limit
-        time.sleep(self.delay)
-        
-        data = response.json()
-        
-        # Vérification si résultats trouvés
-        if (data.get('header', {}).get('total', 0) > 0 and 
-            data.get('etablissements')):
-            
-            nb_etablissements = len(data['etablissements'])
-            logger.debug(f"✅ {nb_etablissements} établissement(s) trouvé(s)")
-            return self._extract_company_data(data['etablissements'][0])
-        
-        return None
+        return response.json()
     
-    def _extract_company_data(self, etablissement: Dict) -> Dict[str, Any]:
+    def _extract_company_data(self, etablissement: Dict) -> CompanyRecord:
         """Extrait les données pertinentes d'un établissement INSEE"""
-        unite_legale = etablissement.get('uniteLegale', {})
-        
-        # Extraction des effectifs (priorité unité légale)
-        tranche_ul = unite_legale.get('trancheEffectifsUniteLegale')
-        tranche_etab = etablissement.get('trancheEffectifsEtablissement')
-        
-        effectifs_data = self._decode_tranche_effectifs(tranche_ul or tranche_etab)
-        
-        return {
-            'Statut_Recherche': 'Trouvé',
-            'SIREN': etablissement.get('siren'),
-            'SIRET': etablissement.get('siret'),
-            'Denomination_INSEE': unite_legale.get('denominationUniteLegale'),
-            'Categorie_Entreprise_INSEE': unite_legale.get('categorieEntreprise'),
-            'Date_Creation': unite_legale.get('dateCreationUniteLegale'),
-            'Activite_Principale': unite_legale.get('activitePrincipaleUniteLegale'),
-            'Etat_Administratif': unite_legale.get('etatAdministratifUniteLegale'),
-            'Etablissement_Siege': etablissement.get('etablissementSiege'),
-            'Nombre_Etablissements': unite_legale.get('nombrePeriodesUniteLegale'),
-            **effectifs_data
-        }
+        # Seuls les champs utiles sont conservés, pas la réponse brute
+        return CompanyRecord.from_etablissement(etablissement)
     
-    def _decode_tranche_effectifs(self, code_tranche: str) -> Dict[str, Any]:
-        """Décode les tranches d'effectifs INSEE en données exploitables"""
-        if not code_tranche:
-            return {
-                'tranche_effectifs_unite_legale': None,
-                'Effectifs_Description': None,  # Pas d'invention ! Seulement les tranches officielles
-                'Effectifs_Numeric': None
-            }
-        
-        # Mapping des codes INSEE vers descriptions et valeurs numériques
-        tranches_mapping = {
-            'NN': ('Non renseigné', None),
-            '00': ('0 salarié', 0),
-            '01': ('1 ou 2 salariés', 1.5),
-            '02': ('3 à 5 salariés', 4),
-            '03': ('6 à 9 salariés', 7.5),
-            '11': ('10 à 19 salariés', 15),
-            '12': ('20 à 49 salariés', 35),
-            '21': ('50 à 99 salariés', 75),
-            '22': ('100 à 199 salariés', 150),
-            '31': ('200 à 249 salariés', 225),
-            '32': ('250 à 499 salariés', 375),
-            '41': ('500 à 999 salariés', 750),
-            '42': ('1000 à 1999 salariés', 1500),
-            '51': ('2000 à 4999 salariés', 3500),
-            '52': ('5000 à 9999 salariés', 7500),
-            '53': ('10000 salariés et plus', 15000)
-        }
-        
-        desc, numeric = tranches_mapping.get(str(code_tranche), ('Code inconnu', None))
-        
-        return {
-            'tranche_effectifs_unite_legale': code_tranche,
-            'Effectifs_Description': desc,
-            'Effectifs_Numeric': numeric
-        }
+    def close(self):
+        """Sauvegarde le filtre des noms introuvables et l'historique, ferme les caches persistants"""
+        if not self.read_only:
+            self.flush_history()
+            if self.negative_filter is not None:
+                self.negative_filter.save(self.negative_filter_path)
+        for cache in (self.cache, self.entities, self.query_cache, self.history, self.archive):
+            if cache is not None:
+                cache.close()
+        if self.key_pool is not None:
+            self.key_pool.close()
     
     def get_stats(self) -> Dict[str, Any]:
         """Retourne les statistiques du client"""
-        total_processed = self.stats['found'] + self.stats['not_found']
-        cache_rate = (self.stats['cache_hits'] / max(1, total_processed + self.stats['cache_hits'])) * 100
-        success_rate = (self.stats['found'] / max(1, total_processed)) * 100
+        with self._lock:
+            stats = dict(self.stats)
+        total_processed = (stats['found'] + stats['not_found'] +
+                           stats['http_error'] + stats['throttled'])
+        cache_rate = (stats['cache_hits'] / max(1, total_processed + stats['cache_hits'])) * 100
+        success_rate = (stats['found'] / max(1, total_processed)) * 100
+        
+        cache_stats = self.cache.get_stats()
         
         return {
-            **self.stats,
+            **stats,
+            'cache_l1_hits': cache_stats['l1_hits'],
+            'cache_l2_hits': cache_stats['l2_hits'],
+            'cache_entries': len(self.cache),
+            'entities': len(self.entities),
+            'rate_wait_seconds': round(self.key_pool.waited, 1) if self.key_pool else 0.0,
+            'api_keys': self.key_pool.get_stats() if self.key_pool else {},
             'total_processed': total_processed,
             'cache_rate_percent': round(cache_rate, 1),
             'success_rate_percent': round(success_rate, 1)
@@ -0,0 +1,85 @@
+"""
+Manifeste d'empreintes des lignes d'entrée pour le ré-enrichissement incrémental
+
+Une empreinte (hash 64 bits) par ligne d'entrée, calculée sur les colonnes
+utilisées (nom, taille), est enregistrée à côté du fichier de sortie. À la
+relance, seules les lignes nouvelles ou modifiées sont traitées ; les autres
+reprennent la ligne correspondante du résultat précédent.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def manifest_path(output_file: str) -> str:
+    """Chemin du manifeste associé à un fichier de sortie"""
+    return f"{output_file}.manifest.npz"
+
+def row_fingerprints(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """Empreinte uint64 de chaque ligne sur les colonnes utilisées (indépendante de l'index)"""
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+def save_manifest(output_file: str, fingerprints: np.ndarray, columns: List[str]):
+    """Enregistre les empreintes des lignes ayant produit le fichier de sortie"""
+    np.savez(manifest_path(output_file), fingerprints=fingerprints, columns=np.array(columns))
+
+def load_previous(output_file: str, columns: List[str]) -> Optional[Tuple[np.ndarray, pd.DataFrame]]:
+    """
+    Charge le résultat précédent et ses empreintes
+    
+    Le résultat est relu en texte brut pour être réécrit à l'identique.
+    
+    Returns:
+        (empreintes, résultat précédent) ou None si absent ou incompatible
+    """
+    path = manifest_path(output_file)
+    if not (Path(path).exists() and Path(output_file).exists()):
+        return None
+    
+    with np.load(path) as manifest:
+        fingerprints = manifest['fingerprints']
+        previous_columns = list(manifest['columns'])
+    
+    if previous_columns != list(columns):
+        logger.info(f"ℹ️  Colonnes différentes du traitement précédent ({previous_columns}): traitement complet")
+        return None
+    
+    previous = pd.read_csv(output_file, dtype=str, keep_default_na=False)
+    if len(previous) != len(fingerprints):
+        logger.warning(f"⚠️ Manifeste désynchronisé de {output_file}: traitement complet")
+        return None
+    
+    return fingerprints, previous
+
+def match_previous(fingerprints: np.ndarray, previous_fingerprints: np.ndarray,
+                   redo: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Position de chaque ligne dans le résultat précédent (-1 = ligne à traiter)
+    
+    Args:
+        redo: Masque des lignes du résultat précédent à retraiter (ex. PENDING)
+    """
+    previous = pd.Series(np.arange(len(previous_fingerprints)), index=previous_fingerprints)
+    if redo is not None:
+        previous = previous[~redo]
+    previous = previous[~previous.index.duplicated()]
+    return previous.reindex(fingerprints).fillna(-1).to_numpy(dtype=np.int64)
+
+def merge_results(positions: np.ndarray, previous: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Assemble le résultat dans l'ordre des lignes d'entrée
+    
+    Args:
+        positions: Résultat de match_previous
+        previous: Résultat précédent (lignes réutilisées)
+        new_rows: Résultat des lignes traitées, dans l'ordre des positions -1
+    """
+    reused = positions >= 0
+    kept = previous.iloc[positions[reused]].set_axis(np.flatnonzero(reused))
+    fresh = new_rows.set_axis(np.flatnonzero(~reused))
+    columns = new_rows.columns if len(new_rows.columns) else previous.columns
+    return pd.concat([kept.reindex(columns=columns), fresh]).sort_index().reset_index(drop=True)
@@ -0,0 +1,73 @@
+"""
+Normalisation des noms d'entreprises pour les clés de cache et l'analyse des doublons
+
+"Air France", "AIR FRANCE", "Air France SA" et "Air-France" donnent la même
+clé "air france". Le nom d'origine reste utilisé pour les requêtes API et la
+sortie ; seule la clé est normalisée.
+"""
+
+import re
+import unicodedata
+import pandas as pd
+
+# Formes juridiques retirées en fin de nom (lettres éventuellement séparées : "S.A.S."), et en
+# début de nom seulement sous forme pointée : "SE LOGER" ou "SCI DU PARC" restent intacts.
+# Une forme n'est retirée qu'accolée à un vrai mot (2 caractères ou plus) : un sigle pointé
+# ("S.N.C.F.", "S.E.B.") n'est jamais amputé de ses premières ou dernières lettres
+LEGAL_FORMS = [
+    'sa', 'sas', 'sasu', 'sarl', 'eurl', 'snc', 'sci', 'sca', 'scs',
+    'selarl', 'selas', 'sem', 'scop', 'gie', 'se'
+]
+
+_FORMS = '|'.join(
+    r' ?'.join(form)
+    for form in sorted(LEGAL_FORMS, key=len, reverse=True)
+)
+
+_DOTTED_FORMS = '|'.join(
+    ' '.join(form)
+    for form in sorted(LEGAL_FORMS, key=len, reverse=True)
+)
+
+_PUNCTUATION = r'[^\w\s]|_'
+_SPACES = r'\s+'
+_WORD = r'[^\W_]{2}'
+_LEGAL_PREFIX = rf'^(?:(?:{_DOTTED_FORMS}) )+(?={_WORD})'
+_LEGAL_SUFFIX = rf'(?<={_WORD})(?: (?:{_FORMS}))+$'
+
+def _strip_accents(text: str) -> str:
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+def normalize_company_name(name: str) -> str:
+    """
+    Clé normalisée d'un nom d'entreprise (version scalaire)
+    
+    Casse, accents, ponctuation, espaces multiples et formes juridiques
+    (SA, SAS, SARL... en fin de nom, S.A.S., S.A.R.L.... en début) sont
+    neutralisés ; un nom fait uniquement d'initiales est gardé entier. Si rien ne reste, le nom en minuscules est conservé tel quel.
+    """
+    raw = str(name).strip()
+    text = _strip_accents(raw.casefold())
+    text = re.sub(_PUNCTUATION, ' ', text)
+    text = re.sub(_SPACES, ' ', text).strip()
+    text = re.sub(_LEGAL_SUFFIX, '', re.sub(_LEGAL_PREFIX, '', text))
+    return text or raw.casefold()
+
+def normalize_company_names(names: pd.Series) -> pd.Series:
+    """
+    Clés normalisées d'une colonne de noms (version vectorisée)
+    
+    Mêmes règles que normalize_company_name, appliquées en une passe de
+    méthodes .str sur la colonne entière.
+    """
+    raw = names.astype(str).str.strip()
+    text = (raw.str.casefold()
+            .str.normalize('NFKD')
+            .str.encode('ascii', 'ignore')
+            .str.decode('ascii')
+            .str.replace(_PUNCTUATION, ' ', regex=True)
+            .str.replace(_SPACES, ' ', regex=True)
+            .str.strip()
+            .str.replace(_LEGAL_PREFIX, '', regex=True)
+            .str.replace(_LEGAL_SUFFIX, '', regex=True))
+    return text.where(text != '', raw.str.casefold())
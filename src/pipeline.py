@@ -0,0 +1,152 @@
+"""
+Pipeline par lots : recherche INSEE, transformation Salesforce et écriture
+
+Les trois étapes tournent en parallèle, reliées par des files bornées : le
+lot N est transformé puis écrit pendant que les noms du lot N+1 sont
+recherchés. La transformation et l'écriture disque se font pendant l'attente
+du budget API, et les premiers résultats sont visibles dans le fichier de
+sortie dès le premier lot. Les lots sont écrits dans l'ordre des lignes
+d'entrée.
+"""
+
+import queue
+import logging
+import threading
+import pandas as pd
+from pathlib import Path
+from typing import Any, Dict, Optional
+from .data_processor import DataProcessor
+from .normalize import normalize_company_names
+from .salesforce_export import SalesforceExporter
+
+logger = logging.getLogger(__name__)
+
+# Fin de flux entre deux étapes
+_END = object()
+
+class PipelinedRunner:
+    """Enrichissement par lots avec étapes concurrentes et écriture incrémentale"""
+    
+    def __init__(self, processor: DataProcessor, exporter: SalesforceExporter,
+                 batch_size: int = 200, queue_size: int = 2, workers: int = 1):
+        """
+        Initialise le pipeline
+        
+        Args:
+            processor: Processeur (et son client INSEE) pour l'étape de recherche
+            exporter: Exporteur pour l'étape de transformation
+            batch_size: Nombre de lignes par lot
+            queue_size: Lots en attente au plus entre deux étapes (mémoire bornée)
+            workers: Threads de recherche par lot
+        """
+        self.processor = processor
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.workers = workers
+        self._failed = threading.Event()
+    
+    def run(self, df: pd.DataFrame, company_col: str, size_col: Optional[str],
+            output_file: str) -> Dict[str, Any]:
+        """
+        Enrichit, transforme et écrit le DataFrame lot par lot
+        
+        Returns:
+            Statistiques du pipeline (lignes, lots)
+        """
+        self._failed.clear()
+        enriched = queue.Queue(maxsize=self.queue_size)
+        transformed = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        stats = {'rows': 0, 'batches': 0}
+        
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        stages = [
+            threading.Thread(target=self._stage, name='transform', daemon=True,
+                             args=(self._transform, enriched, transformed, errors)),
+            threading.Thread(target=self._stage, name='write', daemon=True,
+                             args=(self._writer(output_file, stats), transformed, None, errors))
+        ]
+        for stage in stages:
+            stage.start()
+        
+        # Étape de recherche dans le thread appelant (normalisation faite une fois)
+        company_names = df[company_col].map(str).str.strip()
+        keys = normalize_company_names(company_names)
+        try:
+            for start in range(0, len(df), self.batch_size):
+                if self._failed.is_set():
+                    break
+                rows = slice(start, start + self.batch_size)
+                batch = self.processor.enrich_batch(
+                    df.iloc[rows], company_col, size_col, workers=self.workers,
+                    company_names=company_names.iloc[rows], keys=keys.iloc[rows]
+                )
+                self._put(enriched, batch)
+        except BaseException as e:
+            errors.append(e)
+            self._failed.set()
+        finally:
+            self._put(enriched, _END, force=True)
+        
+        for stage in stages:
+            stage.join()
+        if errors:
+            raise errors[0]
+        if not stats['batches']:
+            pd.DataFrame().to_csv(output_file, index=False, encoding='utf-8')
+        
+        logger.info(f"✅ Pipeline terminé: {stats['rows']} lignes en {stats['batches']} lots")
+        return stats
+    
+    def _stage(self, process, inbox: queue.Queue, outbox: Optional[queue.Queue], errors: list):
+        """Boucle d'une étape : traite les lots jusqu'à la fin de flux ou une erreur"""
+        try:
+            while True:
+                batch = inbox.get()
+                if batch is _END or self._failed.is_set():
+                    break
+                result = process(batch)
+                if outbox is not None:
+                    self._put(outbox, result)
+        except BaseException as e:
+            errors.append(e)
+            self._failed.set()
+        finally:
+            if outbox is not None:
+                self._put(outbox, _END, force=True)
+            # Débloque l'étape amont si elle attend de la place
+            while self._failed.is_set() and not inbox.empty():
+                inbox.get_nowait()
+    
+    def _put(self, box: queue.Queue, item: Any, force: bool = False):
+        """Dépose un lot en attendant de la place, sauf si une étape a échoué"""
+        while True:
+            if self._failed.is_set() and not force:
+                return
+            try:
+                box.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._failed.is_set():
+                    return
+    
+    def _transform(self, batch: pd.DataFrame) -> pd.DataFrame:
+        return self.exporter.transform_for_salesforce(batch, log_stats=False)
+    
+    def _writer(self, output_file: str, stats: Dict[str, Any]):
+        """Étape d'écriture : en-tête au premier lot, ajout des suivants dans le même ordre de colonnes"""
+        columns = []
+        
+        def write(batch: pd.DataFrame):
+            if not columns:
+                columns.extend(batch.columns)
+                batch.to_csv(output_file, index=False, encoding='utf-8')
+            else:
+                batch.reindex(columns=columns).to_csv(output_file, mode='a', header=False,
+                                                      index=False, encoding='utf-8')
+            stats['rows'] += len(batch)
+            stats['batches'] += 1
+            logger.info(f"💾 Lot {stats['batches']} écrit: {stats['rows']} lignes dans {output_file}")
+        
+        return write
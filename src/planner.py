@@ -0,0 +1,188 @@
+"""
+Prévision du coût d'une exécution, sans aucun appel réseau
+
+Les noms sont normalisés et dédoublonnés puis confrontés aux caches (alias,
+entités, requêtes, filtre de Bloom). Pour les noms restant à chercher, le
+nombre d'appels attendu suit les taux de succès historiques de chaque
+variation (enregistrés par le client dans le cache persistant) ; une requête
+partagée par plusieurs noms n'est comptée qu'une fois. La durée découle du
+débit configuré : délai par clé, nombre de clés du pool et threads.
+
+Avec des shards, chaque partition de cache est prévue séparément puis les
+prévisions sont cumulées (combine_forecasts) : les shards tournent en
+parallèle en se partageant le débit des clés.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+from .cache import MISSING
+from .data_processor import DataProcessor
+from .insee_client import INSEEClient
+from .normalize import normalize_company_names
+
+logger = logging.getLogger(__name__)
+
+# Durée indicative d'une requête Sirene (s), plafond de débit d'un thread sans limitation
+DEFAULT_LATENCY = 0.5
+
+class RunPlanner:
+    """Estime appels API et durée d'un enrichissement à partir des caches"""
+    
+    def __init__(self, client: INSEEClient, workers: int = 1, latency: float = DEFAULT_LATENCY,
+                 shards: int = 1):
+        """
+        Initialise le planificateur
+        
+        Args:
+            client: Client INSEE (caches, clés et délai de l'exécution prévue), de
+                préférence en lecture seule
+            workers: Threads de recherche prévus
+            latency: Durée indicative d'une requête en secondes
+            shards: Processus lancés en parallèle, se partageant le débit des clés
+        """
+        self.client = client
+        self.workers = workers
+        self.latency = latency
+        self.shards = shards
+    
+    def calls_per_minute(self) -> float:
+        """Débit prévu d'un processus : sa part du budget des clés, bornée par la latence des threads"""
+        keys = max(1, len(self.client.api_keys))
+        rate_limit = keys * 60 / self.client.delay / self.shards if self.client.delay > 0 else float('inf')
+        return min(rate_limit, self.workers * 60 / self.latency)
+    
+    def plan(self, company_names: pd.Series, priority: Optional[pd.Series] = None,
+             max_api_calls: Optional[int] = None, max_duration: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Prévoit le coût de l'enrichissement des noms donnés
+        
+        Args:
+            company_names: Noms d'entreprises, une valeur par ligne
+            priority: Poids des lignes (ordre des recherches, comme à l'exécution)
+            max_api_calls, max_duration: Budget prévu ; la part de lignes enrichies
+                dans ce budget est estimée
+        
+        Returns:
+            Prévision : états en cache, appels attendus et maximum, durées
+        """
+        company_names = company_names.map(str).str.strip()
+        keys = normalize_company_names(company_names)
+        order = DataProcessor._schedule(keys, priority)
+        weights = DataProcessor._key_weights(keys, priority if priority is not None
+                                             else pd.Series(1.0, index=keys.index))
+        
+        states = dict.fromkeys(['found', 'negative', 'bloom', 'expired', 'missing'], 0)
+        retries_left = self.client.negative_retry_budget
+        searched = 0
+        planned = set()
+        expected_calls = np.zeros(len(order))
+        max_calls = 0
+        
+        rates, history = self.client.variation_hit_rates(3)
+        for index, position in enumerate(order):
+            state = self.client.cached_state(keys.iat[position])
+            states[state] += 1
+            if state == 'expired':
+                # Négatif expiré : re-tenté seulement dans la limite du budget de re-tentatives
+                if retries_left is not None and retries_left <= 0:
+                    continue
+                retries_left = retries_left - 1 if retries_left is not None else None
+            elif state != 'missing':
+                continue
+            
+            searched += 1
+            reach = 1.0
+            for variation, (query_key, cached) in enumerate(self.client.query_states(company_names.iat[position])):
+                if cached is MISSING and query_key not in planned:
+                    planned.add(query_key)
+                    expected_calls[index] += reach
+                    max_calls += 1
+                if cached is None:
+                    continue
+                if cached is not MISSING:
+                    break
+                reach *= 1 - rates[min(variation, len(rates) - 1)]
+        
+        per_minute = self.calls_per_minute()
+        expected = float(expected_calls.sum())
+        forecast = {
+            'rows': len(keys),
+            'unique': len(order),
+            'cached_found': states['found'],
+            'cached_negative': states['negative'] + states['bloom'],
+            'expired_negative': states['expired'],
+            'to_search': searched,
+            'expected_calls': round(expected),
+            'max_calls': max_calls,
+            'calls_per_minute': round(per_minute, 1),
+            'expected_minutes': round(expected / per_minute, 1),
+            'max_minutes': round(max_calls / per_minute, 1),
+            'history_lookups': history,
+            'variation_hit_rates': [round(rate, 3) for rate in rates]
+        }
+        
+        # Budget : noms couverts dans l'ordre des recherches tant que le coût cumulé
+        # tient, plus ceux servis par le cache (résolus même budget épuisé)
+        if max_api_calls is not None or max_duration is not None:
+            limit = min(max_api_calls if max_api_calls is not None else float('inf'),
+                        max_duration / 60 * per_minute if max_duration is not None else float('inf'))
+            covered = (np.cumsum(expected_calls) <= limit) | (expected_calls == 0)
+            covered_weight = weights.reindex(keys.iloc[order[covered]].to_numpy()).sum()
+            forecast['budget_calls'] = limit
+            forecast['budget_weight'] = float(covered_weight)
+            forecast['total_weight'] = float(weights.sum())
+            forecast['budget_rows_percent'] = round(covered_weight / max(weights.sum(), 1e-9) * 100, 1)
+        
+        return forecast
+
+def combine_forecasts(forecasts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Cumule les prévisions de shards exécutés en parallèle
+    
+    Appels et noms s'additionnent ; la durée est celle du shard le plus long.
+    Les taux de succès sont moyennés selon l'historique de chaque partition.
+    """
+    if len(forecasts) == 1:
+        return forecasts[0]
+    
+    combined = {
+        field: sum(forecast[field] for forecast in forecasts)
+        for field in ('rows', 'unique', 'cached_found', 'cached_negative', 'expired_negative',
+                      'to_search', 'expected_calls', 'max_calls', 'calls_per_minute', 'history_lookups')
+    }
+    combined['calls_per_minute'] = round(combined['calls_per_minute'], 1)
+    combined['expected_minutes'] = max(forecast['expected_minutes'] for forecast in forecasts)
+    combined['max_minutes'] = max(forecast['max_minutes'] for forecast in forecasts)
+    
+    weights = np.array([forecast['history_lookups'] for forecast in forecasts], dtype=float)
+    if not weights.sum():
+        weights[:] = 1
+    rates = np.array([forecast['variation_hit_rates'] for forecast in forecasts])
+    combined['variation_hit_rates'] = [round(rate, 3) for rate in weights @ rates / weights.sum()]
+    
+    if 'budget_rows_percent' in forecasts[0]:
+        combined['budget_calls'] = sum(forecast['budget_calls'] for forecast in forecasts)
+        combined['budget_weight'] = sum(forecast['budget_weight'] for forecast in forecasts)
+        combined['total_weight'] = sum(forecast['total_weight'] for forecast in forecasts)
+        combined['budget_rows_percent'] = round(
+            combined['budget_weight'] / max(combined['total_weight'], 1e-9) * 100, 1
+        )
+    return combined
+
+def log_forecast(forecast: Dict[str, Any]):
+    """Affiche la prévision d'exécution"""
+    logger.info(f"\n🔮 PRÉVISION (aucun appel réseau):")
+    logger.info(f"   📄 Lignes: {forecast['rows']} | 🏢 Noms uniques: {forecast['unique']}")
+    logger.info(f"   💾 Déjà en cache: {forecast['cached_found']} trouvés, {forecast['cached_negative']} introuvables")
+    logger.info(f"   ♻️ Négatifs expirés: {forecast['expired_negative']}")
+    logger.info(f"   🔍 Noms à rechercher: {forecast['to_search']}")
+    logger.info(f"   🎲 Taux de succès par variation: {forecast['variation_hit_rates']} "
+                f"({forecast['history_lookups']} recherches historiques)")
+    logger.info(f"   🔗 Appels API estimés: ~{forecast['expected_calls']} (maximum: {forecast['max_calls']})")
+    logger.info(f"   ⏱️  Durée estimée: ~{forecast['expected_minutes']} min (maximum: {forecast['max_minutes']} min) "
+                f"à {forecast['calls_per_minute']} requêtes/min")
+    if 'budget_rows_percent' in forecast:
+        logger.info(f"   ⏸️  Dans le budget (~{forecast['budget_calls']:.0f} appels): "
+                    f"~{forecast['budget_rows_percent']}% des lignes enrichies, le reste en PENDING")
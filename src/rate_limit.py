@@ -0,0 +1,207 @@
+"""
+Budget de requêtes partagé entre processus (seau à jetons SQLite)
+
+Tous les clients d'une même machine utilisant la même clé API puisent dans
+le même seau : le débit total reste au quota quel que soit le nombre de
+traitements lancés en parallèle. Le verrou d'écriture SQLite (BEGIN
+IMMEDIATE) sérialise les prises de jetons entre processus.
+
+Avec plusieurs clés (applications INSEE aux quotas distincts), chaque clé a
+son propre seau : le débit total augmente avec le nombre de clés. Seaux et
+pool peuvent être partagés entre les threads d'un processus.
+"""
+
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT_PATH = str(Path(tempfile.gettempdir()) / 'insee_rate_limit.sqlite')
+
+class SharedRateLimiter:
+    """Seau à jetons persistant, partagé par tous les processus d'une machine"""
+    
+    def __init__(self, requests_per_minute: float, api_key: str = '',
+                 path: Optional[str] = None, burst: int = 1):
+        """
+        Initialise le limiteur
+        
+        Args:
+            requests_per_minute: Débit total autorisé pour la clé API
+            api_key: Clé API (seule une empreinte sert de nom de seau)
+            path: Fichier SQLite partagé (défaut: répertoire temporaire du système)
+            burst: Nombre de requêtes pouvant partir sans attente après une pause
+        """
+        self.rate = requests_per_minute / 60
+        self.burst = burst
+        self.path = path or DEFAULT_RATE_LIMIT_PATH
+        self.bucket = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS buckets '
+            '(bucket TEXT PRIMARY KEY, tokens REAL, updated_at REAL)'
+        )
+    
+    def acquire(self) -> float:
+        """
+        Prend un jeton, en attendant si le seau est vide
+        
+        Returns:
+            Temps d'attente en secondes
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                self.waited += waited
+                return waited
+            time.sleep(wait)
+            waited += wait
+    
+    def try_acquire(self) -> float:
+        """Prend un jeton si disponible (0), sinon retourne l'attente nécessaire sans bloquer"""
+        def take(tokens):
+            if tokens >= 1:
+                return tokens - 1, 0.0
+            return tokens, (1 - tokens) / self.rate
+        return self._update(take)
+    
+    def penalize(self, seconds: float):
+        """Vide le seau pour `seconds` secondes (clé limitée par l'API), pour tous les processus"""
+        self._update(lambda tokens: (min(tokens, 1 - seconds * self.rate), seconds))
+    
+    def available(self) -> float:
+        """Jetons disponibles (lecture seule, indicatif entre processus)"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT tokens, updated_at FROM buckets WHERE bucket = ?', (self.bucket,)
+            ).fetchone()
+            if row is None:
+                return float(self.burst)
+            return min(self.burst, row[0] + (time.time() - row[1]) * self.rate)
+    
+    def _update(self, change) -> float:
+        """Recharge le seau puis applique `change(jetons) -> (jetons, résultat)` sous verrou"""
+        with self._lock:
+            now = time.time()
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._db.execute(
+                    'SELECT tokens, updated_at FROM buckets WHERE bucket = ?', (self.bucket,)
+                ).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+                tokens, result = change(tokens)
+                
+                self._db.execute(
+                    'INSERT OR REPLACE INTO buckets (bucket, tokens, updated_at) VALUES (?, ?, ?)',
+                    (self.bucket, tokens, now)
+                )
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+            return result
+    
+    def close(self):
+        """Ferme la connexion au seau partagé"""
+        with self._lock:
+            self._db.close()
+
+def key_label(api_key: str) -> str:
+    """Forme abrégée d'une clé API pour les logs et statistiques"""
+    return f"{api_key[:8]}..."
+
+class KeyPool:
+    """Pool de clés API : chaque requête part avec la clé disposant du plus de budget"""
+    
+    def __init__(self, api_keys: Iterable[str], requests_per_minute: Optional[float] = None,
+                 path: Optional[str] = None, cooldown: float = 10.0):
+        """
+        Initialise le pool
+        
+        Args:
+            api_keys: Clés API (doublons ignorés)
+            requests_per_minute: Débit autorisé par clé (None = pas de limitation)
+            path: Fichier SQLite des seaux partagés (défaut: répertoire temporaire du système)
+            cooldown: Durée (s) de mise à l'écart d'une clé limitée par l'API (429)
+        """
+        self.keys = list(dict.fromkeys(api_keys))
+        self.cooldown = cooldown
+        self.limiters = {
+            key: SharedRateLimiter(requests_per_minute, api_key=key, path=path)
+            for key in self.keys
+        } if requests_per_minute else {}
+        self.paused_until = dict.fromkeys(self.keys, 0.0)
+        self.stats = {key: {'requests': 0, 'throttled': 0} for key in self.keys}
+        self.waited = 0.0
+        self._turn = 0
+        self._lock = threading.RLock()
+    
+    def acquire(self) -> str:
+        """
+        Choisit la clé de la prochaine requête, en attendant si aucune n'a de budget
+        
+        Returns:
+            Clé API à utiliser
+        """
+        waited = 0.0
+        while True:
+            now = time.time()
+            with self._lock:
+                ready = [key for key in self.keys if self.paused_until[key] <= now]
+                waits = [self.paused_until[key] - now for key in self.keys if key not in ready]
+                
+                if ready and not self.limiters:
+                    # Sans limitation : rotation simple entre clés disponibles
+                    key = ready[self._turn % len(ready)]
+                    self._turn += 1
+                    return self._take(key, waited)
+            
+            # Clé la plus garnie d'abord ; un autre processus peut l'avoir vidée entre-temps
+            for key in sorted(ready, key=lambda k: self.limiters[k].available(), reverse=True):
+                wait = self.limiters[key].try_acquire()
+                if wait <= 0:
+                    return self._take(key, waited)
+                waits.append(wait)
+            
+            wait = min(waits)
+            time.sleep(wait)
+            waited += wait
+    
+    def _take(self, key: str, waited: float) -> str:
+        with self._lock:
+            self.stats[key]['requests'] += 1
+            self.waited += waited
+        if waited:
+            logger.debug(f"⏳ Budget partagé: attente de {waited:.1f}s")
+        return key
+    
+    def throttled(self, key: str):
+        """Met une clé à l'écart après un 429, le temps du cooldown"""
+        with self._lock:
+            self.stats[key]['throttled'] += 1
+            self.paused_until[key] = time.time() + self.cooldown
+        if key in self.limiters:
+            self.limiters[key].penalize(self.cooldown)
+        logger.warning(f"🔑 Clé {key_label(key)} limitée par l'API: en pause {self.cooldown:.0f}s")
+    
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Requêtes et 429 par clé (clés abrégées)"""
+        with self._lock:
+            return {key_label(key): dict(stats) for key, stats in self.stats.items()}
+    
+    def close(self):
+        """Ferme les seaux partagés"""
+        with self._lock:
+            for limiter in self.limiters.values():
+                limiter.close()
@@ -0,0 +1,183 @@
+"""
+Enregistrement compact d'une entreprise trouvée dans Sirene
+
+Seuls les champs extraits de la réponse API sont conservés (pas la réponse
+brute ni les colonnes dérivées), dans un objet à __slots__ partagé par les
+caches et par l'assemblage des résultats.
+"""
+
+import sys
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence
+from .tranches import describe_tranche, normalize_tranche_code
+
+def _intern(value: Any) -> Any:
+    """Partage en mémoire les chaînes très répétées (catégories, codes NAF, états)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+# Champs de l'établissement retenu pour un nom : stockés par alias, pas par SIREN
+# (deux noms d'une même unité légale peuvent désigner deux établissements)
+ESTABLISHMENT_FIELDS = ('siret', 'etablissement_siege', 'tranche_etablissement', 'annee_effectifs_etablissement')
+
+class CompanyRecord:
+    """Champs extraits d'un établissement Sirene et de son unité légale"""
+    
+    __slots__ = (
+        'siren',
+        'siret',
+        'denomination',
+        'categorie_entreprise',
+        'date_creation',
+        'activite_principale',
+        'etat_administratif',
+        'etablissement_siege',
+        'nombre_periodes',
+        'tranche_unite_legale',
+        'annee_effectifs_unite_legale',
+        'tranche_etablissement',
+        'annee_effectifs_etablissement'
+    )
+    
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+    
+    @classmethod
+    def from_etablissement(cls, etablissement: Dict[str, Any]) -> 'CompanyRecord':
+        """Construit l'enregistrement depuis un établissement de la réponse /siret"""
+        unite_legale = etablissement.get('uniteLegale') or {}
+        tranche_ul = unite_legale.get('trancheEffectifsUniteLegale')
+        tranche_etab = etablissement.get('trancheEffectifsEtablissement')
+        
+        return cls(
+            siren=etablissement.get('siren'),
+            siret=etablissement.get('siret'),
+            denomination=unite_legale.get('denominationUniteLegale'),
+            categorie_entreprise=_intern(unite_legale.get('categorieEntreprise')),
+            date_creation=unite_legale.get('dateCreationUniteLegale'),
+            activite_principale=_intern(unite_legale.get('activitePrincipaleUniteLegale')),
+            etat_administratif=_intern(unite_legale.get('etatAdministratifUniteLegale')),
+            etablissement_siege=etablissement.get('etablissementSiege'),
+            nombre_periodes=unite_legale.get('nombrePeriodesUniteLegale'),
+            tranche_unite_legale=normalize_tranche_code(tranche_ul) or tranche_ul,
+            annee_effectifs_unite_legale=_intern(unite_legale.get('anneeEffectifsUniteLegale')),
+            tranche_etablissement=normalize_tranche_code(tranche_etab) or tranche_etab,
+            annee_effectifs_etablissement=_intern(etablissement.get('anneeEffectifsEtablissement'))
+        )
+    
+    @classmethod
+    def from_search_result(cls, search_result: Dict[str, Any]) -> Optional['CompanyRecord']:
+        """
+        Construit l'enregistrement depuis une réponse complète, siège social en priorité
+        (logique historique de process_optimized_duplicates)
+        """
+        etablissements = search_result.get('etablissements') or []
+        if not etablissements:
+            return None
+        
+        siege = next((etab for etab in etablissements if etab.get('etablissementSiege')), None)
+        return cls.from_etablissement(siege or etablissements[0])
+    
+    @property
+    def tranche(self) -> Optional[str]:
+        """Tranche retenue : unité légale en priorité, sinon établissement"""
+        return self.tranche_unite_legale or self.tranche_etablissement
+    
+    @property
+    def annee_effectifs(self) -> Optional[str]:
+        """Année de référence des effectifs de la tranche retenue"""
+        if self.tranche_unite_legale:
+            return self.annee_effectifs_unite_legale
+        return self.annee_effectifs_etablissement
+    
+    def entity(self) -> 'CompanyRecord':
+        """Champs de l'unité légale seuls (stockage par SIREN, commun à tous les alias)"""
+        return CompanyRecord(**{
+            name: getattr(self, name) for name in self.__slots__ if name not in ESTABLISHMENT_FIELDS
+        })
+    
+    def reference(self) -> List[Any]:
+        """Valeur d'un alias : SIREN puis champs de l'établissement retenu pour ce nom"""
+        return [self.siren] + [getattr(self, name) for name in ESTABLISHMENT_FIELDS]
+    
+    def with_establishment(self, values: Sequence[Any]) -> 'CompanyRecord':
+        """Entité complétée par les champs d'établissement d'un alias (voir reference)"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(zip(ESTABLISHMENT_FIELDS, values))
+        return CompanyRecord(**fields)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Colonnes INSEE du pipeline src/ (format de INSEEClient.search_company)"""
+        tranche = describe_tranche(self.tranche)
+        if self.tranche and tranche['code'] is None:
+            description = 'Code inconnu'
+        else:
+            description = tranche['description']
+        
+        return {
+            'Statut_Recherche': 'Trouvé',
+            'SIREN': self.siren,
+            'SIRET': self.siret,
+            'Denomination_INSEE': self.denomination,
+            'Categorie_Entreprise_INSEE': self.categorie_entreprise,
+            'Date_Creation': self.date_creation,
+            'Activite_Principale': self.activite_principale,
+            'Etat_Administratif': self.etat_administratif,
+            'Etablissement_Siege': self.etablissement_siege,
+            'Nombre_Etablissements': self.nombre_periodes,
+            'tranche_effectifs_unite_legale': tranche['code'] or self.tranche,
+            'Effectifs_Description': description,
+            'Effectifs_Numeric': tranche['midpoint'],
+            'Annee_Effectifs': self.annee_effectifs
+        }
+    
+    def to_legacy_dict(self) -> Dict[str, Any]:
+        """Champs historiques du pipeline process_optimized_duplicates (effectifs, identifiants)"""
+        return {
+            'effectifs_etablissement': None,
+            'effectifs_unite_legale': None,
+            'tranche_effectifs_etablissement': self.tranche_etablissement,
+            'tranche_effectifs_unite_legale': self.tranche_unite_legale,
+            'annee_effectifs': None,
+            'annee_effectifs_etablissement': self.annee_effectifs_etablissement,
+            'annee_effectifs_unite_legale': self.annee_effectifs_unite_legale,
+            'denomination': self.denomination,
+            'siren': self.siren,
+            'siret': self.siret,
+            'categorie_entreprise': self.categorie_entreprise,
+            'activite_principale': self.activite_principale
+        }
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CompanyRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __repr__(self) -> str:
+        return f"CompanyRecord(siren={self.siren!r}, denomination={self.denomination!r})"
+
+# Colonnes INSEE du pipeline src/ et attribut source (ordre historique de _extract_company_data)
+FRAME_COLUMNS = [
+    ('SIREN', 'siren'),
+    ('SIRET', 'siret'),
+    ('Denomination_INSEE', 'denomination'),
+    ('Categorie_Entreprise_INSEE', 'categorie_entreprise'),
+    ('Date_Creation', 'date_creation'),
+    ('Activite_Principale', 'activite_principale'),
+    ('Etat_Administratif', 'etat_administratif'),
+    ('Etablissement_Siege', 'etablissement_siege'),
+    ('Nombre_Etablissements', 'nombre_periodes'),
+    ('tranche_effectifs_unite_legale', 'tranche'),
+    ('Annee_Effectifs', 'annee_effectifs')
+]
+
+def records_to_frame(records: Sequence[Optional[CompanyRecord]], index=None) -> pd.DataFrame:
+    """
+    Assemble les colonnes INSEE d'une liste d'enregistrements (None = non trouvé)
+    
+    Les colonnes sont construites attribut par attribut, sans dictionnaire par ligne.
+    """
+    return pd.DataFrame({
+        column: [getattr(r, attribute) if r is not None else None for r in records]
+        for column, attribute in FRAME_COLUMNS
+    }, index=index)
@@ -0,0 +1,126 @@
+"""
+Rafraîchissement incrémental des entités en cache
+
+Les entités en cache (unités légales) sont interrogées par lots (requête OR
+sur les SIREN, établissement siège) en filtrant sur la date de dernier
+traitement Sirene de l'unité légale : seules les entités modifiées depuis leur
+mise en cache sont renvoyées, et leurs données remplacent l'entité (tous les
+alias en profitent). Les autres sont marquées comme vérifiées. Les champs
+d'établissement propres à chaque alias ne sont pas rafraîchis.
+"""
+
+import time
+import logging
+import requests
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from .budget import BudgetExhausted
+from .cache import MISSING
+from .insee_client import INSEEClient
+from .records import CompanyRecord
+
+logger = logging.getLogger(__name__)
+
+class EntityRefresher:
+    """Vérifie les entités en cache contre Sirene, dans un budget d'appels API"""
+    
+    def __init__(self, client: INSEEClient, batch_size: int = 50, older_than_days: float = 7):
+        """
+        Initialise le rafraîchissement
+        
+        Args:
+            client: Client INSEE dont le cache d'entités est rafraîchi (cache persistant requis)
+            batch_size: Nombre de SIRET par requête OR
+            older_than_days: Seules les entités vérifiées il y a plus de N jours sont interrogées
+        """
+        self.client = client
+        self.batch_size = batch_size
+        self.older_than_days = older_than_days
+        self.stats = {
+            'api_calls': 0,
+            'checked': 0,
+            'updated': 0
+        }
+    
+    def run(self, max_calls: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Rafraîchit les entités les plus anciennes d'abord
+        
+        Args:
+            max_calls: Budget de requêtes API (None = toutes les entités éligibles)
+        
+        Returns:
+            Statistiques du rafraîchissement
+        """
+        cutoff = time.time() - self.older_than_days * 86400
+        stale = self.client.entities.stored_before(cutoff)
+        logger.info(f"♻️ Rafraîchissement: {len(stale)} entités vérifiées il y a plus de {self.older_than_days} jours")
+        
+        start, throttled = 0, 0
+        while start < len(stale):
+            if max_calls is not None and self.stats['api_calls'] >= max_calls:
+                logger.info(f"   ⏹️  Budget de {max_calls} requêtes atteint")
+                break
+            
+            batch = stale[start:start + self.batch_size]
+            try:
+                self._refresh_batch(batch)
+            except requests.exceptions.HTTPError as e:
+                # 429 : le lot est relancé avec une autre clé du pool (une fois par clé)
+                throttled += e.response.status_code == 429
+                if e.response.status_code == 429 and throttled < len(self.client.key_pool.keys):
+                    continue
+                logger.warning(f"   ⚠️ Rafraîchissement interrompu (HTTP {e.response.status_code})")
+                break
+            except BudgetExhausted:
+                # Budget d'exécution du client épuisé : les entités restantes attendront
+                break
+            start += self.batch_size
+            throttled = 0
+        
+        logger.info(f"   ✅ {self.stats['checked']} vérifiées, {self.stats['updated']} mises à jour, "
+                    f"{self.stats['api_calls']} requêtes")
+        return dict(self.stats)
+    
+    def _refresh_batch(self, batch: List[tuple]):
+        """Une requête pour un lot d'entités : seules les modifiées reviennent"""
+        records = {}
+        for siren, _ in batch:
+            record = self.client.entities.get(siren)
+            if record is not MISSING and record is not None:
+                records[siren] = record
+        if not records:
+            return
+        
+        # Le lot est trié par ancienneté : sa date la plus ancienne couvre toutes les entités
+        since = datetime.fromtimestamp(batch[0][1]).strftime('%Y-%m-%d')
+        sirens = ' OR '.join(f'siren:{siren}' for siren in records)
+        params = {
+            'q': (f'({sirens}) AND etablissementSiege:true '
+                  f'AND dateDernierTraitementUniteLegale:[{since} TO *]'),
+            'nombre': len(records)
+        }
+        
+        self.stats['api_calls'] += 1
+        response = self.client.send(f"{self.client.base_url}/siret", params)
+        
+        # 404 = aucun établissement du lot modifié depuis la date
+        if response.status_code == 404:
+            changed = []
+        else:
+            response.raise_for_status()
+            changed = response.json().get('etablissements') or []
+        
+        updated = set()
+        for etablissement in changed:
+            record = CompanyRecord.from_etablissement(etablissement).entity()
+            if record.siren and record != self.client.entities.get(record.siren):
+                self.client.update_entity(record)
+                updated.add(record.siren)
+        
+        unchanged = [siren for siren in records if siren not in updated]
+        self.client.entities.touch(unchanged)
+        
+        self.stats['checked'] += len(records)
+        self.stats['updated'] += len(updated)
+        logger.debug(f"   🔁 Lot de {len(records)} entités: {len(updated)} modifiées")
@@ -3,14 +3,36 @@ Module d'export et transformation des données pour Salesforce
 """
 
 import pandas as pd
+import numpy as np
 import logging
 from typing import Dict, Any, Tuple, Optional
+from .budget import PENDING_STATUS
 
 logger = logging.getLogger(__name__)
 
 class SalesforceExporter:
     """Exporteur pour transformer les données INSEE en format Salesforce"""
     
+    # Colonnes lues par les règles de dérivation (faible cardinalité)
+    DERIVED_KEY_COLUMNS = [
+        'Statut_Recherche',
+        'Effectifs_Numeric',
+        'Effectifs_Description',
+        'Taille_Original',
+        'Categorie_Entreprise_INSEE'
+    ]
+    
+    # Colonnes calculées à partir de la table de dérivation
+    DERIVED_COLUMNS = [
+        'Effectifs_Salesforce',
+        'Confiance_Donnee',
+        'Statut_Revision',
+        'Notes_Revision'
+    ]
+    
+    CONFIDENCE_LEVELS = ['none', 'low', 'medium', 'high']
+    REVISION_STATUSES = ['CONFIRMED', 'CONFLICT_TO_REVIEW', 'TO_REVIEW', 'NOT_FOUND', PENDING_STATUS]
+    
     def __init__(self):
         """Initialise l'exporteur"""
         self.size_mapping = {
@@ -20,12 +42,13 @@ class SalesforceExporter:
             'GE': {'range': (5000, float('inf')), 'default': 10000}
         }
     
-    def transform_for_salesforce(self, df: pd.DataFrame) -> pd.DataFrame:
+    def transform_for_salesforce(self, df: pd.DataFrame, log_stats: bool = True) -> pd.DataFrame:
         """
         Transforme les données INSEE en format compatible Salesforce
         
         Args:
             df: DataFrame avec données INSEE brutes
+            log_stats: Afficher les statistiques du résultat (désactivé pour un lot du pipeline)
             
         Returns:
             DataFrame transformé pour Salesforce
@@ -37,25 +60,14 @@ class SalesforceExporter:
         
         logger.info(f"🔄 Conversion des tranches d'effectifs...")
         
-        # Conversion des effectifs en format numérique Salesforce
-        df_salesforce['Effectifs_Salesforce'] = df_salesforce.apply(
-            self._convert_effectifs_to_salesforce, axis=1
-        )
-        
-        # Détermination du niveau de confiance
-        df_salesforce['Confiance_Donnee'] = df_salesforce.apply(
-            self._determine_confidence_level, axis=1
-        )
-        
-        # Détermination du statut de révision intelligent
-        df_salesforce['Statut_Revision'] = df_salesforce.apply(
-            self._determine_revision_status, axis=1
-        )
+        # Les colonnes dérivées (effectifs Salesforce, confiance, statut, notes) ne
+        # dépendent que de quelques colonnes à faible cardinalité : on les calcule
+        # une seule fois par combinaison puis on les redistribue sur les lignes
+        codes, derived_table = self._build_derived_table(df_salesforce)
+        logger.info(f"🧮 Table de dérivation: {len(derived_table)} combinaisons pour {len(df_salesforce)} lignes")
         
-        # Génération des notes de révision
-        df_salesforce['Notes_Revision'] = df_salesforce.apply(
-            self._generate_revision_notes, axis=1
-        )
+        for col in self.DERIVED_COLUMNS:
+            df_salesforce[col] = self._take_by_codes(derived_table[col], codes)
         
         # Correction automatique des effectifs manquants
         df_salesforce = self._fix_missing_effectifs(df_salesforce)
@@ -64,10 +76,58 @@ class SalesforceExporter:
         df_salesforce = self._reorder_columns(df_salesforce)
         
         # Statistiques finales
-        self._log_salesforce_stats(df_salesforce)
+        if log_stats:
+            self._log_salesforce_stats(df_salesforce)
 
         return df_salesforce
     
+    def deduplicate_by_entity(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Ne garde qu'une ligne par entité (SIREN) pour l'import Salesforce
+        
+        Plusieurs noms d'entrée peuvent désigner la même entreprise ; la première
+        occurrence est conservée. Les lignes sans SIREN (non trouvées) sont toutes gardées.
+        """
+        duplicated = df['SIREN'].notna() & df.duplicated('SIREN')
+        if duplicated.any():
+            logger.info(f"🧬 Dédoublonnage par entité: {int(duplicated.sum())} lignes retirées")
+        return df[~duplicated].reset_index(drop=True)
+    
+    def _build_derived_table(self, df: pd.DataFrame) -> Tuple[np.ndarray, pd.DataFrame]:
+        """
+        Construit la table des colonnes dérivées, une ligne par combinaison de clés
+        
+        Returns:
+            (codes, table) où codes[i] est l'indice de la ligne de table pour la ligne i
+        """
+        keys = df.reindex(columns=self.DERIVED_KEY_COLUMNS)
+        codes = keys.groupby(self.DERIVED_KEY_COLUMNS, dropna=False, sort=False, observed=True).ngroup().to_numpy()
+        
+        # Première occurrence de chaque combinaison, rangée selon son code
+        first_rows = ~pd.Series(codes).duplicated().to_numpy()
+        table = keys[first_rows].copy()
+        table.index = codes[first_rows]
+        table = table.sort_index()
+        
+        # Mêmes règles que ligne à ligne, appliquées sur quelques dizaines de combinaisons
+        table['Effectifs_Salesforce'] = table.apply(self._convert_effectifs_to_salesforce, axis=1).astype(float)
+        table['Confiance_Donnee'] = table.apply(self._determine_confidence_level, axis=1)
+        table['Statut_Revision'] = table.apply(self._determine_revision_status, axis=1)
+        table['Notes_Revision'] = table.apply(self._generate_revision_notes, axis=1)
+        
+        table['Confiance_Donnee'] = pd.Categorical(table['Confiance_Donnee'], categories=self.CONFIDENCE_LEVELS)
+        table['Statut_Revision'] = pd.Categorical(table['Statut_Revision'], categories=self.REVISION_STATUSES)
+        table['Notes_Revision'] = table['Notes_Revision'].astype('category')
+        
+        return codes, table
+    
+    @staticmethod
+    def _take_by_codes(column: pd.Series, codes: np.ndarray):
+        """Redistribue une colonne de la table de dérivation sur toutes les lignes"""
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return pd.Categorical.from_codes(column.cat.codes.to_numpy()[codes], dtype=column.dtype)
+        return column.to_numpy()[codes]
+    
     def _reorder_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Réorganise les colonnes dans un ordre logique et lisible"""
         
@@ -100,7 +160,8 @@ class SalesforceExporter:
             'Etat_Administratif',
             'Etablissement_Siege',
             'Nombre_Etablissements',
-            'tranche_effectifs_unite_legale'
+            'tranche_effectifs_unite_legale',
+            'Annee_Effectifs'
         ]
         
         # Garder seulement les colonnes qui existent
@@ -120,7 +181,7 @@ class SalesforceExporter:
     
     def _determine_confidence_level(self, row: pd.Series) -> str:
         """Détermine le niveau de confiance des données"""
-        if row.get('Statut_Recherche') == 'Non trouvé':
+        if row.get('Statut_Recherche') in ('Non trouvé', PENDING_STATUS):
             return 'none'
         
         # Si trouvé dans l'API INSEE → confiance élevée
@@ -141,6 +202,8 @@ class SalesforceExporter:
         """Détermine le statut de révision intelligent"""
         if row.get('Statut_Recherche') == 'Non trouvé':
             return 'NOT_FOUND'
+        if row.get('Statut_Recherche') == PENDING_STATUS:
+            return PENDING_STATUS
         
         # Vérification cohérence avec taille originale
         coherence = self._check_size_coherence(row)
@@ -219,6 +282,8 @@ class SalesforceExporter:
                 return f"📊 Données estimées selon {taille_original} - Vérifier"
         elif statut == 'NOT_FOUND':
             return f"❌ Entreprise non trouvée dans base Sirene"
+        elif statut == PENDING_STATUS:
+            return f"⏸️ Recherche non effectuée (budget d'exécution épuisé) - à reprendre"
         else:
             return f"📋 À réviser - {effectifs_desc}"
     
@@ -242,21 +307,20 @@ class SalesforceExporter:
         for taille, count in missing_by_taille.items():
             logger.info(f"   {taille}: {count} entreprises")
         
-        corrections = 0
         df_copy = df.copy()
         
-        for idx, row in df_copy[missing_mask].iterrows():
-            taille = row['Taille_Original']
-            # Utiliser les moyennes configurées pour Effectifs_Salesforce SEULEMENT
-            effectifs_num, confiance = self._get_mean_effectifs_by_taille(taille)
-            
-            if effectifs_num is not None:
-                # Mettre à jour SEULEMENT Effectifs_Salesforce et confiance
-                # NE PAS toucher Effectifs_Description (garde None = tranche officielle manquante)
-                df_copy.at[idx, 'Effectifs_Salesforce'] = effectifs_num
-                df_copy.at[idx, 'Confiance_Donnee'] = confiance
-                
-                corrections += 1
+        # Moyennes configurées pour Effectifs_Salesforce SEULEMENT, une fois par taille
+        # NE PAS toucher Effectifs_Description (garde None = tranche officielle manquante)
+        tailles = df_copy['Taille_Original']
+        moyennes = {taille: self._get_mean_effectifs_by_taille(taille) for taille in tailles[missing_mask].unique()}
+        effectifs_num = tailles.map({taille: m[0] for taille, m in moyennes.items()})
+        confiance = tailles.map({taille: m[1] for taille, m in moyennes.items()})
+        
+        fix_mask = (missing_mask & effectifs_num.notna()).to_numpy()
+        corrections = int(fix_mask.sum())
+        if corrections:
+            df_copy.loc[fix_mask, 'Effectifs_Salesforce'] = effectifs_num.to_numpy(dtype=float)[fix_mask]
+            df_copy.loc[fix_mask, 'Confiance_Donnee'] = confiance.to_numpy()[fix_mask]
         
         logger.info(f"✅ CORRECTIONS APPLIQUÉES: {corrections}")
         still_missing = df_copy['Effectifs_Salesforce'].isna().sum()
@@ -284,11 +348,11 @@ class SalesforceExporter:
         total_entreprises = len(df)
         avec_valeurs_numeriques = df['Effectifs_Salesforce'].notna().sum()
         
-        # Distribution des statuts de révision
-        statuts_revision = df['Statut_Revision'].value_counts().to_dict()
+        # Distribution des statuts de révision (catégories absentes ignorées)
+        statuts_revision = df['Statut_Revision'].value_counts().loc[lambda c: c > 0].to_dict()
         
         # Niveaux de confiance
-        niveaux_confiance = df['Confiance_Donnee'].value_counts().to_dict()
+        niveaux_confiance = df['Confiance_Donnee'].value_counts().loc[lambda c: c > 0].to_dict()
         
         # Statistiques sur les effectifs
         effectifs_numeriques = df['Effectifs_Salesforce'].dropna()
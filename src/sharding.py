@@ -0,0 +1,76 @@
+"""
+Répartition des noms d'entreprises entre workers par hachage cohérent
+
+Chaque nom normalisé appartient à un seul shard : les doublons et variantes
+d'orthographe d'un même nom sont traités par le même worker, qui possède sa
+propre partition de cache. Ajouter un shard ne déplace qu'environ 1/N des
+noms : les partitions de cache existantes restent valables pour les autres.
+Les sorties partielles portent la position de chaque ligne dans l'entrée
+pour être fusionnées dans l'ordre d'origine.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# Position de la ligne dans le fichier d'entrée, dans les sorties partielles
+SHARD_ROW_COLUMN = 'Ligne_Source'
+
+class HashRing:
+    """Anneau de hachage cohérent (points virtuels par shard, hachage stable entre machines)"""
+    
+    def __init__(self, shards: int, replicas: int = 100):
+        """
+        Initialise l'anneau
+        
+        Args:
+            shards: Nombre de shards
+            replicas: Points virtuels par shard (répartition plus homogène)
+        """
+        labels = np.array([f"shard-{shard}#{replica}" for shard in range(shards)
+                           for replica in range(replicas)], dtype=object)
+        points = pd.util.hash_array(labels)
+        order = np.argsort(points)
+        self.shards = shards
+        self.points = points[order]
+        self.owners = np.repeat(np.arange(shards), replicas)[order]
+    
+    def assign(self, keys: pd.Series) -> np.ndarray:
+        """Shard de chaque clé (premier point de l'anneau au-delà de son hachage)"""
+        hashes = pd.util.hash_array(keys.to_numpy(dtype=object))
+        slots = np.searchsorted(self.points, hashes) % len(self.points)
+        return self.owners[slots]
+
+def shard_path(path: str, index: int) -> str:
+    """Partition d'un fichier (cache, archive) propre à un shard"""
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.shard{index}{path.suffix}"))
+
+def shard_output_path(output_file: str, index: int, shards: int) -> str:
+    """Sortie partielle d'un shard (le nombre de shards évite de mélanger deux découpages)"""
+    path = Path(output_file)
+    return str(path.with_name(f"{path.stem}.shard{index}of{shards}{path.suffix}"))
+
+def merge_shard_outputs(output_file: str, shards: int) -> pd.DataFrame:
+    """
+    Fusionne les sorties partielles dans l'ordre des lignes d'entrée
+    
+    Les sorties sont relues en texte brut pour être réécrites à l'identique.
+    
+    Raises:
+        FileNotFoundError: si une sortie partielle manque
+    """
+    parts = [shard_output_path(output_file, index, shards) for index in range(shards)]
+    missing = [part for part in parts if not Path(part).exists()]
+    if missing:
+        raise FileNotFoundError(f"Sorties partielles manquantes: {missing}")
+    
+    frames: List[pd.DataFrame] = [pd.read_csv(part, dtype=str, keep_default_na=False) for part in parts]
+    merged = pd.concat([frame for frame in frames if len(frame)] or frames[:1], ignore_index=True)
+    order = np.argsort(merged[SHARD_ROW_COLUMN].astype(np.int64).to_numpy(), kind='stable')
+    logger.info(f"🧩 {shards} sorties partielles fusionnées: {len(merged)} lignes")
+    return merged.iloc[order].drop(columns=SHARD_ROW_COLUMN).reset_index(drop=True)
@@ -0,0 +1,136 @@
+"""
+Tranches d'effectifs INSEE : type catégoriel ordonné et accesseurs vectorisés
+
+Table de référence unique pour les codes tranche (trancheEffectifsUniteLegale /
+trancheEffectifsEtablissement). Les étapes du traitement transportent le code
+sous forme de catégorie ordonnée (codes int8) ; descriptions, valeurs moyennes,
+bornes et niveaux de confiance en sont dérivés à la demande.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional
+
+# (code, description, borne_min, borne_max, valeur_moyenne, confiance)
+TRANCHES = [
+    ('NN', 'Non renseigné', None, None, None, 'low'),
+    ('00', '0 salarié', 0, 0, 0, 'high'),
+    ('01', '1 ou 2 salariés', 1, 2, 1.5, 'high'),
+    ('02', '3 à 5 salariés', 3, 5, 4, 'high'),
+    ('03', '6 à 9 salariés', 6, 9, 7.5, 'high'),
+    ('11', '10 à 19 salariés', 10, 19, 15, 'high'),
+    ('12', '20 à 49 salariés', 20, 49, 35, 'high'),
+    ('21', '50 à 99 salariés', 50, 99, 75, 'high'),
+    ('22', '100 à 199 salariés', 100, 199, 150, 'high'),
+    ('31', '200 à 249 salariés', 200, 249, 225, 'high'),
+    ('32', '250 à 499 salariés', 250, 499, 375, 'medium'),      # Large fourchette
+    ('41', '500 à 999 salariés', 500, 999, 750, 'medium'),
+    ('42', '1000 à 1999 salariés', 1000, 1999, 1500, 'medium'),
+    ('51', '2000 à 4999 salariés', 2000, 4999, 3500, 'medium'),
+    ('52', '5000 à 9999 salariés', 5000, 9999, 7500, 'low'),    # Très large
+    ('53', '10000 salariés et plus', 10000, None, 15000, 'low')  # Estimation
+]
+
+TRANCHE_CODES = [t[0] for t in TRANCHES]
+_CANONICAL_CODES = {code: code for code in TRANCHE_CODES}
+
+# 'NN' (non renseigné par l'INSEE) est rangé avant les tranches chiffrées
+TRANCHE_DTYPE = pd.CategoricalDtype(TRANCHE_CODES, ordered=True)
+
+# Libellés historiques rencontrés dans les anciens fichiers de sortie
+DESCRIPTION_ALIASES = {
+    '0 à 2 salariés': '01'
+}
+
+_CODE_BY_DESCRIPTION = {t[1]: t[0] for t in TRANCHES}
+_CODE_BY_DESCRIPTION.update(DESCRIPTION_ALIASES)
+
+_DESCRIPTIONS = np.array([t[1] for t in TRANCHES], dtype=object)
+_LOWER_BOUNDS = np.array([np.nan if t[2] is None else t[2] for t in TRANCHES], dtype=float)
+_UPPER_BOUNDS = np.array([np.nan if t[3] is None else t[3] for t in TRANCHES], dtype=float)
+_MIDPOINTS = np.array([np.nan if t[4] is None else t[4] for t in TRANCHES], dtype=float)
+_CONFIDENCES = np.array([t[5] for t in TRANCHES], dtype=object)
+
+def normalize_tranche_code(value: Any) -> Optional[str]:
+    """
+    Normalise un code tranche brut ('01', '1', 1, 1.0, 'NN'...) en code INSEE à 2 caractères
+    
+    Returns:
+        Code INSEE connu, ou None si la valeur est vide ou inconnue
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    
+    text = str(value).strip()
+    if not text:
+        return None
+    
+    # Les codes numériques relus depuis un CSV arrivent souvent en float ('1.0')
+    try:
+        text = f"{int(float(text)):02d}"
+    except ValueError:
+        text = text.upper()
+    
+    # Renvoie l'instance canonique : une seule chaîne par code en mémoire
+    return _CANONICAL_CODES.get(text)
+
+def to_tranche(values: pd.Series) -> pd.Series:
+    """Convertit une série de codes bruts en série catégorielle TRANCHE_DTYPE"""
+    codes, uniques = pd.factorize(values)
+    normalized = np.array([normalize_tranche_code(v) for v in uniques], dtype=object)
+    mapped = np.append(normalized, None)[codes]
+    return pd.Series(pd.Categorical(mapped, dtype=TRANCHE_DTYPE), index=values.index)
+
+def tranche_from_descriptions(descriptions: pd.Series) -> pd.Series:
+    """Convertit une série de descriptions ('20 à 49 salariés'...) en série TRANCHE_DTYPE"""
+    codes, uniques = pd.factorize(descriptions)
+    mapped = np.array([_CODE_BY_DESCRIPTION.get(str(v).strip()) for v in uniques] + [None], dtype=object)
+    return pd.Series(pd.Categorical(mapped[codes], dtype=TRANCHE_DTYPE), index=descriptions.index)
+
+def _take(table: np.ndarray, tranches: pd.Series, missing: Any) -> np.ndarray:
+    """Indexe une table de référence par les codes int8 de la catégorie"""
+    codes = tranches.cat.codes.to_numpy()
+    return np.where(codes >= 0, table[codes], missing)
+
+def tranche_description(tranches: pd.Series) -> pd.Series:
+    """Descriptions des tranches, en catégorielle (une chaîne par tranche, pas par ligne)"""
+    descriptions = pd.Categorical.from_codes(
+        tranches.cat.codes.to_numpy(),
+        categories=pd.Index(_DESCRIPTIONS)
+    )
+    return pd.Series(descriptions, index=tranches.index)
+
+def tranche_midpoint(tranches: pd.Series) -> pd.Series:
+    """Valeur moyenne de chaque tranche (NaN si non renseigné)"""
+    return pd.Series(_take(_MIDPOINTS, tranches, np.nan), index=tranches.index, dtype=float)
+
+def tranche_bounds(tranches: pd.Series) -> pd.DataFrame:
+    """Bornes min/max de chaque tranche (borne max NaN pour '10000 salariés et plus')"""
+    return pd.DataFrame({
+        'min': _take(_LOWER_BOUNDS, tranches, np.nan),
+        'max': _take(_UPPER_BOUNDS, tranches, np.nan)
+    }, index=tranches.index)
+
+def tranche_confidence(tranches: pd.Series, missing: str = 'low') -> pd.Series:
+    """Niveau de confiance associé à la largeur de chaque tranche"""
+    return pd.Series(_take(_CONFIDENCES, tranches, missing), index=tranches.index, dtype=object)
+
+def describe_tranche(code: Any) -> Dict[str, Any]:
+    """Version scalaire : description et valeur moyenne d'un code tranche"""
+    normalized = normalize_tranche_code(code)
+    if normalized is None:
+        return {'code': None, 'description': None, 'midpoint': None, 'confidence': 'low'}
+    
+    _, description, _, _, midpoint, confidence = TRANCHES[TRANCHE_CODES.index(normalized)]
+    return {
+        'code': normalized,
+        'description': description,
+        'midpoint': midpoint,
+        'confidence': confidence
+    }
+
+def code_from_description(description: Any) -> Optional[str]:
+    """Version scalaire : code tranche correspondant à une description"""
+    if description is None or pd.isna(description):
+        return None
+    return _CODE_BY_DESCRIPTION.get(str(description).strip())
@@ -0,0 +1,212 @@
+"""
+Pré-remplissage du cache persistant à partir de résultats d'enrichissement existants
+
+Les fichiers produits par le pipeline src/ (*_enriched.csv) comme par le
+pipeline historique (*_salesforce_ready*.csv, insee_optimized_*_results.csv) sont
+relus et chargés dans le cache (alias -> SIREN et établissement -> entité),
+clé = nom d'origine normalisé. Les entrées prennent la date du fichier : le
+rafraîchissement incrémental les traitera comme anciennes.
+"""
+
+import time
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from .bloom import BloomFilter
+from .cache import negative_filter_path, open_company_caches
+from .insee_client import NEGATIVE_TTL_HOURS
+from .normalize import normalize_company_names
+from .records import CompanyRecord
+from .tranches import normalize_tranche_code, tranche_from_descriptions
+
+logger = logging.getLogger(__name__)
+
+# Colonnes candidates pour chaque champ, selon le pipeline ayant produit le fichier
+FIELD_COLUMNS = {
+    'siren': ['SIREN', 'siren'],
+    'siret': ['SIRET', 'siret'],
+    'denomination': ['Denomination_INSEE', 'denomination'],
+    'categorie_entreprise': ['Categorie_Entreprise_INSEE', 'categorie_entreprise'],
+    'date_creation': ['Date_Creation'],
+    'activite_principale': ['Activite_Principale', 'activite_principale'],
+    'etat_administratif': ['Etat_Administratif'],
+    'etablissement_siege': ['Etablissement_Siege'],
+    'nombre_periodes': ['Nombre_Etablissements', 'Nb_Etablissements'],
+    'tranche_unite_legale': ['tranche_effectifs_unite_legale'],
+    'annee_effectifs_unite_legale': ['annee_effectifs_unite_legale', 'Annee_Effectifs'],
+    'tranche_etablissement': ['tranche_effectifs_etablissement'],
+    'annee_effectifs_etablissement': ['annee_effectifs_etablissement']
+}
+
+# Statuts de recherche « non trouvé » (src/ et historique). Les fichiers ne distinguent
+# pas un vrai 404 d'un rate limit ou d'une erreur HTTP : ces noms sont importés avec la
+# cause 'unknown' (TTL court), jamais comme introuvables de longue durée
+NOT_FOUND_STATUSES = {'Non trouvé', 'NOT_FOUND'}
+IMPORTED_NEGATIVE_REASON = 'unknown'
+
+# Fichiers de résultats reconnus dans un répertoire
+OUTPUT_PATTERNS = ['*_enriched.csv', '*salesforce_ready*.csv', 'insee_optimized_*_results.csv']
+
+def find_output_files(paths: Iterable[str]) -> List[Path]:
+    """Fichiers de résultats à importer (répertoires parcourus récursivement), du plus ancien au plus récent"""
+    files = set()
+    for path in map(Path, paths):
+        if path.is_dir():
+            for pattern in OUTPUT_PATTERNS:
+                files.update(path.rglob(pattern))
+        elif path.exists():
+            files.add(path)
+    return sorted(files, key=lambda f: f.stat().st_mtime)
+
+def _column(df: pd.DataFrame, field: str) -> Optional[pd.Series]:
+    for column in FIELD_COLUMNS[field]:
+        if column in df.columns:
+            return df[column]
+    return None
+
+def _clean_identifier(values: pd.Series, width: int) -> pd.Series:
+    """SIREN/SIRET relus en float ('420495178.0') ou sans zéros de tête"""
+    text = values.str.strip().str.replace(r'\.0$', '', regex=True)
+    return text.mask(text.str.fullmatch(r'\d+', na=False), text.str.zfill(width))
+
+def _scalar(value: Any) -> Any:
+    return None if pd.isna(value) else value
+
+def records_from_output(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Extrait d'un fichier de résultats les alias et entités à mettre en cache
+    
+    Returns:
+        {'keys': clés normalisées, 'sirens': SIREN par ligne (NaN si aucun),
+         'not_found': masque des lignes non trouvées,
+         'aliases': {clé: référence SIREN et établissement (dernière ligne du nom)},
+         'records': {SIREN: CompanyRecord de l'unité légale}}
+    """
+    keys = normalize_company_names(df['Organisation_Original'])
+    
+    sirens = _column(df, 'siren')
+    if sirens is None:
+        sirens = pd.Series(np.nan, index=df.index, dtype=object)
+    sirens = _clean_identifier(sirens, 9).replace('', np.nan)
+    
+    statuts = df['Statut_Recherche'] if 'Statut_Recherche' in df.columns else pd.Series('', index=df.index)
+    not_found = sirens.isna() & statuts.isin(NOT_FOUND_STATUSES)
+    
+    # Tranche : code brut si présent, sinon retrouvée depuis la description
+    tranches = _column(df, 'tranche_unite_legale')
+    if tranches is None and 'Effectifs_Description' in df.columns:
+        tranches = tranche_from_descriptions(df['Effectifs_Description']).astype(object)
+    
+    fields = {field: _column(df, field) for field in FIELD_COLUMNS}
+    fields['tranche_unite_legale'] = tranches
+    if fields['siret'] is not None:
+        fields['siret'] = _clean_identifier(fields['siret'], 14)
+    if fields['nombre_periodes'] is not None:
+        fields['nombre_periodes'] = pd.to_numeric(fields['nombre_periodes'], errors='coerce')
+    
+    records = {}
+    aliases = {}
+    found = np.flatnonzero(sirens.notna().to_numpy())
+    for position in found[~keys.iloc[found].duplicated(keep='last').to_numpy()]:
+        values = {
+            field: _scalar(column.iat[position])
+            for field, column in fields.items() if column is not None
+        }
+        values['siren'] = sirens.iat[position]
+        values['tranche_unite_legale'] = normalize_tranche_code(values.get('tranche_unite_legale'))
+        values['tranche_etablissement'] = normalize_tranche_code(values.get('tranche_etablissement'))
+        if values.get('etablissement_siege') is not None:
+            values['etablissement_siege'] = str(values['etablissement_siege']).strip().lower() == 'true'
+        if values.get('nombre_periodes') is not None:
+            values['nombre_periodes'] = int(float(values['nombre_periodes']))
+        record = CompanyRecord(**values)
+        aliases[keys.iat[position]] = record.reference()
+        records.setdefault(record.siren, record.entity())
+    
+    return {'keys': keys, 'sirens': sirens, 'not_found': not_found, 'aliases': aliases, 'records': records}
+
+def warm_cache(paths: Iterable[str], cache_path: str, cache_size: int = 10000) -> Dict[str, int]:
+    """
+    Charge les résultats existants dans le cache persistant
+    
+    Les fichiers sont importés du plus ancien au plus récent : pour un même
+    nom, le résultat le plus récent l'emporte, y compris face aux entrées déjà
+    en cache plus récentes que le fichier. Les noms non trouvés sont importés
+    avec une cause inconnue (TTL court). Le filtre de Bloom est reconstruit à
+    partir des introuvables encore valides (TTL not_found) du cache après
+    import : un nom résolu par un fichier plus récent en sort. Il prend la date
+    du plus ancien de ces introuvables et expire avec lui.
+    
+    Args:
+        paths: Fichiers ou répertoires de résultats
+        cache_path: Fichier SQLite du cache persistant
+        cache_size: Taille du cache mémoire pendant l'import
+    
+    Returns:
+        Statistiques de l'import
+    """
+    caches = open_company_caches(cache_path, max_size=cache_size)
+    bloom_path = negative_filter_path(cache_path)
+    ttl_days = NEGATIVE_TTL_HOURS['not_found'] / 24
+    existing = dict(caches['aliases'].stored_before(float('inf')))
+    existing_entities = dict(caches['entities'].stored_before(float('inf')))
+    stats = {'files': 0, 'rows': 0, 'aliases': 0, 'entities': 0, 'not_found': 0, 'skipped_files': 0}
+    
+    for file in find_output_files(paths):
+        df = pd.read_csv(file, dtype=str)
+        if 'Organisation_Original' not in df.columns:
+            logger.warning(f"⚠️ {file}: colonne Organisation_Original absente, ignoré")
+            stats['skipped_files'] += 1
+            continue
+        
+        stored_at = file.stat().st_mtime
+        extracted = records_from_output(df)
+        keys, sirens, not_found = extracted['keys'], extracted['sirens'], extracted['not_found']
+        
+        # Les entrées déjà en cache plus récentes que le fichier sont conservées
+        newer = keys.map(existing).astype(float) > stored_at
+        found = sirens.notna() & ~newer
+        not_found = not_found & ~newer
+        records = {
+            siren: record for siren, record in extracted['records'].items()
+            if existing_entities.get(siren, 0) <= stored_at
+        }
+        caches['entities'].set_many(records.items(), stored_at=stored_at)
+        kept = set(keys[found])
+        caches['aliases'].set_many(
+            ((key, reference) for key, reference in extracted['aliases'].items() if key in kept),
+            stored_at=stored_at
+        )
+        
+        # Un nom trouvé sur une autre ligne du fichier n'est pas introuvable
+        negative_keys = keys[not_found & ~keys.isin(keys[found])].unique()
+        caches['aliases'].set_many(
+            ((key, {'reason': IMPORTED_NEGATIVE_REASON, 'at': stored_at}) for key in negative_keys),
+            stored_at=stored_at
+        )
+        
+        stats['files'] += 1
+        stats['rows'] += len(df)
+        stats['aliases'] += int(keys[found].nunique())
+        stats['entities'] += len(records)
+        stats['not_found'] += len(negative_keys)
+        logger.info(f"📥 {file}: {len(records)} entités, {int(found.sum())} lignes trouvées, "
+                    f"{len(negative_keys)} introuvables")
+    
+    # Un filtre existant ne peut pas retirer de noms : il est remplacé. Daté du plus ancien
+    # introuvable retenu, il n'en garde aucun au-delà de son TTL
+    cutoff = time.time() - ttl_days * 86400
+    negative_filter = BloomFilter(ttl_days=ttl_days)
+    oldest = negative_filter.created_at
+    for key, value in caches['aliases'].items():
+        if isinstance(value, dict) and value['reason'] == 'not_found' and value['at'] > cutoff:
+            negative_filter.add(key)
+            oldest = min(oldest, value['at'])
+    negative_filter.created_at = oldest
+    negative_filter.save(bloom_path)
+    for cache in caches.values():
+        cache.close()
+    
+    return stats
@@ -0,0 +1,194 @@
+"""
+File de travail durable (SQLite) pour l'enrichissement
+
+Les producteurs déposent des noms uniques (clé = nom normalisé) ; des workers,
+sur une ou plusieurs machines partageant le fichier, les réservent avec un
+bail puis écrivent leurs résultats dans la transaction qui libère le bail.
+Un worker arrêté en cours de route laisse expirer ses baux : les noms sont
+repris par un autre worker. Un résultat n'est accepté que du détenteur du
+bail, chaque nom n'a donc qu'un seul résultat. Un nom en échec temporaire
+(rate limit, erreur HTTP) n'a pas de résultat : il est rendu à la file et
+ne peut être réservé à nouveau qu'après une date de nouvel essai.
+
+Un fichier de file correspond à un traitement : relancer le même traitement
+reprend là où il s'était arrêté ; supprimer le fichier repart de zéro.
+"""
+
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+# Durée par défaut d'un bail (s) : largement au-delà d'un lot de requêtes au débit INSEE
+DEFAULT_LEASE_SECONDS = 300.0
+
+def default_worker_id() -> str:
+    """Identifiant de worker unique (machine, processus, aléa)"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class WorkQueue:
+    """File de noms à enrichir avec baux et résultats transactionnels"""
+    
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = 5):
+        """
+        Ouvre (ou crée) la file
+        
+        Args:
+            path: Fichier SQLite de la file
+            lease_seconds: Durée d'un bail avant reprise par un autre worker
+            max_attempts: Nombre de tentatives (baux expirés, échecs temporaires) au-delà
+                duquel un nom est abandonné
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'key TEXT PRIMARY KEY, name TEXT NOT NULL, status TEXT NOT NULL, '
+            'worker TEXT, lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, result TEXT)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until)')
+    
+    @contextmanager
+    def _transaction(self):
+        """Transaction avec verrou d'écriture immédiat (sérialise les workers)"""
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+            self._db.execute('COMMIT')
+        except Exception:
+            self._db.execute('ROLLBACK')
+            raise
+    
+    def enqueue(self, jobs: Iterable[Tuple[str, str]]) -> int:
+        """
+        Dépose des noms à enrichir (clé normalisée, nom d'origine)
+        
+        Les clés déjà présentes, quel que soit leur état, sont ignorées.
+        
+        Returns:
+            Nombre de noms ajoutés
+        """
+        with self._transaction():
+            before = self._db.total_changes
+            self._db.executemany(
+                'INSERT OR IGNORE INTO jobs (key, name, status) VALUES (?, ?, ?)',
+                ((key, name, PENDING) for key, name in jobs)
+            )
+            return self._db.total_changes - before
+    
+    def claim(self, worker: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """
+        Réserve jusqu'à `limit` noms : en attente, ou dont le bail a expiré
+        
+        Les noms sont réservés dans l'ordre de dépôt (ordre de priorité du producteur) ;
+        un nom rendu après un échec temporaire attend sa date de nouvel essai.
+        
+        Returns:
+            [(clé, nom)] réservés pour `worker`
+        """
+        now = time.time()
+        with self._transaction():
+            # Baux expirés trop souvent : nom abandonné plutôt que repris indéfiniment
+            abandoned = self._db.execute(
+                'UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND lease_until < ? AND attempts >= ?',
+                (FAILED, LEASED, now, self.max_attempts)
+            ).rowcount
+            if abandoned:
+                logger.warning(f"⚠️ {abandoned} noms abandonnés après {self.max_attempts} baux expirés")
+            
+            jobs = self._db.execute(
+                'SELECT key, name FROM jobs WHERE (status = ? AND (lease_until IS NULL OR lease_until < ?)) '
+                'OR (status = ? AND lease_until < ?) ORDER BY rowid LIMIT ?',
+                (PENDING, now, LEASED, now, limit)
+            ).fetchall()
+            self._db.executemany(
+                'UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1 WHERE key = ?',
+                ((LEASED, worker, now + self.lease_seconds, key) for key, _ in jobs)
+            )
+        return jobs
+    
+    def complete(self, worker: str, results: Iterable[Tuple[str, Optional[str]]]) -> int:
+        """
+        Enregistre les résultats d'un lot en une transaction
+        
+        Un résultat n'est accepté que si `worker` détient encore le bail du nom.
+        
+        Returns:
+            Nombre de résultats acceptés
+        """
+        with self._transaction():
+            before = self._db.total_changes
+            self._db.executemany(
+                'UPDATE jobs SET status = ?, result = ?, lease_until = NULL '
+                'WHERE key = ? AND worker = ? AND status = ?',
+                ((DONE, result, key, worker, LEASED) for key, result in results)
+            )
+            return self._db.total_changes - before
+    
+    def release(self, worker: str, keys: Iterable[str], retry_at: Optional[float] = None) -> int:
+        """
+        Rend à la file des noms réservés par `worker` et non traités
+        
+        Sans `retry_at` (budget épuisé), le bail rendu ne compte pas comme une
+        tentative. Avec `retry_at` (échec temporaire), la tentative compte et le
+        nom n'est pas réservé avant cette date ; au-delà de max_attempts
+        tentatives, il est abandonné.
+        
+        Returns:
+            Nombre de noms rendus
+        """
+        with self._transaction():
+            before = self._db.total_changes
+            if retry_at is None:
+                self._db.executemany(
+                    'UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, attempts = attempts - 1 '
+                    'WHERE key = ? AND worker = ? AND status = ?',
+                    ((PENDING, key, worker, LEASED) for key in keys)
+                )
+            else:
+                self._db.executemany(
+                    'UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, '
+                    'worker = NULL, lease_until = ? WHERE key = ? AND worker = ? AND status = ?',
+                    ((self.max_attempts, FAILED, PENDING, retry_at, key, worker, LEASED) for key in keys)
+                )
+            return self._db.total_changes - before
+    
+    def results(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Résultats des noms terminés parmi `keys` (None pour un nom abandonné)"""
+        keys = list(keys)
+        results = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT key, result FROM jobs WHERE status IN (?, ?) "
+                f"AND key IN ({','.join('?' * len(chunk))})",
+                (DONE, FAILED, *chunk)
+            )
+            results.update(rows)
+        return results
+    
+    def counts(self) -> Dict[str, int]:
+        """Nombre de noms par état"""
+        counts = dict.fromkeys((PENDING, LEASED, DONE, FAILED), 0)
+        counts.update(self._db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+        return counts
+    
+    def close(self):
+        """Ferme la connexion à la file"""
+        self._db.close()
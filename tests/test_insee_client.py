@@ -0,0 +1,170 @@
+"""Tests du client INSEE : résultats négatifs, filtre de Bloom (API simulée)"""
+
+import json
+import re
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from src.bloom import BloomFilter
+from src.budget import PENDING_STATUS, BudgetExhausted, RunBudget
+from src.cache import MISSING
+from src.data_processor import DataProcessor
+from src.insee_client import INSEEClient
+from src.normalize import normalize_company_name
+
+AIR_FRANCE = {
+    'siren': '420495178', 'siret': '42049517800014', 'etablissementSiege': True,
+    'trancheEffectifsEtablissement': '42',
+    'uniteLegale': {'denominationUniteLegale': 'SOCIETE AIR FRANCE', 'trancheEffectifsUniteLegale': '53'},
+}
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data
+        self.text = json.dumps(data or {})
+    
+    def json(self):
+        return self._data
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(response=self)
+
+class FakeSirene:
+    """API Sirene simulée : Air France seulement connue, appels enregistrés"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def get(self, url, params=None, headers=None, **kwargs):
+        self.calls.append(params['q'])
+        match = re.search(r'denominationUniteLegale:"(.*)"', params['q'])
+        if match and match.group(1) == 'AIR FRANCE':
+            return FakeResponse(200, {'header': {'total': 1}, 'etablissements': [AIR_FRANCE]})
+        return FakeResponse(404, {})
+
+@pytest.fixture
+def make_client(tmp_path):
+    clients = []
+    
+    def make(**kwargs):
+        api = FakeSirene()
+        kwargs.setdefault('cache_path', str(tmp_path / 'cache.sqlite'))
+        client = INSEEClient(api_key='test-key', delay_between_requests=0,
+                             rate_limit_path=str(tmp_path / 'rate.sqlite'), **kwargs)
+        client.session.get = api.get
+        clients.append(client)
+        return client, api
+    
+    yield make
+    for client in clients:
+        client.close()
+
+def test_not_found_is_cached_and_filtered(make_client):
+    client, api = make_client()
+    assert client.lookup_with_reason('Inconnue') == (None, 'not_found')
+    assert api.calls
+    client.close()
+    
+    client, api = make_client()
+    assert client.lookup_with_reason('Inconnue') == (None, 'not_found')
+    assert not api.calls
+    assert client.stats['bloom_hits'] == 1
+
+def test_bloom_hit_defers_to_resolved_alias(make_client):
+    client, _ = make_client()
+    siren = client.lookup('Air France').siren
+    client.close()
+    
+    # Nom connu du filtre (ancien négatif) mais résolu depuis dans le cache d'alias
+    bloom = BloomFilter.load(client.negative_filter_path)
+    bloom.add(normalize_company_name('Air France'))
+    bloom.save(client.negative_filter_path)
+    
+    client, api = make_client()
+    found = client.lookup('Air France')
+    assert found is not None and found.siren == siren
+    assert not api.calls
+    assert client.stats['bloom_hits'] == 0
+
+def test_bloom_false_positive_still_searches(make_client, tmp_path):
+    bloom = BloomFilter()
+    bloom.add(normalize_company_name('Air France'))
+    bloom.save(str(tmp_path / 'cache.bloom'))
+    
+    client, api = make_client()
+    assert client.lookup('Air France').siren == '420495178'
+    assert api.calls
+
+def test_expired_negative_is_retried_despite_bloom(make_client):
+    client, _ = make_client(negative_ttl_hours={'not_found': 1e-9})
+    client.lookup('Inconnue')
+    client.close()
+    
+    client, api = make_client(negative_ttl_hours={'not_found': 1e-9}, negative_retry_budget=1)
+    client.negative_filter.add(normalize_company_name('Inconnue'))
+    assert client.lookup_with_reason('Inconnue') == (None, 'not_found')
+    assert api.calls
+    assert client.stats['negative_retries'] == 1
+
+def test_budget_deadline_checked_after_rate_limit_wait(make_client):
+    budget = RunBudget(max_duration=0.05)
+    client, api = make_client(budget=budget)
+    acquire = client.key_pool.acquire
+    
+    def slow_acquire():
+        time.sleep(0.1)
+        return acquire()
+    
+    client.key_pool.acquire = slow_acquire
+    with pytest.raises(BudgetExhausted):
+        client.send(f"{client.base_url}/siret", {'q': 'denominationUniteLegale:"AIR FRANCE"'})
+    assert not api.calls
+    assert budget.calls == 0 and client.stats['api_calls'] == 0
+
+def test_exhausted_budget_does_not_wait_for_a_key(make_client):
+    budget = RunBudget(max_api_calls=0)
+    client, api = make_client(budget=budget)
+    client.key_pool.acquire = lambda: pytest.fail("attente de débit avec un budget épuisé")
+    with pytest.raises(BudgetExhausted):
+        client.lookup('Air France')
+    assert not api.calls
+
+def test_offline_archive_miss_stays_pending(make_client, tmp_path):
+    archive = str(tmp_path / 'archive.sqlite')
+    client, _ = make_client(archive_path=archive)
+    client.lookup('Air France')
+    client.lookup('Inconnue')
+    client.close()
+    
+    client = INSEEClient(archive_path=archive, offline=True)
+    try:
+        assert client.lookup('Air France').siren == '420495178'
+        assert client.lookup_with_reason('Inconnue') == (None, 'not_found')
+        assert client.lookup_with_reason('Jamais Cherchée') == (None, 'unknown')
+        assert client.stats['archive_misses'] > 0
+        # Rien n'est mis en cache : ni alias ni requête
+        assert client.cache.get(normalize_company_name('Jamais Cherchée')) is MISSING
+        assert all(cached is MISSING for _, cached in client.query_states('Jamais Cherchée'))
+        
+        df = pd.DataFrame({'Organisation': ['Air France', 'Inconnue', 'Jamais Cherchée']})
+        statuses = DataProcessor(client).process_companies(df, 'Organisation')['Statut_Recherche']
+        assert statuses.tolist() == ['Trouvé', 'Non trouvé', PENDING_STATUS]
+    finally:
+        client.close()
+
+def test_bloom_save_replaces_atomically(tmp_path):
+    path = tmp_path / 'cache.bloom'
+    bloom = BloomFilter(capacity=1000)
+    bloom.add('inconnue')
+    bloom.save(str(path))
+    bloom.add('autre')
+    bloom.save(str(path))
+    
+    assert [p.name for p in tmp_path.iterdir()] == ['cache.bloom']
+    loaded = BloomFilter.load(str(path), capacity=1000)
+    assert 'inconnue' in loaded and 'autre' in loaded and len(loaded) == 2
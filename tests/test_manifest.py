@@ -0,0 +1,52 @@
+"""Tests du manifeste d'empreintes : correspondance, masque de retraitement, assemblage"""
+
+import numpy as np
+import pandas as pd
+
+from src.manifest import load_previous, match_previous, merge_results, row_fingerprints, save_manifest
+
+COLUMNS = ['Nom', 'Taille']
+
+def _frame(names):
+    return pd.DataFrame({'Nom': names, 'Taille': ['PME'] * len(names)})
+
+def test_fingerprints_ignore_index():
+    df = _frame(['A', 'B'])
+    shifted = df.set_axis([10, 11])
+    assert (row_fingerprints(df, COLUMNS) == row_fingerprints(shifted, COLUMNS)).all()
+
+def test_match_previous_finds_unchanged_rows():
+    previous = row_fingerprints(_frame(['A', 'B', 'C']), COLUMNS)
+    current = row_fingerprints(_frame(['C', 'X', 'A']), COLUMNS)
+    assert match_previous(current, previous).tolist() == [2, -1, 0]
+
+def test_redo_mask_forces_reprocessing():
+    previous = row_fingerprints(_frame(['A', 'B', 'C']), COLUMNS)
+    current = row_fingerprints(_frame(['A', 'B', 'C']), COLUMNS)
+    redo = np.array([False, True, False])
+    assert match_previous(current, previous, redo=redo).tolist() == [0, -1, 2]
+
+def test_redo_mask_keeps_duplicate_that_is_done():
+    # Même ligne deux fois dans le résultat précédent : seule la copie terminée est reprise
+    previous = row_fingerprints(_frame(['A', 'A']), COLUMNS)
+    current = row_fingerprints(_frame(['A']), COLUMNS)
+    assert match_previous(current, previous, redo=np.array([True, False])).tolist() == [1]
+
+def test_merge_results_keeps_input_order():
+    previous = pd.DataFrame({'Nom': ['A', 'B'], 'SIREN': ['1', '2']})
+    new_rows = pd.DataFrame({'Nom': ['X'], 'SIREN': ['9']})
+    merged = merge_results(np.array([1, -1, 0]), previous, new_rows)
+    assert merged['Nom'].tolist() == ['B', 'X', 'A']
+    assert merged['SIREN'].tolist() == ['2', '9', '1']
+
+def test_load_previous_round_trip(tmp_path):
+    output = str(tmp_path / 'out.csv')
+    df = _frame(['A', 'B'])
+    df.assign(SIREN=['001', '']).to_csv(output, index=False)
+    save_manifest(output, row_fingerprints(df, COLUMNS), COLUMNS)
+    
+    fingerprints, previous = load_previous(output, COLUMNS)
+    assert (fingerprints == row_fingerprints(df, COLUMNS)).all()
+    # Relu en texte brut : zéros de tête et cellules vides préservés
+    assert previous['SIREN'].tolist() == ['001', '']
+    assert load_previous(output, ['Nom']) is None
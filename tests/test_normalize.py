@@ -0,0 +1,43 @@
+"""Tests de la normalisation des noms : versions scalaire et vectorisée identiques"""
+
+import pandas as pd
+import pytest
+
+from src.normalize import normalize_company_name, normalize_company_names
+
+CASES = [
+    ('Air France', 'air france'),
+    ('AIR FRANCE SA', 'air france'),
+    ('Air-France', 'air france'),
+    ('  Société  Générale ', 'societe generale'),
+    ('Dupont S.A.S.', 'dupont'),
+    ('Dupont SARL', 'dupont'),
+    ('S.A.S. Dupont', 'dupont'),
+    ('S.A.R.L. Dupont Frères', 'dupont freres'),
+    ('SE LOGER', 'se loger'),
+    ('SCI DU PARC', 'sci du parc'),
+    ('SAS', 'sas'),
+    ('S.A.', 's a'),
+    # Sigles pointés : aucune lettre retirée, pas de collision entre entreprises
+    ('S.N.C.F.', 's n c f'),
+    ('S.E.B.', 's e b'),
+    ('S.C.O.P.A.', 's c o p a'),
+    ('S.A.F.R.A.N.', 's a f r a n'),
+    ('S.N.C.F. RESEAU', 's n c f reseau'),
+    ('E.D.F. S.A.', 'e d f s a'),
+    ('B.N.P. Paribas S.A.', 'b n p paribas'),
+]
+
+@pytest.mark.parametrize('name, expected', CASES)
+def test_normalize_company_name(name, expected):
+    assert normalize_company_name(name) == expected
+
+def test_vectorized_matches_scalar():
+    names = pd.Series([name for name, _ in CASES], index=range(10, 10 + len(CASES)))
+    keys = normalize_company_names(names)
+    assert keys.tolist() == [expected for _, expected in CASES]
+    assert keys.index.equals(names.index)
+
+def test_initialisms_do_not_collide():
+    names = ['S.N.C.F.', 'S.E.B.', 'S.C.O.P.A.', 'S.A.F.R.A.N.', 'S.N.C.F. RESEAU', 'F', 'B', 'A']
+    assert normalize_company_names(pd.Series(names)).nunique() == len(names)
@@ -0,0 +1,43 @@
+"""Tests du sharding : affectation stable et fusion des sorties partielles"""
+
+import pandas as pd
+import pytest
+
+from src.sharding import SHARD_ROW_COLUMN, HashRing, merge_shard_outputs, shard_output_path, shard_path
+
+def test_assignment_is_deterministic_and_in_range():
+    keys = pd.Series([f"entreprise {i}" for i in range(1000)])
+    shards = HashRing(4).assign(keys)
+    assert set(shards) == {0, 1, 2, 3}
+    assert (HashRing(4).assign(keys) == shards).all()
+
+def test_adding_a_shard_moves_few_keys():
+    keys = pd.Series([f"entreprise {i}" for i in range(5000)])
+    moved = (HashRing(4).assign(keys) != HashRing(5).assign(keys)).mean()
+    assert moved < 0.35
+
+def test_shard_paths():
+    assert shard_path('data/cache.db', 2) == 'data/cache.shard2.db'
+    assert shard_output_path('out/result.csv', 1, 3) == 'out/result.shard1of3.csv'
+
+def test_merge_restores_source_order(tmp_path):
+    output = str(tmp_path / 'result.csv')
+    parts = [
+        pd.DataFrame({SHARD_ROW_COLUMN: [1, 3, 10], 'Nom': ['B', 'D', 'K'], 'SIREN': ['002', '', '011']}),
+        pd.DataFrame({SHARD_ROW_COLUMN: [0, 2], 'Nom': ['A', 'C'], 'SIREN': ['001', '003']}),
+        pd.DataFrame({SHARD_ROW_COLUMN: pd.Series([], dtype=int), 'Nom': [], 'SIREN': []}),
+    ]
+    for index, part in enumerate(parts):
+        part.to_csv(shard_output_path(output, index, len(parts)), index=False)
+    
+    merged = merge_shard_outputs(output, len(parts))
+    # Tri numérique (10 après 3), colonne de position retirée, texte brut préservé
+    assert merged['Nom'].tolist() == ['A', 'B', 'C', 'D', 'K']
+    assert merged['SIREN'].tolist() == ['001', '002', '003', '', '011']
+    assert SHARD_ROW_COLUMN not in merged.columns
+
+def test_merge_missing_part_raises(tmp_path):
+    output = str(tmp_path / 'result.csv')
+    pd.DataFrame({SHARD_ROW_COLUMN: [0], 'Nom': ['A']}).to_csv(shard_output_path(output, 0, 2), index=False)
+    with pytest.raises(FileNotFoundError):
+        merge_shard_outputs(output, 2)
@@ -0,0 +1,47 @@
+"""Tests des codes tranche : normalisation et aller-retour code ↔ description"""
+
+import pandas as pd
+import pytest
+
+from src.cache import decode_record, encode_record
+from src.records import CompanyRecord
+from src.tranches import (TRANCHE_CODES, TRANCHE_DTYPE, describe_tranche, normalize_tranche_code,
+                          to_tranche, tranche_description, tranche_from_descriptions, tranche_midpoint)
+
+@pytest.mark.parametrize('raw, expected', [
+    ('01', '01'), ('1', '01'), (1, '01'), (1.0, '01'), ('1.0', '01'),
+    ('nn', 'NN'), (' 53 ', '53'), ('', None), (None, None), (float('nan'), None), ('99', None),
+])
+def test_normalize_tranche_code(raw, expected):
+    assert normalize_tranche_code(raw) == expected
+
+def test_description_round_trip():
+    codes = pd.Series(TRANCHE_CODES + [None])
+    tranches = to_tranche(codes)
+    assert tranches.dtype == TRANCHE_DTYPE
+    
+    descriptions = tranche_description(tranches).astype(object)
+    back = tranche_from_descriptions(descriptions)
+    assert back.astype(object).tolist() == tranches.astype(object).tolist()
+
+def test_historical_description_alias():
+    tranches = tranche_from_descriptions(pd.Series(['0 à 2 salariés']))
+    assert tranches.iloc[0] == '01'
+
+def test_midpoint_missing_is_nan():
+    midpoints = tranche_midpoint(to_tranche(pd.Series(['12', 'NN', None])))
+    assert midpoints.iloc[0] == 35
+    assert midpoints.iloc[1:].isna().all()
+
+def test_describe_tranche_unknown_code():
+    assert describe_tranche('99') == {'code': None, 'description': None, 'midpoint': None, 'confidence': 'low'}
+    assert describe_tranche(11)['description'] == '10 à 19 salariés'
+
+def test_record_encode_decode_round_trip():
+    record = CompanyRecord(siren='552032534', siret='55203253400646', denomination='DANONE',
+                           etablissement_siege=True, nombre_periodes=12,
+                           tranche_unite_legale='42', tranche_etablissement='NN')
+    decoded = decode_record(encode_record(record))
+    for name in CompanyRecord.__slots__:
+        assert getattr(decoded, name) == getattr(record, name)
+    assert decode_record(encode_record(None)) is None
@@ -0,0 +1,69 @@
+"""Tests du pré-remplissage du cache et de la reconstruction du filtre de Bloom"""
+
+import os
+import time
+
+import pandas as pd
+
+from src.bloom import BloomFilter
+from src.cache import negative_filter_path, open_company_caches
+from src.warm_start import IMPORTED_NEGATIVE_REASON, warm_cache
+
+def _write_output(path, names, statuses, sirens):
+    pd.DataFrame({
+        'Organisation_Original': names,
+        'Statut_Recherche': statuses,
+        'SIREN': sirens,
+        'Denomination_INSEE': [s and f"ENTREPRISE {s}" for s in sirens],
+    }).to_csv(path, index=False)
+
+def test_imported_not_found_has_short_ttl_reason(tmp_path):
+    _write_output(tmp_path / 'a_enriched.csv', ['Acme', 'Zed'], ['Trouvé', 'Non trouvé'], ['111000011', None])
+    cache_path = str(tmp_path / 'cache.sqlite')
+    stats = warm_cache([str(tmp_path)], cache_path)
+    assert stats['aliases'] == 1 and stats['not_found'] == 1
+    
+    caches = open_company_caches(cache_path, read_only=True)
+    try:
+        assert caches['aliases'].get('zed')['reason'] == IMPORTED_NEGATIVE_REASON
+        assert caches['aliases'].get('acme')[0] == '111000011'
+    finally:
+        for cache in caches.values():
+            cache.close()
+    
+    # Cause incertaine : jamais dans le filtre des introuvables
+    assert 'zed' not in BloomFilter.load(negative_filter_path(cache_path))
+
+def test_rebuilt_filter_is_dated_from_oldest_negative(tmp_path):
+    cache_path = str(tmp_path / 'cache.sqlite')
+    oldest = time.time() - 10 * 86400
+    caches = open_company_caches(cache_path)
+    caches['aliases'].set('ancien', {'reason': 'not_found', 'at': oldest})
+    caches['aliases'].set('recent', {'reason': 'not_found', 'at': time.time() - 3600})
+    for cache in caches.values():
+        cache.close()
+    
+    output = tmp_path / 'out' / 'b_enriched.csv'
+    output.parent.mkdir()
+    _write_output(output, ['Acme'], ['Trouvé'], ['111000011'])
+    warm_cache([str(output.parent)], cache_path)
+    
+    bloom = BloomFilter.load(negative_filter_path(cache_path))
+    assert 'ancien' in bloom and 'recent' in bloom
+    assert bloom.created_at == oldest
+
+def test_newer_file_resolves_previous_negative(tmp_path):
+    old = tmp_path / 'old_enriched.csv'
+    new = tmp_path / 'new_enriched.csv'
+    _write_output(old, ['Zed'], ['Non trouvé'], [None])
+    _write_output(new, ['Zed'], ['Trouvé'], ['222000022'])
+    os.utime(old, (time.time() - 86400, time.time() - 86400))
+    
+    cache_path = str(tmp_path / 'cache.sqlite')
+    warm_cache([str(tmp_path)], cache_path)
+    caches = open_company_caches(cache_path, read_only=True)
+    try:
+        assert caches['aliases'].get('zed')[0] == '222000022'
+    finally:
+        for cache in caches.values():
+            cache.close()
@@ -0,0 +1,65 @@
+"""Tests de la file de travail : baux, libération et date de nouvel essai"""
+
+import time
+
+import pytest
+
+from src.work_queue import DONE, FAILED, LEASED, PENDING, WorkQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=60, max_attempts=2)
+    queue.enqueue([('danone', 'DANONE'), ('total', 'TOTAL'), ('airbus', 'AIRBUS')])
+    yield queue
+    queue.close()
+
+def test_enqueue_ignores_known_keys(queue):
+    assert queue.enqueue([('danone', 'Danone'), ('orange', 'ORANGE')]) == 1
+    assert queue.counts()[PENDING] == 4
+
+def test_claim_is_exclusive_and_ordered(queue):
+    assert queue.claim('w1', limit=2) == [('danone', 'DANONE'), ('total', 'TOTAL')]
+    assert queue.claim('w2', limit=5) == [('airbus', 'AIRBUS')]
+    assert queue.claim('w3') == []
+    assert queue.counts()[LEASED] == 3
+
+def test_complete_only_from_lease_holder(queue):
+    queue.claim('w1', limit=1)
+    assert queue.complete('w2', [('danone', 'x')]) == 0
+    assert queue.complete('w1', [('danone', 'x')]) == 1
+    assert queue.results(['danone', 'total']) == {'danone': 'x'}
+    assert queue.counts()[DONE] == 1
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=0, max_attempts=5)
+    queue.enqueue([('danone', 'DANONE')])
+    assert queue.claim('w1') == [('danone', 'DANONE')]
+    time.sleep(0.01)
+    assert queue.claim('w2') == [('danone', 'DANONE')]
+    # L'ancien détenteur a perdu le bail
+    assert queue.complete('w1', [('danone', 'x')]) == 0
+    queue.close()
+
+def test_release_without_retry_does_not_count_attempt(queue):
+    for _ in range(3):
+        queue.claim('w1', limit=1)
+        assert queue.release('w1', ['danone']) == 1
+    assert queue.counts()[FAILED] == 0
+    assert queue.claim('w1', limit=1) == [('danone', 'DANONE')]
+
+def test_release_with_retry_at_delays_claim(queue):
+    queue.claim('w1', limit=1)
+    queue.release('w1', ['danone'], retry_at=time.time() + 3600)
+    assert [key for key, _ in queue.claim('w1', limit=5)] == ['total', 'airbus']
+
+def test_release_with_past_retry_at_is_claimable(queue):
+    queue.claim('w1', limit=1)
+    queue.release('w1', ['danone'], retry_at=time.time() - 1)
+    assert queue.claim('w2', limit=1) == [('danone', 'DANONE')]
+
+def test_release_with_retry_at_abandons_after_max_attempts(queue):
+    for _ in range(2):
+        queue.claim('w1', limit=1)
+        queue.release('w1', ['danone'], retry_at=time.time() - 1)
+    assert queue.counts()[FAILED] == 1
+    assert queue.results(['danone']) == {'danone': None}